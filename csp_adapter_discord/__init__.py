@@ -29,10 +29,53 @@ from .adapter import DiscordAdapter, DiscordAdapterManager
 # Legacy imports for backwards compatibility
 from .adapter_config import DiscordAdapterConfig
 
+# Command routing
+from .commands import CommandRouter, route_commands
+
+# Per-conversation dynamic baskets
+from .dynamic import conversation_key, conversations
+
+# Filters evaluated on the gateway payload
+from .filters import MessageFilter
+
+# Raw gateway payloads
+from .payload import LazyDiscordMessage, MessagePayload
+
+# Historical replay of recordings
+from .replay import replay
+
+# Shared connection used by the adapter's inputs and outputs
+from .session import DiscordSession
+from .structs import (
+    DiscordDeleteEvent,
+    DiscordEditEvent,
+    DiscordMessageEvent,
+    DiscordMessageStruct,
+    DiscordReactionEvent,
+    GatewayStats,
+    PublishStats,
+)
+
 __all__ = (
     # Adapter
     "DiscordAdapter",
     "DiscordAdapterManager",  # Legacy alias
+    "DiscordSession",
+    "CommandRouter",
+    "route_commands",
+    "conversations",
+    "conversation_key",
+    "replay",
+    "MessageFilter",
+    "MessagePayload",
+    "LazyDiscordMessage",
+    "PublishStats",
+    "GatewayStats",
+    "DiscordMessageStruct",
+    "DiscordMessageEvent",
+    "DiscordReactionEvent",
+    "DiscordEditEvent",
+    "DiscordDeleteEvent",
     # Backend and config (from chatom)
     "DiscordBackend",
     "DiscordConfig",
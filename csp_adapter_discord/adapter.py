@@ -1,26 +1,60 @@
 """Discord CSP adapter using chatom backend.
 
 This module provides a CSP adapter for Discord that wraps the chatom DiscordBackend.
+All inputs and outputs of an adapter share a single DiscordSession, so a graph
+logs in and connects to the gateway once regardless of how many streams it wires.
 """
 
-from typing import Optional, Set
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Sequence, Set, Union
 
 import csp
 from chatom.csp import BackendAdapter
 from chatom.discord import DiscordBackend, DiscordConfig, DiscordMessage, DiscordPresence
 from csp import ts
+from csp.impl.wiring import py_output_adapter_def, py_push_adapter_def
 
-__all__ = ("DiscordAdapter", "DiscordAdapterManager")
+from .commands import CommandRouter, route_commands
+from .dynamic import conversations
+from .filters import MessageFilter
+from .nodes import (
+    OVERFLOW_POLICIES,
+    DiscordAdapterManagerImpl,
+    DiscordChannelReaderImpl,
+    DiscordFilteredReaderImpl,
+    DiscordGatewayStatsReaderImpl,
+    DiscordHistoryReaderImpl,
+    DiscordLazyReaderImpl,
+    DiscordMessageEventReaderImpl,
+    DiscordMessageReaderImpl,
+    DiscordMessageWriterImpl,
+    DiscordPayloadReaderImpl,
+    DiscordPresenceWriterImpl,
+    DiscordPublishStatsReaderImpl,
+    DiscordRecorderImpl,
+    DiscordStructReaderImpl,
+)
+from .payload import LazyDiscordMessage, MessagePayload
+from .session import DiscordSession
+from .structs import DiscordDeleteEvent, DiscordEditEvent, DiscordMessageStruct, DiscordReactionEvent, GatewayStats, PublishStats
+
+__all__ = ("SUBSCRIBE_MODES", "DiscordAdapter", "DiscordAdapterManager")
+
+#: What ``subscribe`` ticks: DiscordMessage, MessagePayload read straight from the gateway, LazyDiscordMessage or DiscordMessageStruct
+SUBSCRIBE_MODES = ("message", "payload", "lazy", "struct")
 
 
 class DiscordAdapter(BackendAdapter):
     """CSP adapter for Discord using the chatom DiscordBackend.
 
     This adapter wraps the chatom DiscordBackend and provides CSP
-    graph/node methods for reading and writing messages.
+    graph/node methods for reading and writing messages. It is also
+    the CSP adapter manager for those streams: every subscribe, publish
+    and publish_presence call is multiplexed over one DiscordSession.
 
     Attributes:
         backend: The underlying DiscordBackend.
+        session: The shared connection used by all inputs and outputs.
 
     Example:
         >>> from csp_adapter_discord import DiscordAdapter, DiscordConfig
@@ -38,14 +72,47 @@ class DiscordAdapter(BackendAdapter):
         >>> csp.run(my_graph, starttime=datetime.now(), endtime=timedelta(hours=1))
     """
 
-    def __init__(self, config: DiscordConfig):
+    def __init__(
+        self,
+        config: DiscordConfig,
+        channel_cache_size: int = 1024,
+        shards: Union[int, str, None] = None,
+        shard_mode: str = "thread",
+        minimal_intents: bool = False,
+    ):
         """Initialize the Discord adapter.
 
         Args:
             config: Discord configuration.
+            channel_cache_size: Maximum number of channel objects cached for publishing.
+            shards: Number of gateway shards to run, each receiving and decoding its share of the
+                guilds on its own thread, or ``"auto"`` for the number Discord recommends. All shards
+                feed the same streams. None (the default) opens a single gateway connection.
+            shard_mode: ``"thread"`` to run the shards in this process, or ``"process"`` to run each
+                in a worker process that hands messages over through shared memory, keeping gateway
+                decoding off the GIL the graph runs under.
+            minimal_intents: If True, the gateway connection only enables the configured intents needed
+                by the inputs wired into the graph. By default it enables all the configured intents.
+                Configured intents no input needs are reported with a warning either way.
         """
         backend = DiscordBackend(config=config)
         super().__init__(backend)
+        self._session = DiscordSession(
+            backend,
+            channel_cache_size=channel_cache_size,
+            shards=shards,
+            shard_mode=shard_mode,
+            minimal_intents=minimal_intents,
+        )
+
+    @property
+    def session(self) -> DiscordSession:
+        """Get the shared session."""
+        return self._session
+
+    def _create(self, engine, memo):
+        """Create the engine-side manager for this adapter (CSP adapter manager protocol)."""
+        return DiscordAdapterManagerImpl(engine, self._session)
 
     # NOTE: Cannot use @csp.graph decorator, https://github.com/Point72/csp/issues/183
     def subscribe(
@@ -53,17 +120,40 @@ class DiscordAdapter(BackendAdapter):
         channels: Optional[Set[str]] = None,
         skip_own: bool = True,
         skip_history: bool = True,
+        max_latency: Optional[timedelta] = None,
+        max_batch: int = 0,
+        mode: str = "message",
+        message_filter: Optional[MessageFilter] = None,
     ) -> ts[[DiscordMessage]]:
         """Subscribe to messages from Discord.
 
+        Messages are pushed into the graph as soon as the gateway delivers them.
+        Pass ``max_latency`` to micro-batch instead, trading a bounded delay for
+        fewer engine cycles under heavy traffic.
+
+        With ``mode="payload"`` the stream ticks :class:`~csp_adapter_discord.payload.MessagePayload`
+        views over the raw MESSAGE_CREATE JSON instead. Neither discord.py's Message nor a
+        DiscordMessage is built unless ``to_message()`` is called, which cuts the per-message
+        CPU cost at high rates. ``mode="lazy"`` ticks :class:`~csp_adapter_discord.payload.LazyDiscordMessage`,
+        which reads like a DiscordMessage but only builds the fields that are accessed;
+        ``materialize()`` returns the full DiscordMessage. ``mode="struct"`` ticks
+        :class:`~csp_adapter_discord.structs.DiscordMessageStruct`, a csp.Struct of the hot fields.
+
         Args:
             channels: Optional set of channel IDs or names to filter.
-                Names will be resolved to IDs at connection time.
+                IDs are matched against the message's channel (or thread parent) ID,
+                names (with or without a leading ``#``) case-insensitively against its
+                channel name. Any number of channels share one gateway listener.
             skip_own: If True, skip messages from the bot itself.
             skip_history: If True, skip messages before stream started.
+            max_latency: If set, hold messages for at most this long and tick them in batches.
+            max_batch: With ``max_latency``, tick as soon as this many messages are pending (0 for no limit).
+            mode: One of ``SUBSCRIBE_MODES``: ``"message"``, ``"payload"``, ``"lazy"`` or ``"struct"``.
+            message_filter: Optional MessageFilter evaluated on the raw gateway payload, before any
+                message is built; messages it rejects cost a few dict lookups.
 
         Returns:
-            Time series of DiscordMessage lists.
+            Time series of DiscordMessage lists (lists of MessagePayload, LazyDiscordMessage or DiscordMessageStruct in the other modes).
 
         Example:
             >>> @csp.graph
@@ -72,20 +162,259 @@ class DiscordAdapter(BackendAdapter):
             ...     messages = adapter.subscribe(channels={"general", "bot-commands"})
             ...     csp.print("Received", messages)
         """
-        # Use the base class subscribe which returns ts[[Message]]
-        # The messages will be DiscordMessage instances
-        return super().subscribe(
-            channels=channels,
+        if mode not in SUBSCRIBE_MODES:
+            raise ValueError(f"mode must be one of {SUBSCRIBE_MODES}, got {mode!r}")
+        if mode == "message" and message_filter is None:
+            return _DiscordMessageReader(
+                self,
+                channels=set(channels or ()),
+                skip_own=skip_own,
+                skip_history=skip_history,
+                max_latency=max_latency,
+                max_batch=max_batch,
+            )
+        # The other readers work on the payload, so messages filtered out are never converted
+        readers = {"message": _DiscordFilteredReader, "payload": _DiscordPayloadReader, "lazy": _DiscordLazyReader, "struct": _DiscordStructReader}
+        return readers[mode](
+            self,
+            channels=set(channels or ()),
             skip_own=skip_own,
             skip_history=skip_history,
+            max_latency=max_latency,
+            max_batch=max_batch,
+            message_filter=message_filter,
         )
 
     # NOTE: Cannot use @csp.graph decorator, https://github.com/Point72/csp/issues/183
-    def publish(self, msg: ts[DiscordMessage]):
+    def subscribe_by_channel(
+        self,
+        channels: List[str],
+        skip_own: bool = True,
+        skip_history: bool = True,
+        max_latency: Optional[timedelta] = None,
+        max_batch: int = 0,
+    ) -> Dict[str, ts[[DiscordMessage]]]:
+        """Subscribe to messages demultiplexed per channel.
+
+        Instead of one stream every downstream node has to filter, this returns a
+        dict basket with one time series per requested channel. Messages are routed
+        to their channel's series in the adapter, so a node wired to one channel
+        never wakes up for traffic on the others.
+
+        Args:
+            channels: Channel IDs or names, used as the basket keys. Matching follows
+                the same rules as ``subscribe``.
+            skip_own: If True, skip messages from the bot itself.
+            skip_history: If True, skip messages before stream started.
+            max_latency: If set, hold messages for at most this long and tick them in batches.
+            max_batch: With ``max_latency``, tick as soon as this many messages are pending (0 for no limit).
+
+        Returns:
+            Dict basket of DiscordMessage list time series keyed by channel.
+
+        Example:
+            >>> @csp.graph
+            ... def my_graph():
+            ...     by_channel = adapter.subscribe_by_channel(["alerts", "1234567890"])
+            ...     csp.print("alerts", by_channel["alerts"])
+        """
+        return {
+            channel: _DiscordChannelReader(
+                self,
+                channel=channel,
+                skip_own=skip_own,
+                skip_history=skip_history,
+                max_latency=max_latency,
+                max_batch=max_batch,
+            )
+            for channel in dict.fromkeys(channels)
+        }
+
+    # NOTE: Cannot use @csp.graph decorator, https://github.com/Point72/csp/issues/183
+    def subscribe_conversations(
+        self,
+        key_by: Union[str, Callable[[DiscordMessage], str]] = "channel",
+        idle_timeout: timedelta = timedelta(minutes=30),
+        channels: Optional[Set[str]] = None,
+        skip_own: bool = True,
+        skip_history: bool = True,
+    ) -> csp.DynamicBasket[str, List[DiscordMessage]]:
+        """Subscribe to messages as a dynamic basket keyed by conversation.
+
+        Use with ``csp.dynamic`` to run one sub-graph per conversation: it is
+        created on the conversation's first message and torn down, with all its
+        state, once the conversation has been idle for ``idle_timeout``.
+
+        Args:
+            key_by: ``"channel"``, ``"guild"``, ``"thread"`` or a callable returning the key.
+            idle_timeout: Remove a conversation after this long without messages.
+            channels: Optional set of channel IDs or names to filter, as for ``subscribe``.
+            skip_own: If True, skip messages from the bot itself.
+            skip_history: If True, skip messages before stream started.
+
+        Returns:
+            Dynamic basket of DiscordMessage lists keyed by conversation.
+
+        Example:
+            >>> @csp.graph
+            ... def my_graph():
+            ...     basket = adapter.subscribe_conversations(key_by="thread", idle_timeout=timedelta(minutes=10))
+            ...     replies = csp.dynamic(basket, handle_conversation, csp.snapkey(), csp.attach())
+        """
+        msgs = self.subscribe(channels=channels, skip_own=skip_own, skip_history=skip_history)
+        return conversations(msgs, key_by=key_by, idle_timeout=idle_timeout)
+
+    # NOTE: Cannot use @csp.graph decorator, https://github.com/Point72/csp/issues/183
+    def subscribe_reactions(self, channels: Optional[Set[str]] = None) -> ts[[DiscordReactionEvent]]:
+        """Subscribe to reactions added to and removed from messages.
+
+        Reactions, edits and deletes are read from the same gateway connection as
+        messages, straight from the gateway payloads. They need the ``guild_reactions``
+        and ``dm_reactions`` intents, which ``Intents.default()`` includes.
+
+        Args:
+            channels: Optional set of channel IDs or names to filter, as for ``subscribe``.
+
+        Returns:
+            Time series of DiscordReactionEvent lists.
+
+        Example:
+            >>> @csp.graph
+            ... def my_graph():
+            ...     reactions = adapter.subscribe_reactions(channels={"announcements"})
+            ...     csp.print("reactions", reactions)
+        """
+        return _DiscordReactionReader(self, event="reaction", channels=set(channels or ()))
+
+    # NOTE: Cannot use @csp.graph decorator, https://github.com/Point72/csp/issues/183
+    def subscribe_edits(self, channels: Optional[Set[str]] = None) -> ts[[DiscordEditEvent]]:
+        """Subscribe to messages edited by their authors.
+
+        Args:
+            channels: Optional set of channel IDs or names to filter, as for ``subscribe``.
+
+        Returns:
+            Time series of DiscordEditEvent lists, carrying the new content.
+        """
+        return _DiscordEditReader(self, event="edit", channels=set(channels or ()))
+
+    # NOTE: Cannot use @csp.graph decorator, https://github.com/Point72/csp/issues/183
+    def subscribe_deletes(self, channels: Optional[Set[str]] = None) -> ts[[DiscordDeleteEvent]]:
+        """Subscribe to deleted messages, including each message of a bulk delete.
+
+        Args:
+            channels: Optional set of channel IDs or names to filter, as for ``subscribe``.
+
+        Returns:
+            Time series of DiscordDeleteEvent lists.
+        """
+        return _DiscordDeleteReader(self, event="delete", channels=set(channels or ()))
+
+    # NOTE: Cannot use @csp.graph decorator, https://github.com/Point72/csp/issues/183
+    def commands(
+        self,
+        prefixes: Sequence[str] = (),
+        patterns: Optional[Dict[str, str]] = None,
+        ignore_case: bool = False,
+        msgs: Optional[ts[[DiscordMessage]]] = None,
+        channels: Optional[Set[str]] = None,
+        skip_own: bool = True,
+    ) -> Dict[str, ts[[DiscordMessage]]]:
+        """Route messages to one time series per command.
+
+        All commands are matched in a single node: prefixes with a trie, then
+        each regex, see :class:`~csp_adapter_discord.commands.CommandRouter`.
+        Without ``msgs`` the adapter subscribes itself; if there are only
+        case-sensitive prefix commands, the prefixes are also pushed down into a
+        payload filter so that other messages are never converted.
+
+        Args:
+            prefixes: Prefix commands such as ``"!ping"``; each is its own key.
+            patterns: Regex commands, key to pattern.
+            ignore_case: If True, match case-insensitively.
+            msgs: Stream to route, of any subscribe mode; defaults to a new subscription.
+            channels: With no ``msgs``, channel IDs or names to subscribe to.
+            skip_own: With no ``msgs``, skip messages from the bot itself.
+
+        Returns:
+            Dict basket of message lists keyed by command.
+
+        Example:
+            >>> @csp.graph
+            ... def my_graph():
+            ...     cmds = adapter.commands(["!ping", "!help"], patterns={"thanks": r"\\bthank(s| you)\\b"})
+            ...     csp.print("ping", cmds["!ping"])
+        """
+        router = CommandRouter(prefixes, patterns, ignore_case=ignore_case)
+        if msgs is None:
+            message_filter = MessageFilter(prefixes=list(prefixes)) if prefixes and not patterns and not ignore_case else None
+            msgs = self.subscribe(channels=channels, skip_own=skip_own, message_filter=message_filter)
+        return route_commands(msgs, router, router.keys)
+
+    # NOTE: Cannot use @csp.graph decorator, https://github.com/Point72/csp/issues/183
+    def history(
+        self,
+        channels: Set[str],
+        since: Union[datetime, timedelta],
+        until: Optional[datetime] = None,
+        skip_own: bool = False,
+        page_size: int = 100,
+        max_concurrency: int = 8,
+    ) -> ts[[DiscordMessage]]:
+        """Backfill the history of channels, then continue with their live messages.
+
+        History is paged for all channels concurrently under discord.py's rate
+        limiter and ticked in creation order across channels. Without ``until``
+        the stream then hands off to the live gateway messages of the same
+        channels, with no gap and no duplicates.
+
+        Args:
+            channels: Set of channel IDs or names.
+            since: Datetime (naive means UTC), or timedelta before the graph start, to backfill from.
+            until: Datetime to backfill up to; no live messages follow the backfill if set.
+            skip_own: If True, skip messages from the bot itself.
+            page_size: Messages per history request, at most 100.
+            max_concurrency: Maximum number of history requests in flight.
+
+        Returns:
+            Time series of lists of DiscordMessage, oldest first.
+
+        Example:
+            >>> @csp.graph
+            ... def my_graph():
+            ...     msgs = adapter.history({"general", "alerts"}, since=timedelta(hours=6))
+            ...     csp.print("msgs", msgs)
+        """
+        return _DiscordHistoryReader(
+            self,
+            channels=set(channels),
+            since=since,
+            until=until,
+            skip_own=skip_own,
+            page_size=page_size,
+            max_concurrency=max_concurrency,
+        )
+
+    # NOTE: Cannot use @csp.graph decorator, https://github.com/Point72/csp/issues/183
+    def publish(
+        self,
+        msg: ts[DiscordMessage],
+        max_queue: int = 0,
+        overflow: str = "block",
+        coalesce_window: Optional[timedelta] = None,
+    ):
         """Publish messages to Discord.
 
         Args:
             msg: Time series of DiscordMessage to send.
+            max_queue: Maximum number of messages waiting to be sent, 0 for unbounded.
+            overflow: What to do with a message when the queue is full: ``"block"`` the engine until
+                there is room, ``"drop_oldest"`` or ``"drop_newest"`` message, or ``"coalesce"`` it
+                into the newest message still waiting for the same channel, merging their contents
+                (a message that cannot be merged within Discord's limits is dropped).
+            coalesce_window: If set, messages published to the same channel within this window are
+                merged into as few Discord messages as the 2000 character and embed limits allow,
+                split at line boundaries.
 
         Example:
             >>> @csp.graph
@@ -94,9 +423,78 @@ class DiscordAdapter(BackendAdapter):
             ...         channel_id="1234567890",
             ...         content="Hello, World!",
             ...     ))
-            ...     adapter.publish(response)
+            ...     adapter.publish(response, max_queue=1000, overflow="drop_oldest")
         """
-        super().publish(msg=msg)
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}, got {overflow!r}")
+        _DiscordMessageWriter(
+            self,
+            on_sent=getattr(self, "_message_sent_callback", None),
+            max_queue=max_queue,
+            overflow=overflow,
+            coalesce_window=coalesce_window,
+            msg=msg,
+        )
+
+    # NOTE: Cannot use @csp.graph decorator, https://github.com/Point72/csp/issues/183
+    def publish_stats(self, interval: timedelta = timedelta(seconds=1)) -> ts[PublishStats]:
+        """Subscribe to the outbound queue counters of every ``publish`` on this adapter.
+
+        Args:
+            interval: How often to sample the counters; a tick is only produced when they changed.
+
+        Returns:
+            Time series of PublishStats (queue depth, dropped, coalesced, sent and failed counts).
+        """
+        return _DiscordPublishStatsReader(self, interval=interval)
+
+    # NOTE: Cannot use @csp.graph decorator, https://github.com/Point72/csp/issues/183
+    def gateway_stats(self, interval: timedelta = timedelta(seconds=1)) -> ts[GatewayStats]:
+        """Subscribe to the compressed gateway traffic counters of this adapter.
+
+        The gateway is compressed with ``zstd-stream`` when a zstd module is installed and
+        ``zlib-stream`` otherwise; ``bytes_in / bytes_decompressed`` is the share of the
+        inbound traffic actually sent over the network.
+
+        Args:
+            interval: How often to sample the counters; a tick is only produced when they changed.
+
+        Returns:
+            Time series of GatewayStats (compression, frames, bytes_in, bytes_decompressed).
+        """
+        return _DiscordGatewayStatsReader(self, interval=interval)
+
+    # NOTE: Cannot use @csp.graph decorator, https://github.com/Point72/csp/issues/183
+    def record(
+        self,
+        path: str,
+        raw: bool = True,
+        chunk_records: int = 1024,
+        flush_interval: timedelta = timedelta(seconds=1),
+    ) -> ts[int]:
+        """Record every inbound message, and optionally every raw gateway event, to a file.
+
+        The recording is an append-only file of length-prefixed, compressed chunks
+        with a timestamp index next to it (``path + ".idx"``), see
+        :mod:`csp_adapter_discord.recording`. Serializing and writing happen on a
+        background thread, so recording does not slow down ``subscribe``.
+
+        Args:
+            path: Recording file, appended to if it exists.
+            raw: If True, also record each gateway event's payload as received.
+            chunk_records: Maximum number of records per chunk.
+            flush_interval: Maximum time a record stays in memory before it is written.
+
+        Returns:
+            Time series of the number of records written so far, ticking after each chunk.
+
+        Example:
+            >>> @csp.graph
+            ... def my_graph():
+            ...     adapter.record("discord.rec")
+            ...     csp.print("messages", adapter.subscribe())
+        """
+        return _DiscordRecorder(self, path=path, raw=raw, chunk_records=chunk_records, flush_interval=flush_interval)
 
     @csp.node
     def _extract_presence_status(self, p: ts[DiscordPresence]) -> ts[str]:
@@ -105,12 +503,22 @@ class DiscordAdapter(BackendAdapter):
             return p.status.value if hasattr(p.status, "value") else str(p.status)
 
     # NOTE: Cannot use @csp.graph decorator, https://github.com/Point72/csp/issues/183
-    def publish_presence(self, presence: ts[DiscordPresence], timeout: float = 5.0):
+    def publish_presence(
+        self,
+        presence: ts[DiscordPresence],
+        timeout: float = 5.0,
+        min_interval: timedelta = timedelta(seconds=5),
+    ):
         """Publish presence/activity status updates.
 
+        Only the latest status is kept: an update identical to the current
+        presence is skipped, and updates are sent at most once per ``min_interval``
+        so a flapping signal does not get the gateway session rate-limited.
+
         Args:
             presence: Time series of DiscordPresence status.
             timeout: Timeout for presence API calls.
+            min_interval: Minimum time between two presence updates.
 
         Example:
             >>> @csp.graph
@@ -122,7 +530,172 @@ class DiscordAdapter(BackendAdapter):
         """
         # Extract the status string from DiscordPresence
         status_str = self._extract_presence_status(presence)
-        super().publish_presence(presence=status_str, timeout=timeout)
+        _DiscordPresenceWriter(self, timeout=timeout, min_interval=min_interval, presence=status_str)
+
+
+_DiscordMessageReader = py_push_adapter_def(
+    "DiscordMessageReader",
+    DiscordMessageReaderImpl,
+    ts[[DiscordMessage]],
+    DiscordAdapter,
+    channels=set,
+    skip_own=bool,
+    skip_history=bool,
+    max_latency=object,
+    max_batch=int,
+    memoize=False,
+)
+_DiscordFilteredReader = py_push_adapter_def(
+    "DiscordFilteredReader",
+    DiscordFilteredReaderImpl,
+    ts[[DiscordMessage]],
+    DiscordAdapter,
+    channels=set,
+    skip_own=bool,
+    skip_history=bool,
+    max_latency=object,
+    max_batch=int,
+    message_filter=object,
+    memoize=False,
+)
+_DiscordPayloadReader = py_push_adapter_def(
+    "DiscordPayloadReader",
+    DiscordPayloadReaderImpl,
+    ts[[MessagePayload]],
+    DiscordAdapter,
+    channels=set,
+    skip_own=bool,
+    skip_history=bool,
+    max_latency=object,
+    max_batch=int,
+    message_filter=object,
+    memoize=False,
+)
+_DiscordLazyReader = py_push_adapter_def(
+    "DiscordLazyReader",
+    DiscordLazyReaderImpl,
+    ts[[LazyDiscordMessage]],
+    DiscordAdapter,
+    channels=set,
+    skip_own=bool,
+    skip_history=bool,
+    max_latency=object,
+    max_batch=int,
+    message_filter=object,
+    memoize=False,
+)
+_DiscordStructReader = py_push_adapter_def(
+    "DiscordStructReader",
+    DiscordStructReaderImpl,
+    ts[[DiscordMessageStruct]],
+    DiscordAdapter,
+    channels=set,
+    skip_own=bool,
+    skip_history=bool,
+    max_latency=object,
+    max_batch=int,
+    message_filter=object,
+    memoize=False,
+)
+_DiscordChannelReader = py_push_adapter_def(
+    "DiscordChannelReader",
+    DiscordChannelReaderImpl,
+    ts[[DiscordMessage]],
+    DiscordAdapter,
+    channel=str,
+    skip_own=bool,
+    skip_history=bool,
+    max_latency=object,
+    max_batch=int,
+    memoize=False,
+)
+_DiscordReactionReader = py_push_adapter_def(
+    "DiscordReactionReader",
+    DiscordMessageEventReaderImpl,
+    ts[[DiscordReactionEvent]],
+    DiscordAdapter,
+    event=str,
+    channels=set,
+    memoize=False,
+)
+_DiscordEditReader = py_push_adapter_def(
+    "DiscordEditReader",
+    DiscordMessageEventReaderImpl,
+    ts[[DiscordEditEvent]],
+    DiscordAdapter,
+    event=str,
+    channels=set,
+    memoize=False,
+)
+_DiscordDeleteReader = py_push_adapter_def(
+    "DiscordDeleteReader",
+    DiscordMessageEventReaderImpl,
+    ts[[DiscordDeleteEvent]],
+    DiscordAdapter,
+    event=str,
+    channels=set,
+    memoize=False,
+)
+_DiscordHistoryReader = py_push_adapter_def(
+    "DiscordHistoryReader",
+    DiscordHistoryReaderImpl,
+    ts[[DiscordMessage]],
+    DiscordAdapter,
+    channels=set,
+    since=object,
+    until=object,
+    skip_own=bool,
+    page_size=int,
+    max_concurrency=int,
+    memoize=False,
+)
+_DiscordMessageWriter = py_output_adapter_def(
+    "DiscordMessageWriter",
+    DiscordMessageWriterImpl,
+    DiscordAdapter,
+    on_sent=object,
+    max_queue=int,
+    overflow=str,
+    coalesce_window=object,
+    msg=ts[DiscordMessage],
+    memoize=False,
+)
+_DiscordPublishStatsReader = py_push_adapter_def(
+    "DiscordPublishStatsReader",
+    DiscordPublishStatsReaderImpl,
+    ts[PublishStats],
+    DiscordAdapter,
+    interval=timedelta,
+    memoize=False,
+)
+_DiscordGatewayStatsReader = py_push_adapter_def(
+    "DiscordGatewayStatsReader",
+    DiscordGatewayStatsReaderImpl,
+    ts[GatewayStats],
+    DiscordAdapter,
+    interval=timedelta,
+    memoize=False,
+)
+_DiscordRecorder = py_push_adapter_def(
+    "DiscordRecorder",
+    DiscordRecorderImpl,
+    ts[int],
+    DiscordAdapter,
+    path=str,
+    raw=bool,
+    chunk_records=int,
+    flush_interval=timedelta,
+    memoize=False,
+)
+_DiscordPresenceWriter = py_output_adapter_def(
+    "DiscordPresenceWriter",
+    DiscordPresenceWriterImpl,
+    DiscordAdapter,
+    timeout=float,
+    min_interval=timedelta,
+    presence=ts[str],
+    memoize=False,
+)
 
 
 # Legacy alias for backwards compatibility
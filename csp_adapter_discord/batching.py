@@ -0,0 +1,114 @@
+"""Merging of messages published to the same channel.
+
+Used by ``DiscordAdapter.publish(coalesce_window=...)``: messages ticked to
+one channel within the window are packed into as few Discord messages as the
+API limits allow, splitting at line boundaries when the text overflows.
+"""
+
+from typing import Any, List
+
+from chatom.discord import DiscordMessage
+
+__all__ = ("MAX_CONTENT_LENGTH", "MAX_EMBED_LENGTH", "MAX_EMBEDS", "embed_length", "merge_messages", "split_content")
+
+#: Maximum characters of message content
+MAX_CONTENT_LENGTH = 2000
+#: Maximum number of embeds on one message
+MAX_EMBEDS = 10
+#: Maximum characters summed over all embeds of one message
+MAX_EMBED_LENGTH = 6000
+
+
+def embed_length(embed: Any) -> int:
+    """Count the characters of an embed that Discord includes in its 6000 character limit."""
+    author = getattr(embed, "author", None)
+    footer = getattr(embed, "footer", None)
+    return (
+        len(embed.title or "")
+        + len(embed.description or "")
+        + len(author.name or "" if author is not None else "")
+        + len(footer.text or "" if footer is not None else "")
+        + sum(len(f.name or "") + len(f.value or "") for f in embed.fields or ())
+    )
+
+
+def split_content(content: str, limit: int = MAX_CONTENT_LENGTH) -> List[str]:
+    """Split text into chunks of at most ``limit`` characters at line boundaries.
+
+    Lines longer than ``limit`` are split at the limit.
+    """
+    chunks: List[str] = []
+    current = ""
+    for line in content.split("\n"):
+        while len(line) > limit:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:limit])
+            line = line[limit:]
+        if not current:
+            current = line
+        elif len(current) + 1 + len(line) <= limit:
+            current += "\n" + line
+        else:
+            chunks.append(current)
+            current = line
+    if current or not chunks:
+        chunks.append(current)
+    return chunks
+
+
+def _mergeable(msg: DiscordMessage) -> bool:
+    """Whether a message is plain text and embeds, so that merging it loses nothing."""
+    return not (msg.attachments or msg.components or msg.reply_to is not None or msg.reference is not None)
+
+
+def merge_messages(messages: List[DiscordMessage], limit: int = MAX_CONTENT_LENGTH) -> List[DiscordMessage]:
+    """Merge messages for one channel into as few messages as Discord's limits allow.
+
+    Consecutive plain messages are joined line by line and their embeds carried
+    along, starting a new message whenever the content would exceed ``limit``
+    characters or the embeds would exceed ``MAX_EMBEDS`` / ``MAX_EMBED_LENGTH``.
+    Messages with attachments, components or a reply are sent unchanged, in order.
+
+    Args:
+        messages: Messages for the same channel, in the order they were published.
+        limit: Maximum content length of a merged message.
+
+    Returns:
+        The messages to send.
+    """
+    merged: List[DiscordMessage] = []
+    lines: List[str] = []
+    length = -1
+    embeds: list = []
+    embeds_length = 0
+    template = None
+
+    def flush():
+        nonlocal lines, length, embeds, embeds_length, template
+        if template is not None and (lines or embeds):
+            merged.append(template.model_copy(update={"content": "\n".join(lines), "embeds": embeds}))
+        lines, length, embeds, embeds_length, template = [], -1, [], 0, None
+
+    for msg in messages:
+        if not _mergeable(msg):
+            flush()
+            merged.append(msg)
+            continue
+        msg_embeds_length = sum(embed_length(e) for e in msg.embeds)
+        if len(embeds) + len(msg.embeds) > MAX_EMBEDS or embeds_length + msg_embeds_length > MAX_EMBED_LENGTH:
+            flush()
+        if template is None:
+            template = msg
+        for chunk in split_content(msg.content or "", limit) if msg.content else ():
+            if length + 1 + len(chunk) > limit:
+                # Keep the embeds collected so far with the text they came with
+                flush()
+                template = msg
+            lines.append(chunk)
+            length += 1 + len(chunk)
+        embeds.extend(msg.embeds)
+        embeds_length += msg_embeds_length
+    flush()
+    return merged
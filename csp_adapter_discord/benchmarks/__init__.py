@@ -0,0 +1,5 @@
+"""Benchmarks for csp-adapter-discord.
+
+Benchmarks run offline against scripted backends and are not part of the test suite.
+Run one with ``python -m csp_adapter_discord.benchmarks.<name>``.
+"""
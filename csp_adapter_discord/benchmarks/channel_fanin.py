@@ -0,0 +1,83 @@
+"""Throughput of a multi-channel subscribe as the channel set grows.
+
+Every reader shares the session's single gateway listener and filters with set
+lookups, so messages/sec should stay flat from one channel to many thousands.
+
+Usage:
+    python -m csp_adapter_discord.benchmarks.channel_fanin --messages 20000 --sizes 1 100 10000
+"""
+
+import argparse
+import json
+import threading
+import time
+from datetime import timedelta
+from typing import List
+from unittest.mock import patch
+
+import csp
+from chatom.discord import DiscordChannel, DiscordConfig, DiscordMessage, MockDiscordBackend
+from csp import ts
+
+from csp_adapter_discord import DiscordAdapter
+
+__all__ = ("main", "run_fanin")
+
+
+@csp.node
+def _count(msgs: ts[[DiscordMessage]], counts: object):
+    if csp.ticked(msgs) and msgs:
+        counts.append((time.perf_counter(), len(msgs)))
+
+
+def run_fanin(channel_count: int, message_count: int) -> dict:
+    """Dispatch ``message_count`` messages spread over ``channel_count`` subscribed channels."""
+    config = DiscordConfig(bot_token="benchmark")
+    with patch("csp_adapter_discord.adapter.DiscordBackend", MockDiscordBackend):
+        adapter = DiscordAdapter(config=config)
+    channel_ids = [str(10**17 + i) for i in range(channel_count)]
+    # Half the traffic is for channels nobody subscribed to
+    messages = [
+        DiscordMessage(
+            id=str(i),
+            content="x",
+            channel=DiscordChannel(id=channel_ids[i % channel_count] if i % 2 else str(i), name="c"),
+        )
+        for i in range(message_count)
+    ]
+    counts: List[tuple] = []
+    started: List[float] = []
+
+    def graph():
+        _count(adapter.subscribe(channels=set(channel_ids), skip_history=False), counts)
+
+    def dispatch_all():
+        started.append(time.perf_counter())
+        for message in messages:
+            adapter.session.dispatch("message", message)
+
+    def feed():
+        while not adapter.session.running:
+            time.sleep(0.001)
+        time.sleep(0.05)
+        adapter.session.call_soon(dispatch_all)
+
+    threading.Thread(target=feed, daemon=True).start()
+    csp.run(graph, realtime=True, endtime=timedelta(seconds=max(2.0, message_count / 20000)))
+    received = sum(n for _, n in counts)
+    elapsed = counts[-1][0] - started[0] if counts else float("nan")
+    return {"channels": channel_count, "dispatched": message_count, "received": received, "msgs_per_sec": message_count / elapsed}
+
+
+def main(argv=None) -> List[dict]:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 1000, 10000])
+    args = parser.parse_args(argv)
+    results = [run_fanin(size, args.messages) for size in args.sizes]
+    print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Ingest latency of the subscribe path: gateway event to CSP tick.
+
+Compares the polling reader from ``chatom.csp.BackendAdapter`` (which drains
+its queue every 10 ms) against ``DiscordAdapter.subscribe``, which pushes from
+the gateway callback, optionally with micro-batching.
+
+Usage:
+    python -m csp_adapter_discord.benchmarks.ingest_latency --messages 1000 --interval-ms 2
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+from datetime import timedelta
+from typing import List
+from unittest.mock import patch
+
+import csp
+from chatom.base import Message
+from chatom.csp import BackendAdapter
+from chatom.discord import DiscordChannel, DiscordConfig, DiscordMessage, MockDiscordBackend
+from csp import ts
+
+from csp_adapter_discord import DiscordAdapter
+
+__all__ = ("main", "percentile", "run_polling", "run_push", "summarize")
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of ``values`` for ``q`` in [0, 100]."""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100.0 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def summarize(latencies_ns: List[int]) -> dict:
+    """Summarize latencies in milliseconds."""
+    ms = [v / 1e6 for v in latencies_ns]
+    return {
+        "received": len(ms),
+        "mean_ms": statistics.fmean(ms) if ms else float("nan"),
+        "p50_ms": percentile(ms, 50),
+        "p95_ms": percentile(ms, 95),
+        "p99_ms": percentile(ms, 99),
+        "max_ms": max(ms) if ms else float("nan"),
+    }
+
+
+def _make_message(i: int) -> DiscordMessage:
+    return DiscordMessage(
+        id=str(i),
+        content=f"message {i}",
+        channel=DiscordChannel(id="456", name="general"),
+        metadata={"sent_ns": time.perf_counter_ns()},
+    )
+
+
+async def _generate(count: int, interval: float, emit) -> None:
+    for i in range(count):
+        emit(_make_message(i))
+        await asyncio.sleep(interval)
+
+
+class ScriptedStreamBackend(MockDiscordBackend):
+    """Mock backend whose ``stream_messages`` yields scripted messages.
+
+    Parameters come from ``config.extra`` because the polling reader rebuilds
+    the backend from its config on its own thread.
+    """
+
+    async def stream_messages(self, channel=None, skip_own=True, skip_history=True):
+        queue: asyncio.Queue = asyncio.Queue()
+        extra = self.config.extra
+        task = asyncio.create_task(_generate(extra["count"], extra["interval"], queue.put_nowait))
+        try:
+            for _ in range(extra["count"]):
+                yield await queue.get()
+        finally:
+            task.cancel()
+
+
+@csp.node
+def _record(msgs: ts[[Message]], latencies: object):
+    if csp.ticked(msgs):
+        now = time.perf_counter_ns()
+        for msg in msgs:
+            latencies.append(now - msg.metadata["sent_ns"])
+
+
+def run_polling(count: int, interval: float) -> dict:
+    """Measure the chatom BackendAdapter polling reader."""
+    config = DiscordConfig(bot_token="benchmark", extra={"count": count, "interval": interval})
+    adapter = BackendAdapter(ScriptedStreamBackend(config=config))
+    latencies: List[int] = []
+
+    def graph():
+        _record(adapter.subscribe(), latencies)
+
+    csp.run(graph, realtime=True, endtime=timedelta(seconds=count * interval + 1.0))
+    return summarize(latencies)
+
+
+def run_push(count: int, interval: float, max_latency: timedelta = None, max_batch: int = 0) -> dict:
+    """Measure DiscordAdapter.subscribe, messages dispatched on the session loop."""
+    config = DiscordConfig(bot_token="benchmark")
+    with patch("csp_adapter_discord.adapter.DiscordBackend", MockDiscordBackend):
+        adapter = DiscordAdapter(config=config)
+    latencies: List[int] = []
+
+    def graph():
+        _record(adapter.subscribe(max_latency=max_latency, max_batch=max_batch), latencies)
+
+    def feed():
+        while not adapter.session.running:
+            time.sleep(0.001)
+        time.sleep(0.05)
+        adapter.session.submit(_generate(count, interval, lambda m: adapter.session.dispatch("message", m)))
+
+    threading.Thread(target=feed, daemon=True).start()
+    csp.run(graph, realtime=True, endtime=timedelta(seconds=count * interval + 1.0))
+    return summarize(latencies)
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--interval-ms", type=float, default=2.0)
+    parser.add_argument("--batch-ms", type=float, default=5.0, help="max_latency for the micro-batched run")
+    args = parser.parse_args(argv)
+    interval = args.interval_ms / 1000.0
+    results = {
+        "polling": run_polling(args.messages, interval),
+        "push": run_push(args.messages, interval),
+        "push_batched": run_push(args.messages, interval, max_latency=timedelta(milliseconds=args.batch_ms)),
+    }
+    print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""End-to-end throughput and latency of subscribe and publish.
+
+Drives a real DiscordAdapter (discord.py included) against a local
+FakeDiscordServer and reports, as JSON:
+
+- ingest: messages/sec and latency from the gateway sending MESSAGE_CREATE to the CSP tick
+- publish: messages/sec and latency from the CSP tick to the HTTP request reaching the server
+- RSS growth per 10k messages for both, from once the adapter has connected,
+  and separately the RSS taken by starting the adapter and connecting
+
+Without ``--rate`` messages are sent as fast as possible, which measures the
+sustainable throughput (latencies then include queueing); with ``--rate`` they
+are paced, which measures latency below saturation.
+
+Usage:
+    python -m csp_adapter_discord.benchmarks.suite --messages 10000 --output results.json
+    python -m csp_adapter_discord.benchmarks.suite --messages 2000 --rate 500
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+from datetime import UTC, datetime, timedelta
+from typing import List, Optional
+
+import csp
+import discord
+from chatom.discord import DiscordChannel, DiscordConfig, DiscordMessage
+from csp import ts
+
+import csp_adapter_discord
+from csp_adapter_discord import DiscordAdapter
+from csp_adapter_discord.benchmarks.ingest_latency import summarize
+from csp_adapter_discord.testing import FakeDiscordServer
+
+__all__ = ("main", "rss_bytes", "run_ingest", "run_publish")
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Peak rather than current RSS; kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _rss_per_10k(before: int, after: int, count: int) -> float:
+    return (after - before) / count * 10_000 if count else float("nan")
+
+
+def _server(channel_count: int) -> FakeDiscordServer:
+    channels = {str(2000 + i): f"bench-{i}" for i in range(channel_count)}
+    # Limits high enough that the benchmark measures the adapter, not the rate limiter
+    return FakeDiscordServer(channels=channels, rate_limit=10**9, global_rate_limit=10**9)
+
+
+@csp.node
+def _until(done: object, poll: timedelta = timedelta(milliseconds=10)):
+    """Stop the engine once ``done()`` is true."""
+    with csp.alarms():
+        a_poll = csp.alarm(bool)
+
+    with csp.start():
+        csp.schedule_alarm(a_poll, poll, True)
+
+    if csp.ticked(a_poll):
+        if done():
+            csp.stop_engine()
+        else:
+            csp.schedule_alarm(a_poll, poll, True)
+
+
+@csp.node
+def _record_ingest(msgs: ts[[DiscordMessage]], ticks: object):
+    if csp.ticked(msgs):
+        now = time.perf_counter_ns()
+        for msg in msgs:
+            ticks.append((now, int(msg.content)))
+
+
+@csp.node
+def _outgoing(count: int, channel_ids: object, interval: timedelta, before_first: object) -> ts[DiscordMessage]:
+    """Tick ``count`` messages ``interval`` apart, stamped with the time they ticked.
+
+    ``before_first()`` is called just before the first message, once the adapter has connected.
+    """
+    with csp.alarms():
+        a_next = csp.alarm(int)
+
+    with csp.start():
+        csp.schedule_alarm(a_next, timedelta(0), 0)
+
+    if csp.ticked(a_next):
+        if a_next == 0:
+            before_first()
+        if a_next + 1 < count:
+            csp.schedule_alarm(a_next, interval, a_next + 1)
+        return DiscordMessage(channel=DiscordChannel(id=channel_ids[a_next % len(channel_ids)]), content=str(time.perf_counter_ns()))
+
+
+def _interval(rate: float) -> float:
+    return 1.0 / rate if rate else 0.0
+
+
+def run_ingest(count: int, channel_count: int = 1, rate: float = 0.0, timeout: float = 60.0) -> dict:
+    """Inject ``count`` messages on the fake gateway and time them into the graph."""
+    with _server(channel_count) as server:
+        adapter = DiscordAdapter(DiscordConfig(token="benchmark", api_url=server.api_url))
+        channel_ids = list(server.channels)
+        ticks: List[tuple] = []
+        started: List[int] = []
+        connected_rss: List[int] = []
+
+        def inject():
+            server.wait_for_connections(1, timeout)
+            time.sleep(0.2)
+            connected_rss.append(rss_bytes())
+            started.append(time.perf_counter_ns())
+            interval = _interval(rate)
+            for i in range(count):
+                server.inject_message(channel_ids[i % channel_count], str(time.perf_counter_ns()))
+                if interval:
+                    time.sleep(interval)
+
+        def graph():
+            _record_ingest(adapter.subscribe(skip_history=False), ticks)
+            _until(lambda: len(ticks) >= count)
+
+        rss_start = rss_bytes()
+        threading.Thread(target=inject, daemon=True).start()
+        csp.run(graph, realtime=True, endtime=timedelta(seconds=timeout))
+        rss_after = rss_bytes()
+
+    elapsed = (ticks[-1][0] - started[0]) / 1e9 if ticks and started else float("nan")
+    return {
+        "messages": count,
+        "channels": channel_count,
+        "rate": rate or None,
+        "msgs_per_sec": len(ticks) / elapsed,
+        "latency": summarize([tick - sent for tick, sent in ticks]),
+        "rss_startup_bytes": connected_rss[0] - rss_start if connected_rss else None,
+        "rss_bytes_per_10k": _rss_per_10k(connected_rss[0], rss_after, len(ticks)) if connected_rss else float("nan"),
+    }
+
+
+def run_publish(count: int, channel_count: int = 10, rate: float = 0.0, timeout: float = 60.0) -> dict:
+    """Publish ``count`` messages and time them from CSP tick to HTTP request."""
+    with _server(channel_count) as server:
+        adapter = DiscordAdapter(DiscordConfig(token="benchmark", api_url=server.api_url))
+        channel_ids = list(server.channels)
+
+        def posted() -> int:
+            return sum(len(v) for v in server.posted.values())
+
+        connected_rss: List[int] = []
+
+        def graph():
+            # Publishing opens no gateway: the REST session has connected by the time the graph starts
+            interval = timedelta(seconds=_interval(rate))
+            adapter.publish(_outgoing(count, channel_ids, interval, lambda: connected_rss.append(rss_bytes())))
+            _until(lambda: posted() >= count)
+
+        rss_start = rss_bytes()
+        csp.run(graph, realtime=True, endtime=timedelta(seconds=timeout))
+        rss_after = rss_bytes()
+        pairs = [
+            (received, int(body["content"]))
+            for channel_id in server.posted
+            for received, body in zip(server.posted_ns[channel_id], server.posted[channel_id])
+        ]
+
+    first_tick = min((ticked for _, ticked in pairs), default=0)
+    last_post = max((received for received, _ in pairs), default=0)
+    elapsed = (last_post - first_tick) / 1e9 if pairs else float("nan")
+    return {
+        "messages": count,
+        "channels": channel_count,
+        "rate": rate or None,
+        "msgs_per_sec": len(pairs) / elapsed,
+        "latency": summarize([received - ticked for received, ticked in pairs]),
+        "rss_startup_bytes": connected_rss[0] - rss_start if connected_rss else None,
+        "rss_bytes_per_10k": _rss_per_10k(connected_rss[0], rss_after, len(pairs)) if connected_rss else float("nan"),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--ingest-channels", type=int, default=1)
+    parser.add_argument("--publish-channels", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=0.0, help="Messages/sec to pace at, 0 for as fast as possible")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+    results = {
+        "meta": {
+            "timestamp": datetime.now(UTC).isoformat(),
+            "csp_adapter_discord": csp_adapter_discord.__version__,
+            "csp": csp.__version__,
+            "discord.py": discord.__version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "ingest": run_ingest(args.messages, args.ingest_channels, args.rate),
+        "publish": run_publish(args.messages, args.publish_channels, args.rate),
+    }
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    return results
+
+
+if __name__ == "__main__":
+    main()
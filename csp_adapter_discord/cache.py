@@ -0,0 +1,118 @@
+"""Bounded cache of Discord channel objects used by the publish path.
+
+``DiscordBackend.send_message`` does a REST ``fetch_channel`` before every
+``channel.send``, so each outbound message costs two HTTP round-trips. The
+ChannelCache keeps the discord.py messageable for recently used channels so a
+send is a single request. It is warmed from the gateway's guild data, entries
+are invalidated on channel update/delete events, and a miss is resolved from
+the client's gateway state (or a partial messageable) without any HTTP call.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+__all__ = ("ChannelCache",)
+
+
+class ChannelCache:
+    """LRU cache of discord.py messageable channels keyed by channel ID.
+
+    Not thread-safe: it is only used from the session's event loop thread.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        """Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of channels to keep, least recently used are evicted first.
+        """
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be at least 1, got {maxsize}")
+        self._maxsize = maxsize
+        self._channels: "OrderedDict[str, Any]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def maxsize(self) -> int:
+        """Maximum number of cached channels."""
+        return self._maxsize
+
+    @property
+    def hits(self) -> int:
+        """Number of lookups served from the cache."""
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """Number of lookups that had to resolve the channel."""
+        return self._misses
+
+    @property
+    def evictions(self) -> int:
+        """Number of channels evicted to stay within ``maxsize``."""
+        return self._evictions
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+    def __contains__(self, channel_id: str) -> bool:
+        return str(channel_id) in self._channels
+
+    def get(self, channel_id: str) -> Optional[Any]:
+        """Get a cached channel, counting the hit or miss."""
+        channel = self._channels.get(str(channel_id))
+        if channel is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        self._channels.move_to_end(str(channel_id))
+        return channel
+
+    def put(self, channel_id: str, channel: Any) -> None:
+        """Cache a channel, evicting the least recently used if full."""
+        channel_id = str(channel_id)
+        self._channels[channel_id] = channel
+        self._channels.move_to_end(channel_id)
+        while len(self._channels) > self._maxsize:
+            self._channels.popitem(last=False)
+            self._evictions += 1
+
+    def invalidate(self, channel_id: str) -> None:
+        """Drop a channel, e.g. after it was updated or deleted."""
+        self._channels.pop(str(channel_id), None)
+
+    def clear(self) -> None:
+        """Drop every cached channel."""
+        self._channels.clear()
+
+    def warm(self, guild: Any) -> None:
+        """Cache the messageable channels and threads of a guild from gateway data."""
+        for channel in (*getattr(guild, "channels", ()), *getattr(guild, "threads", ())):
+            if hasattr(channel, "send"):
+                self.put(channel.id, channel)
+
+    def remove_guild(self, guild_id: str) -> None:
+        """Drop every channel belonging to a guild the bot left or lost."""
+        guild_id = str(guild_id)
+        for channel_id, channel in list(self._channels.items()):
+            guild = getattr(channel, "guild", None)
+            if guild is not None and str(guild.id) == guild_id:
+                del self._channels[channel_id]
+
+    def resolve(self, client: Any, channel_id: str) -> Any:
+        """Get a messageable for a channel, resolving and caching it on a miss.
+
+        Misses are resolved from the client's gateway state, falling back to a
+        partial messageable, so resolving never makes an HTTP request.
+        """
+        channel = self.get(channel_id)
+        if channel is None:
+            channel = client.get_channel(int(channel_id)) or client.get_partial_messageable(int(channel_id))
+            self.put(channel_id, channel)
+        return channel
+
+    def stats(self) -> Dict[str, int]:
+        """Get the cache counters."""
+        return {"size": len(self._channels), "hits": self._hits, "misses": self._misses, "evictions": self._evictions}
@@ -0,0 +1,525 @@
+"""Gateway shards in worker processes, handing messages over through shared memory.
+
+With ``DiscordAdapter(shards=N, shard_mode="process")`` the adapter launches one
+worker process per shard. Each worker runs an ordinary single-shard
+DiscordSession, so the gateway I/O, zlib inflation and JSON decoding happen
+outside the process running the CSP engine and its GIL. For every
+MESSAGE_CREATE the worker writes a compact binary record into a
+:class:`SharedRing`, a single-producer single-consumer ring buffer in shared
+memory, and the engine's session decodes it back into a :class:`ClusterPayload`.
+Nothing on that path is pickled. If the engine falls so far behind that a
+worker's ring fills up, the worker drops messages rather than stall its
+gateway connection.
+
+A record carries the fields of :class:`~csp_adapter_discord.structs.DiscordMessageStruct`
+plus what is needed to rebuild the channel as the worker saw it. Mentions are
+carried as user IDs only, and attachments, embeds and role mentions are not
+carried at all.
+
+Workers share an identify pacer, so their IDENTIFYs are spaced as Discord's
+``max_concurrency`` requires. They are started with the ``spawn`` method and
+wake the consumer through a pipe, so this mode needs a POSIX platform.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import struct
+import time
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, List, Optional
+
+from chatom.discord import DiscordBackend, DiscordConfig
+
+from .intents import MESSAGE_INTENTS
+from .payload import MessagePayload
+
+__all__ = ("ClusterPayload", "SharedRing", "ShardCluster", "decode_record", "encode_record")
+
+log = logging.getLogger(__name__)
+
+# write position at 0 and read position at 64, on separate cache lines
+_POSITIONS = struct.Struct("<Q")
+_READ_OFFSET = 64
+_HEADER_SIZE = 128
+_LENGTH = struct.Struct("<I")
+# Length marking that the rest of the ring is unused and the next record starts at 0
+_WRAP = 0xFFFFFFFF
+
+# id, channel_id, guild_id, author_id, parent_id, webhook_id, shard_seq, shard_id, flags,
+# channel_type, position, slowmode_delay, then the lengths of content, author name, channel name and mentions
+_RECORD = struct.Struct("<QQQQQQQHBBiIIHHH")
+_MENTION = struct.Struct("<Q")
+_BOT = 1
+_MENTION_EVERYONE = 2
+_CHANNEL_CACHED = 4
+_NSFW = 8
+
+
+class SharedRing:
+    """Single-producer single-consumer ring buffer of byte records in shared memory.
+
+    The write and read positions are byte counts that only grow, each written
+    by one side only, so no lock is needed. Records are 4-byte aligned and
+    never split: a record that does not fit before the end of the buffer is
+    written at its start, after a wrap marker.
+    """
+
+    def __init__(self, shm: SharedMemory, owner: bool):
+        self._shm = shm
+        self._owner = owner
+        self._buf = shm.buf
+        self._capacity = shm.size - _HEADER_SIZE
+        self._capacity -= self._capacity % 4
+        # Each side keeps its own position locally and only publishes it
+        self._write = _POSITIONS.unpack_from(self._buf, 0)[0]
+        self._read = _POSITIONS.unpack_from(self._buf, _READ_OFFSET)[0]
+
+    @classmethod
+    def create(cls, capacity: int) -> "SharedRing":
+        """Allocate a new ring holding up to ``capacity`` bytes of records."""
+        return cls(SharedMemory(create=True, size=_HEADER_SIZE + capacity), owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedRing":
+        """Attach to a ring created by another process."""
+        return cls(SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        """Name of the shared memory block, to attach from another process."""
+        return self._shm.name
+
+    @property
+    def capacity(self) -> int:
+        """Number of bytes available for records."""
+        return self._capacity
+
+    def __len__(self) -> int:
+        """Number of bytes written and not yet read."""
+        return _POSITIONS.unpack_from(self._buf, 0)[0] - _POSITIONS.unpack_from(self._buf, _READ_OFFSET)[0]
+
+    def write(self, record: bytes, timeout: Optional[float] = None) -> bool:
+        """Append a record, waiting for the consumer to make room if the ring is full.
+
+        Returns:
+            False if there was still no room after ``timeout`` seconds.
+        """
+        size = len(record)
+        need = _LENGTH.size + size + (-size % 4)
+        offset = self._write % self._capacity
+        tail = self._capacity - offset
+        total = need if need <= tail else tail + need
+        if total > self._capacity:
+            raise ValueError(f"Record of {size} bytes does not fit in a ring of {self._capacity} bytes")
+        if self._write + total - _POSITIONS.unpack_from(self._buf, _READ_OFFSET)[0] > self._capacity:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while self._write + total - _POSITIONS.unpack_from(self._buf, _READ_OFFSET)[0] > self._capacity:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return False
+                time.sleep(0.0005)
+        start = _HEADER_SIZE + offset
+        if need > tail:
+            _LENGTH.pack_into(self._buf, start, _WRAP)
+            self._write += tail
+            start = _HEADER_SIZE
+        self._buf[start + _LENGTH.size : start + _LENGTH.size + size] = record
+        _LENGTH.pack_into(self._buf, start, size)
+        self._write += need
+        # Publishing the position last makes the record visible to the consumer
+        _POSITIONS.pack_into(self._buf, 0, self._write)
+        return True
+
+    def read_all(self) -> List[bytes]:
+        """Take every record written so far, oldest first."""
+        end = _POSITIONS.unpack_from(self._buf, 0)[0]
+        records = []
+        read = self._read
+        while read < end:
+            offset = read % self._capacity
+            start = _HEADER_SIZE + offset
+            size = _LENGTH.unpack_from(self._buf, start)[0]
+            if size == _WRAP:
+                read += self._capacity - offset
+                continue
+            records.append(bytes(self._buf[start + _LENGTH.size : start + _LENGTH.size + size]))
+            read += _LENGTH.size + size + (-size % 4)
+        if read != self._read:
+            self._read = read
+            _POSITIONS.pack_into(self._buf, _READ_OFFSET, read)
+        return records
+
+    def close(self) -> None:
+        """Detach from the ring, freeing it if this process created it."""
+        self._buf = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+def encode_record(payload: MessagePayload, shard_id: int, shard_seq: int) -> bytes:
+    """Encode the hot fields of a MESSAGE_CREATE payload and its cached channel into a record."""
+    data = payload.data
+    author = data["author"]
+    channel = payload._channel()
+    content = data.get("content", "").encode()
+    author_name = author.get("username", "").encode()
+    mentions = [int(u["id"]) for u in data.get("mentions", ())]
+    flags = (_BOT if author.get("bot", False) else 0) | (_MENTION_EVERYONE if data.get("mention_everyone", False) else 0)
+    channel_type = position = slowmode_delay = parent_id = 0
+    channel_name = b""
+    if channel is not None:
+        flags |= _CHANNEL_CACHED | (_NSFW if getattr(channel, "nsfw", False) else 0)
+        channel_type = channel.type.value
+        position = getattr(channel, "position", 0) or 0
+        slowmode_delay = getattr(channel, "slowmode_delay", 0) or 0
+        parent_id = getattr(channel, "parent_id", None) or 0
+        channel_name = (getattr(channel, "name", None) or "").encode()
+    header = _RECORD.pack(
+        int(data["id"]),
+        int(data["channel_id"]),
+        int(data.get("guild_id") or 0),
+        int(author["id"]),
+        parent_id,
+        int(data.get("webhook_id") or 0),
+        shard_seq,
+        shard_id,
+        flags,
+        channel_type,
+        position,
+        slowmode_delay,
+        len(content),
+        len(author_name),
+        len(channel_name),
+        len(mentions),
+    )
+    return b"".join((header, content, author_name, channel_name, *(_MENTION.pack(m) for m in mentions)))
+
+
+class _Type:
+    __slots__ = ("value",)
+
+    def __init__(self, value: int):
+        self.value = value
+
+
+class _Guild:
+    __slots__ = ("id",)
+
+    def __init__(self, id: int):
+        self.id = id
+
+
+class _Channel:
+    """The attributes of a discord.py channel that a record carries."""
+
+    __slots__ = ("id", "name", "type", "guild", "parent_id", "position", "nsfw", "slowmode_delay")
+
+    def __init__(self, id: int, name: str, type: int, guild_id: int, parent_id: int, position: int, nsfw: bool, slowmode_delay: int):
+        self.id = id
+        self.name = name
+        self.type = _Type(type)
+        self.guild = _Guild(guild_id) if guild_id else None
+        self.parent_id = parent_id or None
+        self.position = position
+        self.nsfw = nsfw
+        self.slowmode_delay = slowmode_delay
+
+
+class ClusterPayload(MessagePayload):
+    """A MessagePayload decoded from a shard worker's record.
+
+    ``data`` holds the carried fields in the shape of a MESSAGE_CREATE payload,
+    and the channel comes from the worker's cache rather than this process's.
+    """
+
+    __slots__ = ("_channel_info",)
+
+    def __init__(self, data: dict, channel: Optional[_Channel]):
+        super().__init__(data)
+        self._channel_info = channel
+
+    def _channel(self) -> Any:
+        return self._channel_info
+
+
+def decode_record(record: bytes) -> ClusterPayload:
+    """Decode a record written by :func:`encode_record`."""
+    (
+        message_id,
+        channel_id,
+        guild_id,
+        author_id,
+        parent_id,
+        webhook_id,
+        shard_seq,
+        shard_id,
+        flags,
+        channel_type,
+        position,
+        slowmode_delay,
+        content_len,
+        author_len,
+        channel_name_len,
+        mention_count,
+    ) = _RECORD.unpack_from(record)
+    offset = _RECORD.size
+    content = record[offset : offset + content_len].decode()
+    offset += content_len
+    author_name = record[offset : offset + author_len].decode()
+    offset += author_len
+    channel_name = record[offset : offset + channel_name_len].decode()
+    offset += channel_name_len
+    mentions = [{"id": str(_MENTION.unpack_from(record, offset + i * _MENTION.size)[0])} for i in range(mention_count)]
+    data = {
+        "id": str(message_id),
+        "channel_id": str(channel_id),
+        "author": {"id": str(author_id), "username": author_name, "bot": bool(flags & _BOT)},
+        "content": content,
+        "mentions": mentions,
+        "mention_everyone": bool(flags & _MENTION_EVERYONE),
+    }
+    if guild_id:
+        data["guild_id"] = str(guild_id)
+    if webhook_id:
+        data["webhook_id"] = str(webhook_id)
+    channel = None
+    if flags & _CHANNEL_CACHED:
+        channel = _Channel(channel_id, channel_name, channel_type, guild_id, parent_id, position, bool(flags & _NSFW), slowmode_delay)
+    payload = ClusterPayload(data, channel)
+    payload.shard_id, payload.shard_seq = shard_id, shard_seq
+    return payload
+
+
+class _Worker:
+    """Parent-side handle of one shard worker process."""
+
+    def __init__(self, shard_id: int, ring: SharedRing, process: Any, wake: Any, control: Any):
+        self.shard_id = shard_id
+        self.ring = ring
+        self.process = process
+        self.wake = wake
+        self.control = control
+        self.ready: Optional[asyncio.Future] = None
+
+
+class _RingWriter:
+    """Worker-side ``"message_payload"`` listener writing each message into the ring.
+
+    It runs on the worker's session loop, so it never waits for the consumer
+    to make room: that would stall the gateway connection, heartbeats
+    included. A message that does not fit is dropped and counted instead, and
+    its ``shard_seq`` is skipped, so consumers see the gap.
+    """
+
+    def __init__(self, ring: SharedRing, shard_id: int, wake_fd: int):
+        self._ring = ring
+        self._shard_id = shard_id
+        self._wake_fd = wake_fd
+        self.shard_seq = 0
+        self.dropped = 0
+
+    def __call__(self, payload: MessagePayload) -> None:
+        self.shard_seq += 1
+        if not self._ring.write(encode_record(payload, self._shard_id, self.shard_seq), timeout=0):
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                log.warning(f"Shard {self._shard_id} ring is full, dropped {self.dropped} messages so far")
+            return
+        try:
+            os.write(self._wake_fd, b"\0")
+        except BlockingIOError:
+            # The pipe is full, so the consumer has wake-ups pending anyway
+            pass
+
+
+class ShardCluster:
+    """Shard worker processes feeding a DiscordSession.
+
+    Started and stopped by the session. Records are drained on the session
+    loop whenever a worker signals its wake pipe, and dispatched like the
+    session's own gateway events: as ``"message_payload"`` and, if anything
+    listens for it, as a ``"message"`` DiscordMessage.
+    """
+
+    def __init__(self, session: Any, shard_count: int, ring_size: int = 1 << 22):
+        """Initialize the cluster.
+
+        Args:
+            session: The DiscordSession to dispatch to.
+            shard_count: Number of shards, one worker process each.
+            ring_size: Bytes of shared memory per worker for records in flight.
+        """
+        self._session = session
+        self._shard_count = shard_count
+        self._ring_size = ring_size
+        self._workers: List[_Worker] = []
+
+    @property
+    def shard_count(self) -> int:
+        """Number of shard workers."""
+        return self._shard_count
+
+    def start(self, timeout: float) -> None:
+        """Launch the workers and block until each has logged in.
+
+        Raises:
+            RuntimeError: If a worker fails to log in or does not report in time.
+        """
+        from .session import _IdentifyPacer
+
+        context = multiprocessing.get_context("spawn")
+        config: DiscordConfig = self._session.backend.config
+        # Shared by the workers, so their IDENTIFYs are spaced as if they were threads of one session
+        max_concurrency = max(1, self._session._max_concurrency)
+        pacer = _IdentifyPacer(max_concurrency, context.Lock(), context.RawArray("d", max_concurrency))
+        for shard_id in range(self._shard_count):
+            ring = SharedRing.create(self._ring_size)
+            wake_read, wake_write = context.Pipe(duplex=False)
+            control, worker_control = context.Pipe()
+            process = context.Process(
+                target=_worker_main,
+                args=(
+                    config.model_copy(update={"shard_id": shard_id, "shard_count": self._shard_count}),
+                    self._session.minimal_intents,
+                    pacer,
+                    ring.name,
+                    wake_write,
+                    worker_control,
+                ),
+                name=f"discord-shard-{shard_id}",
+                daemon=True,
+            )
+            self._workers.append(_Worker(shard_id, ring, process, wake_read, control))
+            process.start()
+            wake_write.close()
+            worker_control.close()
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            if not worker.control.poll(max(0.0, deadline - time.monotonic())):
+                raise RuntimeError(f"Discord shard worker {worker.shard_id} did not connect within {timeout}s")
+            status, *detail = worker.control.recv()
+            if status != "connected":
+                raise RuntimeError(f"Discord shard worker {worker.shard_id} failed: {detail[0] if detail else status}")
+        self._session.submit(self._attach()).result()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the workers, then free their rings."""
+        loop = self._session.loop
+        if loop is not None:
+            try:
+                self._session.submit(self._detach()).result(timeout=timeout)
+            except Exception:  # noqa: BLE001
+                log.debug("Error detaching Discord shard workers", exc_info=True)
+        for worker in self._workers:
+            try:
+                worker.control.send(("stop",))
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self._workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join(timeout)
+            worker.wake.close()
+            worker.control.close()
+            worker.ring.close()
+        self._workers = []
+
+    async def wait_until_ready(self) -> None:
+        """Wait until every worker's gateway connection is ready."""
+        await asyncio.gather(*(worker.ready for worker in self._workers))
+
+    async def set_presence(self, status: str) -> None:
+        """Ask every worker to set the bot's presence on its shard."""
+        for worker in self._workers:
+            worker.control.send(("presence", status))
+
+    async def _attach(self) -> None:
+        loop = asyncio.get_running_loop()
+        for worker in self._workers:
+            worker.ready = loop.create_future()
+            loop.add_reader(worker.wake.fileno(), self._drain, worker)
+            loop.add_reader(worker.control.fileno(), self._on_control, worker)
+
+    async def _detach(self) -> None:
+        loop = asyncio.get_running_loop()
+        for worker in self._workers:
+            loop.remove_reader(worker.wake.fileno())
+            loop.remove_reader(worker.control.fileno())
+            self._drain(worker)
+
+    def _drain(self, worker: _Worker) -> None:
+        """Dispatch every record in a worker's ring, called on the session loop when it signals."""
+        try:
+            # Drain the wake bytes first: a record written after the drain below signals again
+            os.read(worker.wake.fileno(), 65536)
+        except (BlockingIOError, OSError):
+            pass
+        session = self._session
+        for record in worker.ring.read_all():
+            payload = decode_record(record)
+            if session._listeners.get("message_payload"):
+                session.dispatch("message_payload", payload)
+            if session._listeners.get("message"):
+                try:
+                    message = payload.to_message()
+                except Exception:
+                    log.exception("Failed converting Discord message")
+                    continue
+                session.dispatch("message", message)
+
+    def _on_control(self, worker: _Worker) -> None:
+        try:
+            status, *detail = worker.control.recv()
+        except (EOFError, OSError):
+            asyncio.get_running_loop().remove_reader(worker.control.fileno())
+            if worker.ready is not None and not worker.ready.done():
+                worker.ready.set_exception(RuntimeError(f"Discord shard worker {worker.shard_id} exited"))
+            return
+        if status == "ready" and not worker.ready.done():
+            worker.ready.set_result(None)
+
+
+def _worker_main(config: DiscordConfig, minimal_intents: bool, pacer: Any, ring_name: str, wake: Any, control: Any) -> None:
+    """Entry point of a shard worker process: run one shard and write its messages into the ring."""
+    from .session import DiscordSession
+
+    ring = SharedRing.attach(ring_name)
+    wake_fd = wake.fileno()
+    os.set_blocking(wake_fd, False)
+    session = DiscordSession(DiscordBackend(config=config), minimal_intents=minimal_intents)
+    session._identify_pacer = pacer
+    session.require_message_payloads()
+    session.require_intents(*MESSAGE_INTENTS)
+    session.add_listener("message_payload", _RingWriter(ring, config.shard_id, wake_fd))
+
+    async def report_ready() -> None:
+        if await session.wait_until_ready(config.timeout):
+            control.send(("ready",))
+
+    try:
+        session.start()
+    except Exception as e:
+        control.send(("error", repr(e)))
+        ring.close()
+        return
+    control.send(("connected",))
+    session.submit(report_ready())
+    try:
+        while True:
+            try:
+                command, *args = control.recv()
+            except EOFError:
+                break
+            if command == "stop":
+                break
+            if command == "presence":
+                try:
+                    session.submit(session.set_presence(args[0])).result(config.timeout)
+                except Exception:
+                    log.exception("Failed setting presence")
+    finally:
+        session.stop()
+        ring.close()
@@ -0,0 +1,126 @@
+"""Routing of messages to per-command time series.
+
+A :class:`CommandRouter` matches every message once against all commands:
+prefix commands (``"!ping"``) with a character trie walked over the start of
+the content, and regex commands with one compiled expression each.
+:func:`route_commands` applies it in one node and ticks a dict basket with
+one time series per command, instead of one filtering node per command each
+testing every message.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Sequence, TypeVar
+
+import csp
+from csp import ts
+
+__all__ = ("CommandRouter", "route_commands")
+
+T = TypeVar("T")
+
+# Marks the trie node at which a prefix ends
+_END = ""
+
+
+class CommandRouter:
+    """Match message content against many prefix and regex commands at once.
+
+    A prefix matches at the start of the content when it is followed by the end
+    of the content or whitespace, so ``"!ping"`` matches ``"!ping 3"`` but not
+    ``"!pingall"``. When several prefixes match, the longest wins. Prefix commands
+    are tried before regex commands. Each regex is searched for (``re.search``)
+    on its own, so patterns may use backreferences and inline flags; the match
+    starting earliest in the content wins, and among matches at the same
+    position the pattern given first wins.
+    """
+
+    def __init__(self, prefixes: Sequence[str] = (), patterns: Optional[Dict[str, str]] = None, ignore_case: bool = False):
+        """Compile the commands.
+
+        Args:
+            prefixes: Prefix commands; each is also its key.
+            patterns: Regex commands, key to pattern.
+            ignore_case: If True, match prefixes and patterns case-insensitively.
+        """
+        patterns = dict(patterns or {})
+        overlap = set(prefixes) & set(patterns)
+        if overlap:
+            raise ValueError(f"Command keys must be unique, got both a prefix and a pattern for {sorted(overlap)}")
+        self._keys = list(dict.fromkeys([*prefixes, *patterns]))
+        self._trie: dict = {}
+        self._max_prefix = 0
+        self._prefix_match = None
+        if any(not prefix for prefix in prefixes):
+            raise ValueError("Command prefixes must not be empty")
+        if ignore_case:
+            # Case folding can change the length of the content, so it is left to re rather than walked in the trie
+            ordered = sorted(dict.fromkeys(prefixes), key=len, reverse=True)
+            self._prefix_keys = {f"_cmd{i}": prefix for i, prefix in enumerate(ordered)}
+            alternatives = "|".join(f"(?P<{group}>{re.escape(prefix)})" for group, prefix in self._prefix_keys.items())
+            if alternatives:
+                self._prefix_match = re.compile(rf"(?:{alternatives})(?=\s|\Z)", re.IGNORECASE).match
+        else:
+            for prefix in prefixes:
+                node = self._trie
+                for char in prefix:
+                    node = node.setdefault(char, {})
+                node[_END] = prefix
+                self._max_prefix = max(self._max_prefix, len(prefix))
+        flags = re.IGNORECASE if ignore_case else 0
+        self._searches = [(key, re.compile(pattern, flags).search) for key, pattern in patterns.items()]
+
+    @property
+    def keys(self) -> List[str]:
+        """Command keys, prefixes first, in the order given."""
+        return list(self._keys)
+
+    def match(self, content: str) -> Optional[str]:
+        """Get the key of the command the content matches, or None."""
+        if self._trie:
+            node, found = self._trie, None
+            for i, char in enumerate(content[: self._max_prefix]):
+                node = node.get(char)
+                if node is None:
+                    break
+                if _END in node and (i + 1 == len(content) or content[i + 1].isspace()):
+                    found = node[_END]
+            if found is not None:
+                return found
+        elif self._prefix_match is not None:
+            m = self._prefix_match(content)
+            if m is not None:
+                return self._prefix_keys[m.lastgroup]
+        best, best_start = None, len(content) + 1
+        for key, search in self._searches:
+            m = search(content)
+            if m is not None and m.start() < best_start:
+                best, best_start = key, m.start()
+                if best_start == 0:
+                    break
+        return best
+
+
+@csp.node
+def route_commands(msgs: ts[[T]], router: object, keys: [str]) -> csp.OutputBasket(Dict[str, ts[[T]]], shape="keys"):
+    """Split a message stream into one time series per command.
+
+    Works on any message type with a ``content`` attribute (DiscordMessage,
+    MessagePayload, LazyDiscordMessage, DiscordMessageStruct). Messages that
+    match no command are dropped.
+
+    Args:
+        msgs: Time series of message lists, e.g. from ``DiscordAdapter.subscribe``.
+        router: The CommandRouter to match with.
+        keys: ``router.keys``, the keys of the output basket.
+
+    Returns:
+        Dict basket of message lists keyed by command.
+    """
+    if csp.ticked(msgs):
+        routed: Dict[str, List[Any]] = {}
+        for msg in msgs:
+            key = router.match(msg.content or "")
+            if key is not None:
+                routed.setdefault(key, []).append(msg)
+        if routed:
+            csp.output(routed)
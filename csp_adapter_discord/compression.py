@@ -0,0 +1,118 @@
+"""Gateway transport decompression with reused buffers and byte counters.
+
+discord.py negotiates transport compression for the gateway (``zstd-stream``
+when a zstd module is installed, ``zlib-stream`` otherwise) and inflates each
+frame through ``discord.utils._ActiveDecompressionContext``. :func:`install`
+replaces that context with :class:`GatewayDecompressor`, which does the same
+work without allocating a fresh input buffer per frame and counts the bytes
+received and inflated. Counters are kept per event loop, so each session (and
+each of its shards) can read its own with :func:`track`.
+"""
+
+import asyncio
+import weakref
+import zlib
+from typing import Optional
+
+import discord.utils
+
+__all__ = ("GatewayCounters", "GatewayDecompressor", "install", "track")
+
+# discord.py's own context, which also tells which compression it negotiates
+_BASE = discord.utils._ActiveDecompressionContext
+# zlib-stream messages end with the Z_SYNC_FLUSH marker
+_SYNC_FLUSH = b"\x00\x00\xff\xff"
+
+_counters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, GatewayCounters]" = weakref.WeakKeyDictionary()
+
+
+class GatewayCounters:
+    """Running totals of the compressed gateway traffic of one event loop.
+
+    Attributes:
+        frames: Gateway messages inflated.
+        bytes_in: Compressed bytes received.
+        bytes_decompressed: Bytes after decompression.
+    """
+
+    __slots__ = ("frames", "bytes_in", "bytes_decompressed")
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes_in = 0
+        self.bytes_decompressed = 0
+
+
+def track(loop: asyncio.AbstractEventLoop, counters: GatewayCounters) -> None:
+    """Count the gateway traffic of connections opened on ``loop`` into ``counters``."""
+    _counters[loop] = counters
+
+
+class GatewayDecompressor:
+    """Drop-in for discord.py's gateway decompression context.
+
+    For ``zlib-stream``, a message that arrives whole (the usual case) is
+    inflated straight from the WebSocket frame without copying it. Partial
+    messages are accumulated in a buffer that is kept and reused for the
+    life of the connection instead of being reallocated per message.
+    For ``zstd-stream`` every WebSocket message is a complete frame and is
+    inflated directly.
+    """
+
+    __slots__ = ("_inflate", "_buffer", "_size", "_counters")
+
+    COMPRESSION_TYPE: str = _BASE.COMPRESSION_TYPE
+
+    def __init__(self, initial_buffer: int = 64 * 1024):
+        """Initialize the context, counting into the counters tracked for the running loop.
+
+        Args:
+            initial_buffer: Initial size in bytes of the buffer for partial messages.
+        """
+        if self.COMPRESSION_TYPE == "zlib-stream":
+            self._inflate = zlib.decompressobj().decompress
+        else:
+            self._inflate = _BASE().decompressor.decompress
+        self._buffer = bytearray(initial_buffer)
+        self._size = 0
+        try:
+            loop: Optional[asyncio.AbstractEventLoop] = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        counters = _counters.get(loop) if loop is not None else None
+        self._counters = counters if counters is not None else GatewayCounters()
+
+    def decompress(self, data: bytes, /) -> Optional[str]:
+        """Inflate a WebSocket message, returning the gateway message once it is complete."""
+        counters = self._counters
+        counters.bytes_in += len(data)
+        if self.COMPRESSION_TYPE != "zlib-stream":
+            raw = self._inflate(data)
+        elif self._size == 0 and data[-4:] == _SYNC_FLUSH:
+            raw = self._inflate(data)
+        else:
+            end = self._size + len(data)
+            if end <= len(self._buffer):
+                self._buffer[self._size : end] = data
+            else:
+                # Grow once and keep the larger buffer for the next messages
+                del self._buffer[self._size :]
+                self._buffer += data
+            self._size = end
+            if data[-4:] != _SYNC_FLUSH:
+                return None
+            with memoryview(self._buffer) as view, view[:end] as message:
+                raw = self._inflate(message)
+            self._size = 0
+        counters.frames += 1
+        counters.bytes_decompressed += len(raw)
+        return raw.decode("utf-8")
+
+
+def install() -> None:
+    """Make discord.py use GatewayDecompressor for every gateway connection opened from now on.
+
+    The setting is process-wide and idempotent; connections already open keep
+    their context.
+    """
+    discord.utils._ActiveDecompressionContext = GatewayDecompressor
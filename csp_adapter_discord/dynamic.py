@@ -0,0 +1,99 @@
+"""Dynamic per-conversation baskets for ``csp.dynamic``.
+
+Turns a subscribe stream into a ``csp.DynamicBasket`` keyed by conversation
+(channel, guild or thread). A key is added the first time a conversation
+sends a message and removed once it has been idle for ``idle_timeout``, so a
+``csp.dynamic`` sub-graph per conversation is created on demand and torn down,
+state and all, when the conversation goes quiet.
+"""
+
+from datetime import timedelta
+from typing import Callable, List, Union
+
+import csp
+from chatom.discord import DiscordMessage
+from csp import ts
+
+__all__ = ("conversation_key", "conversations")
+
+_KEY_BY = ("channel", "guild", "thread")
+
+
+def conversation_key(message: DiscordMessage, key_by: Union[str, Callable[[DiscordMessage], str]] = "channel") -> str:
+    """Get the conversation key of a message.
+
+    Args:
+        message: The message.
+        key_by: ``"channel"``, ``"guild"``, ``"thread"`` or a callable returning the key.
+            ``"guild"`` falls back to the channel for DMs; ``"thread"`` uses the thread when the
+            message is in one and the channel otherwise.
+
+    Returns:
+        The key, or an empty string if the message has none.
+    """
+    if callable(key_by):
+        return key_by(message)
+    if key_by == "channel":
+        return message.channel_id
+    if key_by == "guild":
+        return message.guild.id if message.guild is not None and message.guild.id else message.channel_id
+    if key_by == "thread":
+        return message.thread_id or message.channel_id
+    raise ValueError(f"key_by must be one of {_KEY_BY} or a callable, got {key_by!r}")
+
+
+@csp.node
+def conversations(
+    msgs: ts[[DiscordMessage]],
+    key_by: object = "channel",
+    idle_timeout: timedelta = timedelta(minutes=30),
+) -> csp.DynamicBasket[str, List[DiscordMessage]]:
+    """Demultiplex messages into a dynamic basket keyed by conversation.
+
+    Args:
+        msgs: Time series of DiscordMessage lists, e.g. from ``DiscordAdapter.subscribe``.
+        key_by: How to key conversations, see :func:`conversation_key`.
+        idle_timeout: Remove a key once its conversation has had no messages for this long.
+
+    Returns:
+        Dynamic basket of DiscordMessage lists keyed by conversation.
+
+    Example:
+        >>> @csp.graph
+        ... def conversation(key: str, msgs: ts[[DiscordMessage]]) -> ts[DiscordMessage]:
+        ...     ...
+        >>>
+        >>> @csp.graph
+        ... def my_graph():
+        ...     basket = conversations(adapter.subscribe(), key_by="thread", idle_timeout=timedelta(minutes=10))
+        ...     replies = csp.dynamic(basket, conversation, csp.snapkey(), csp.attach())
+    """
+    with csp.alarms():
+        a_idle = csp.alarm(str)
+
+    with csp.state():
+        s_idle_handles = {}
+
+    with csp.start():
+        if not callable(key_by) and key_by not in _KEY_BY:
+            raise ValueError(f"key_by must be one of {_KEY_BY} or a callable, got {key_by!r}")
+
+    grouped = {}
+    if csp.ticked(msgs):
+        for msg in msgs:
+            key = conversation_key(msg, key_by)
+            if key:
+                grouped.setdefault(key, []).append(msg)
+
+    if csp.ticked(a_idle):
+        del s_idle_handles[a_idle]
+        if a_idle not in grouped:
+            csp.remove_dynamic_key(a_idle)
+
+    if grouped:
+        for key in grouped:
+            if key in s_idle_handles:
+                s_idle_handles[key] = csp.reschedule_alarm(a_idle, s_idle_handles[key], idle_timeout)
+            else:
+                s_idle_handles[key] = csp.schedule_alarm(a_idle, idle_timeout, key)
+        csp.output(grouped)
@@ -0,0 +1,70 @@
+"""Declarative message filters evaluated on the raw gateway payload.
+
+A :class:`MessageFilter` passed to ``DiscordAdapter.subscribe`` is compiled
+once into a single predicate over the MESSAGE_CREATE dict, which runs before
+any message model is built. Checks are ordered from cheapest to most
+expensive, and only the ones the filter sets are compiled in.
+
+Example:
+    >>> commands = MessageFilter(prefixes=["!"], bots=False)
+    >>> adapter.subscribe(message_filter=commands)
+"""
+
+import re
+from typing import Callable, List, Optional, Set
+
+from pydantic import BaseModel, Field
+
+__all__ = ("MessageFilter",)
+
+
+class MessageFilter(BaseModel):
+    """Which messages a subscription receives. Unset fields do not filter."""
+
+    channel_ids: Set[str] = Field(default_factory=set, description="Channel IDs to accept")
+    guild_ids: Set[str] = Field(default_factory=set, description="Guild IDs to accept")
+    authors: Set[str] = Field(default_factory=set, description="Author IDs to accept")
+    exclude_authors: Set[str] = Field(default_factory=set, description="Author IDs to reject")
+    bots: bool = Field(default=True, description="Whether to accept messages from bots and webhooks")
+    prefixes: List[str] = Field(default_factory=list, description="Accept only content starting with one of these")
+    pattern: Optional[str] = Field(default=None, description="Accept only content matching this regex (re.search)")
+    mentions_me: bool = Field(default=False, description="Accept only messages mentioning the bot")
+
+    def compile(self, bot_user_id: Callable[[], Optional[str]] = lambda: None) -> Callable[[dict], bool]:
+        """Build the predicate over a MESSAGE_CREATE payload.
+
+        Args:
+            bot_user_id: Returns the bot's user ID, for ``mentions_me``.
+
+        Returns:
+            A function of the payload dict returning whether the message is accepted.
+        """
+        checks: List[Callable[[dict], bool]] = []
+        if self.channel_ids:
+            channel_ids = frozenset(self.channel_ids)
+            checks.append(lambda d: d["channel_id"] in channel_ids)
+        if self.guild_ids:
+            guild_ids = frozenset(self.guild_ids)
+            checks.append(lambda d: d.get("guild_id") in guild_ids)
+        if self.authors:
+            authors = frozenset(self.authors)
+            checks.append(lambda d: d["author"]["id"] in authors)
+        if self.exclude_authors:
+            exclude_authors = frozenset(self.exclude_authors)
+            checks.append(lambda d: d["author"]["id"] not in exclude_authors)
+        if not self.bots:
+            checks.append(lambda d: not d["author"].get("bot", False) and d.get("webhook_id") is None)
+        if self.prefixes:
+            prefixes = tuple(self.prefixes)
+            checks.append(lambda d: d.get("content", "").startswith(prefixes))
+        if self.mentions_me:
+            checks.append(lambda d: any(u["id"] == bot_user_id() for u in d.get("mentions", ())))
+        if self.pattern is not None:
+            search = re.compile(self.pattern).search
+            checks.append(lambda d: search(d.get("content", "")) is not None)
+
+        if not checks:
+            return lambda d: True
+        if len(checks) == 1:
+            return checks[0]
+        return lambda d: all(check(d) for check in checks)
@@ -0,0 +1,56 @@
+"""Gateway intents derived from the inputs wired into a graph.
+
+Discord only sends a connection the events of the intents it identified
+with, so every intent enabled but not consumed costs gateway traffic and
+decode time. Inputs declare the intents they need while the graph is built
+(see :meth:`~csp_adapter_discord.session.DiscordSession.require_intents`),
+and with ``minimal_intents=True`` the session connects with the configured
+intents narrowed down to those.
+"""
+
+from collections.abc import Iterable
+
+import discord
+
+__all__ = ("BASE_INTENTS", "DELETE_INTENTS", "MESSAGE_INTENTS", "REACTION_INTENTS", "intent_names", "intents_from_names", "apply_intents")
+
+#: Needed by every gateway connection: discord.py builds its guild and channel cache from them
+BASE_INTENTS = ("guilds",)
+#: Needed by inputs reading messages, in guild channels and in DMs
+MESSAGE_INTENTS = ("guild_messages", "dm_messages", "message_content")
+#: Needed by inputs reading message deletes, which carry no content
+DELETE_INTENTS = ("guild_messages", "dm_messages")
+#: Needed by inputs reading reactions
+REACTION_INTENTS = ("guild_reactions", "dm_reactions")
+
+
+def intents_from_names(names: Iterable[str]) -> discord.Intents:
+    """Build Intents with only the named flags (or aliases such as ``"messages"``) enabled.
+
+    Unknown names are ignored, as chatom does for ``DiscordConfig.intents``.
+    """
+    intents = discord.Intents.none()
+    for name in names:
+        if hasattr(intents, name):
+            setattr(intents, name, True)
+    return intents
+
+
+def intent_names(intents: discord.Intents) -> frozenset[str]:
+    """Get the names of the flags enabled in ``intents``, without aliases."""
+    return frozenset(name for name, enabled in intents if enabled)
+
+
+def apply_intents(client: discord.Client, intents: discord.Intents) -> None:
+    """Make a client that has not connected yet identify with ``intents``.
+
+    chatom creates the client itself, so the intents are swapped in afterwards,
+    along with the state discord.py derives from them when the client is created.
+    """
+    state = client._connection
+    state._intents = intents
+    state._chunk_guilds = intents.members
+    state.member_cache_flags = discord.MemberCacheFlags.from_intents(intents)
+    if not intents.members or state.member_cache_flags._empty:
+        state.store_user = state.store_user_no_intents
+    state.raw_presence_flag = not intents.members and intents.presences
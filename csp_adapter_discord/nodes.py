@@ -0,0 +1,1149 @@
+"""CSP adapter implementations backed by a shared DiscordSession.
+
+Every input and output created from a DiscordAdapter is managed by a single
+DiscordAdapterManagerImpl, which starts the adapter's DiscordSession before
+any of them start and stops it after all of them have stopped.
+"""
+
+import asyncio
+import heapq
+import io
+import logging
+import threading
+from collections import OrderedDict, deque
+from datetime import UTC, datetime, timedelta
+from typing import Any, Callable, Optional, Set
+
+import discord
+from chatom.base import Organization
+from chatom.discord import DiscordChannel, DiscordMessage, DiscordUser
+from csp.impl.adaptermanager import AdapterManagerImpl
+from csp.impl.outputadapter import OutputAdapter
+from csp.impl.pushadapter import PushInputAdapter
+
+from .batching import merge_messages
+from .filters import MessageFilter
+from .intents import DELETE_INTENTS, MESSAGE_INTENTS, REACTION_INTENTS
+from .payload import LazyDiscordMessage, MessagePayload
+from .recording import RecordingWriter
+from .session import DiscordSession, _message_from_discord
+from .structs import DiscordMessageEvent, DiscordMessageStruct, GatewayStats, PublishStats
+
+__all__ = (
+    "OVERFLOW_POLICIES",
+    "DiscordAdapterManagerImpl",
+    "DiscordChannelReaderImpl",
+    "DiscordFilteredReaderImpl",
+    "DiscordGatewayStatsReaderImpl",
+    "DiscordHistoryReaderImpl",
+    "DiscordLazyReaderImpl",
+    "DiscordMessageEventReaderImpl",
+    "DiscordMessageReaderImpl",
+    "DiscordMessageWriterImpl",
+    "DiscordPayloadReaderImpl",
+    "DiscordPresenceWriterImpl",
+    "DiscordPublishStatsReaderImpl",
+    "DiscordRecorderImpl",
+    "DiscordStructReaderImpl",
+)
+
+log = logging.getLogger(__name__)
+
+#: Gateway intents needed by each kind of DiscordMessageEventReaderImpl
+_EVENT_INTENTS = {"reaction": REACTION_INTENTS, "edit": MESSAGE_INTENTS, "delete": DELETE_INTENTS}
+
+# Seconds an input waits on the session loop while stopping
+_STOP_TIMEOUT = 5.0
+# Seconds between checks that the session is alive while publish blocks on a full queue
+_BLOCK_POLL_INTERVAL = 0.5
+
+#: What ``publish`` does with a message when its queue is full
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_newest", "coalesce")
+
+
+def _split_channels(channels: Set[str]) -> tuple[frozenset, frozenset]:
+    """Split a channel filter into a set of snowflake IDs and a set of lowercase names."""
+    ids, names = set(), set()
+    for channel in channels or ():
+        channel = str(channel).strip()
+        if channel.isdigit():
+            ids.add(channel)
+        elif channel:
+            names.add(channel.lstrip("#").lower())
+    return frozenset(ids), frozenset(names)
+
+
+class DiscordAdapterManagerImpl(AdapterManagerImpl):
+    """Engine-side manager that owns the lifetime of the shared session."""
+
+    def __init__(self, engine, session: DiscordSession):
+        """Initialize the manager.
+
+        Args:
+            engine: The CSP engine.
+            session: The adapter's shared DiscordSession.
+        """
+        super().__init__(engine)
+        self._session = session
+        self._channel_demux: Optional[_ChannelDemux] = None
+        self._writers: list["DiscordMessageWriterImpl"] = []
+
+    @property
+    def session(self) -> DiscordSession:
+        """Get the shared session."""
+        return self._session
+
+    @property
+    def channel_demux(self) -> "_ChannelDemux":
+        """Get the demultiplexer shared by per-channel readers, created on first use."""
+        if self._channel_demux is None:
+            self._channel_demux = _ChannelDemux(self._session)
+        return self._channel_demux
+
+    @property
+    def writers(self) -> list["DiscordMessageWriterImpl"]:
+        """Get the message writers created for this adapter."""
+        return self._writers
+
+    def publish_stats(self) -> PublishStats:
+        """Get the outbound queue counters summed over every message writer."""
+        stats = PublishStats(depth=0, dropped=0, coalesced=0, sent=0, failed=0)
+        for writer in self._writers:
+            for field, value in writer.stats().items():
+                setattr(stats, field, getattr(stats, field) + value)
+        return stats
+
+    def start(self, starttime, endtime):
+        """Connect the shared session."""
+        self._session.start()
+
+    def stop(self):
+        """Disconnect the shared session."""
+        self._session.stop()
+
+    def process_next_sim_timeslice(self, now):
+        """Realtime only, there is never simulated data to process."""
+        return None
+
+
+class DiscordMessageReaderImpl(PushInputAdapter):
+    """Push adapter that ticks messages received on the shared gateway connection.
+
+    All readers share the session's single gateway listener. A channel filter
+    is a pair of sets (snowflake IDs and lowercase names), so checking a message
+    is a couple of O(1) lookups however many channels are subscribed. Messages
+    in a thread are accepted when the thread's parent channel is subscribed.
+
+    By default each message is pushed into CSP from the gateway callback that
+    received it. With ``max_latency`` set, messages are micro-batched instead:
+    a batch is pushed when it reaches ``max_batch`` messages or when its first
+    message has waited ``max_latency``, whichever comes first. Within
+    ``max_latency`` of the engine's end time messages are pushed right away,
+    since ticks pushed once the engine stops are never processed.
+    """
+
+    def __init__(
+        self,
+        manager: DiscordAdapterManagerImpl,
+        channels: Set[str],
+        skip_own: bool,
+        skip_history: bool,
+        max_latency: Optional[timedelta] = None,
+        max_batch: int = 0,
+    ):
+        """Initialize the reader.
+
+        Args:
+            manager: The adapter manager owning the shared session.
+            channels: Channel IDs or names to accept, empty for all.
+            skip_own: If True, skip messages from the bot itself.
+            skip_history: If True, skip messages created before the reader started.
+            max_latency: If set, hold messages for at most this long to push them in batches.
+            max_batch: With ``max_latency``, push as soon as this many messages are pending (0 for no limit).
+        """
+        self._session = manager.session
+        self._channel_ids, self._channel_names = _split_channels(channels)
+        self._filter_channels = bool(self._channel_ids or self._channel_names)
+        self._skip_own = skip_own
+        self._skip_history = skip_history
+        self._max_latency = max_latency.total_seconds() if max_latency else 0.0
+        self._max_batch = max_batch
+        self._pending: list[DiscordMessage] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._drain_handle: Optional[asyncio.TimerHandle] = None
+        self._draining = False
+        self._start_time: Optional[datetime] = None
+        self._session.require_gateway()
+        self._session.require_intents(*MESSAGE_INTENTS)
+
+    def start(self, starttime, endtime):
+        """Register with the session and signal that the adapter is live."""
+        self._start_time = datetime.now(UTC)
+        self._draining = False
+        self._listen()
+        if self._max_latency:
+            drain_in = (endtime - self._start_time.replace(tzinfo=None)).total_seconds() - self._max_latency
+            self._session.call_soon(self._schedule_drain, max(drain_in, 0.0))
+        # Push an initial empty tick so CSP doesn't exit before any messages arrive
+        self.push_tick([])
+
+    def stop(self):
+        """Unregister from the session and push the pending micro-batch, if any."""
+        self._unlisten()
+        if not self._max_latency:
+            return
+        # The timer and the batch belong to the session loop, so flush there and wait for it
+        try:
+            self._session.submit(self._final_flush()).result(timeout=_STOP_TIMEOUT)
+        except RuntimeError:
+            # The session loop is already gone, and with it the timer
+            pass
+        except TimeoutError:
+            log.warning("Timed out flushing pending Discord messages on stop")
+
+    async def _final_flush(self) -> None:
+        """Cancel the timers and push what is pending, on the session loop."""
+        if self._drain_handle is not None:
+            self._drain_handle.cancel()
+            self._drain_handle = None
+        self._flush()
+
+    def _schedule_drain(self, delay: float) -> None:
+        """Stop batching ``delay`` seconds from now, called on the session loop thread."""
+        self._drain_handle = self._session.loop.call_later(delay, self._drain)
+
+    def _drain(self) -> None:
+        """Push the pending micro-batch and every later message right away, as the engine is about to end."""
+        self._drain_handle = None
+        self._draining = True
+        self._flush()
+
+    def _listen(self) -> None:
+        """Start receiving messages."""
+        self._session.add_listener("message", self._on_message)
+
+    def _unlisten(self) -> None:
+        """Stop receiving messages."""
+        self._session.remove_listener("message", self._on_message)
+
+    def _accept(self, message: DiscordMessage) -> bool:
+        """Apply this reader's channel, own-message and history filters."""
+        if self._filter_channels and not self._accept_channel(message):
+            return False
+        if self._skip_own:
+            bot_user_id = self._session.bot_user_id
+            if bot_user_id and message.author_id == bot_user_id:
+                return False
+        if self._skip_history and message.created_at is not None and message.created_at < self._start_time:
+            return False
+        return True
+
+    def _accept_channel(self, message: DiscordMessage) -> bool:
+        """Whether the message's channel, or its thread's parent channel, is subscribed."""
+        channel_id = message.channel_id
+        if channel_id in self._channel_ids or message.metadata.get("parent_channel_id") in self._channel_ids:
+            return True
+        return bool(self._channel_names) and message.channel_name.lower() in self._channel_names
+
+    def _on_message(self, message: DiscordMessage) -> None:
+        """Session listener, called on the session loop thread."""
+        if self._accept(message):
+            self._deliver(message)
+
+    def _deliver(self, message: Any) -> None:
+        """Push an accepted message, or add it to the pending micro-batch."""
+        if not self._max_latency or self._draining:
+            self.push_tick([message])
+            return
+        self._pending.append(message)
+        if self._max_batch and len(self._pending) >= self._max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = self._session.loop.call_later(self._max_latency, self._flush)
+
+    def _flush(self) -> None:
+        """Push the pending micro-batch, called on the session loop thread."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._pending:
+            batch, self._pending = self._pending, []
+            self.push_tick(batch)
+
+
+class DiscordPayloadReaderImpl(DiscordMessageReaderImpl):
+    """Push adapter that ticks raw MESSAGE_CREATE payloads instead of DiscordMessages.
+
+    Filters read the payload dict directly, so a message that is filtered out
+    costs a few lookups and no model is ever built for it.
+    """
+
+    def __init__(
+        self,
+        manager: DiscordAdapterManagerImpl,
+        channels: Set[str],
+        skip_own: bool,
+        skip_history: bool,
+        max_latency: Optional[timedelta] = None,
+        max_batch: int = 0,
+        message_filter: Optional[MessageFilter] = None,
+    ):
+        """Initialize the reader.
+
+        Args:
+            manager: The adapter manager owning the shared session.
+            channels: Channel IDs or names to accept, empty for all.
+            skip_own: If True, skip messages from the bot itself.
+            skip_history: If True, skip messages created before the reader started.
+            max_latency: If set, hold messages for at most this long to push them in batches.
+            max_batch: With ``max_latency``, push as soon as this many messages are pending (0 for no limit).
+            message_filter: Optional filter evaluated on the payload before anything else.
+        """
+        super().__init__(manager, channels, skip_own, skip_history, max_latency, max_batch)
+        self._filter = message_filter.compile(lambda: self._session.bot_user_id) if message_filter is not None else None
+        self._session.require_message_payloads()
+
+    def _accept(self, message: MessagePayload) -> bool:
+        if self._filter is not None and not self._filter(message.data):
+            return False
+        return super()._accept(message)
+
+    def _listen(self) -> None:
+        self._session.add_listener("message_payload", self._on_message)
+
+    def _unlisten(self) -> None:
+        self._session.remove_listener("message_payload", self._on_message)
+
+    def _accept_channel(self, message: MessagePayload) -> bool:
+        if message.channel_id in self._channel_ids:
+            return True
+        if self._channel_ids and message.parent_channel_id in self._channel_ids:
+            return True
+        return bool(self._channel_names) and message.channel_name.lower() in self._channel_names
+
+
+class DiscordFilteredReaderImpl(DiscordPayloadReaderImpl):
+    """Push adapter that ticks DiscordMessages, converting only the payloads that pass its filters."""
+
+    def _on_message(self, message: MessagePayload) -> None:
+        if self._accept(message):
+            self._deliver(message.to_message())
+
+
+class DiscordLazyReaderImpl(DiscordPayloadReaderImpl):
+    """Push adapter that ticks LazyDiscordMessages, filtered on the payload before they are created."""
+
+    def _on_message(self, message: MessagePayload) -> None:
+        if self._accept(message):
+            self._deliver(LazyDiscordMessage(message))
+
+
+class DiscordStructReaderImpl(DiscordPayloadReaderImpl):
+    """Push adapter that ticks DiscordMessageStructs read straight from the payload."""
+
+    def _on_message(self, message: MessagePayload) -> None:
+        if self._accept(message):
+            self._deliver(DiscordMessageStruct.from_payload(message))
+
+
+class DiscordMessageEventReaderImpl(PushInputAdapter):
+    """Push adapter that ticks the reactions, edits or deletes seen on the shared gateway connection.
+
+    The session builds the events straight from the gateway payloads (see
+    :meth:`DiscordSession.require_message_events`), so no discord.py model is
+    converted for them. Channels are filtered as for messages.
+    """
+
+    def __init__(self, manager: DiscordAdapterManagerImpl, event: str, channels: Set[str]):
+        """Initialize the reader.
+
+        Args:
+            manager: The adapter manager owning the shared session.
+            event: Session event to tick: ``"reaction"``, ``"edit"`` or ``"delete"``.
+            channels: Channel IDs or names to accept, empty for all.
+        """
+        self._session = manager.session
+        self._event = event
+        self._channel_ids, self._channel_names = _split_channels(channels)
+        self._filter_channels = bool(self._channel_ids or self._channel_names)
+        self._session.require_message_events()
+        self._session.require_intents(*_EVENT_INTENTS[event])
+
+    def start(self, starttime, endtime):
+        """Register with the session and signal that the adapter is live."""
+        self._session.add_listener(self._event, self._on_event)
+        # Push an initial empty tick so CSP doesn't exit before any events arrive
+        self.push_tick([])
+
+    def stop(self):
+        """Unregister from the session."""
+        self._session.remove_listener(self._event, self._on_event)
+
+    def _on_event(self, event: DiscordMessageEvent) -> None:
+        """Session listener, called on the session loop thread."""
+        if self._filter_channels and not (
+            event.channel_id in self._channel_ids or event.parent_channel_id in self._channel_ids or event.channel_name.lower() in self._channel_names
+        ):
+            return
+        self.push_tick([event])
+
+
+class _ChannelDemux:
+    """Routes each message to the per-channel readers subscribed to its channel.
+
+    One session listener serves every per-channel reader of an engine, so a
+    message costs a few dict lookups and only wakes the readers for its channel.
+    """
+
+    def __init__(self, session: DiscordSession):
+        self._session = session
+        self._by_id: dict[str, list[DiscordMessageReaderImpl]] = {}
+        self._by_name: dict[str, list[DiscordMessageReaderImpl]] = {}
+
+    def add(self, reader: "DiscordChannelReaderImpl") -> None:
+        """Route messages for the reader's channel to it."""
+        if not self._by_id and not self._by_name:
+            self._session.add_listener("message", self._on_message)
+        for channel_id in reader._channel_ids:
+            self._by_id.setdefault(channel_id, []).append(reader)
+        for name in reader._channel_names:
+            self._by_name.setdefault(name, []).append(reader)
+
+    def remove(self, reader: "DiscordChannelReaderImpl") -> None:
+        """Stop routing messages to the reader."""
+        for routes in (self._by_id, self._by_name):
+            for key in [key for key, readers in routes.items() if reader in readers]:
+                routes[key] = [r for r in routes[key] if r is not reader]
+                if not routes[key]:
+                    del routes[key]
+        if not self._by_id and not self._by_name:
+            self._session.remove_listener("message", self._on_message)
+
+    def _on_message(self, message: DiscordMessage) -> None:
+        """Session listener, called on the session loop thread."""
+        readers = self._by_id.get(message.channel_id, [])
+        parent_id = message.metadata.get("parent_channel_id")
+        if parent_id is not None:
+            readers = readers + self._by_id.get(parent_id, [])
+        if self._by_name:
+            readers = readers + self._by_name.get(message.channel_name.lower(), [])
+        for reader in readers:
+            reader._on_message(message)
+
+
+class DiscordChannelReaderImpl(DiscordMessageReaderImpl):
+    """Push adapter for a single channel, one element of a per-channel dict basket.
+
+    Messages are routed to it by the manager's channel demultiplexer instead of
+    being filtered by every reader.
+    """
+
+    def __init__(
+        self,
+        manager: DiscordAdapterManagerImpl,
+        channel: str,
+        skip_own: bool,
+        skip_history: bool,
+        max_latency: Optional[timedelta] = None,
+        max_batch: int = 0,
+    ):
+        """Initialize the reader.
+
+        Args:
+            manager: The adapter manager owning the shared session.
+            channel: Channel ID or name to read.
+            skip_own: If True, skip messages from the bot itself.
+            skip_history: If True, skip messages created before the reader started.
+            max_latency: If set, hold messages for at most this long to push them in batches.
+            max_batch: With ``max_latency``, push as soon as this many messages are pending (0 for no limit).
+        """
+        super().__init__(manager, {channel}, skip_own, skip_history, max_latency, max_batch)
+        self._demux = manager.channel_demux
+
+    def _listen(self) -> None:
+        self._demux.add(self)
+
+    def _unlisten(self) -> None:
+        self._demux.remove(self)
+
+
+class DiscordHistoryReaderImpl(DiscordMessageReaderImpl):
+    """Push adapter that backfills channel history, then continues with live messages.
+
+    Channels are paged oldest first concurrently, each with one page of
+    read-ahead, and discord.py's rate limiter paces the requests per route.
+    Pages are merged with a heap keyed on the snowflake ID, so messages are
+    pushed in creation order across channels.
+
+    Live messages received during the backfill are held back and released
+    after it. Snowflakes grow with time, so a live message the backfill already
+    returned is recognized by an ID not above the last backfilled ID of its
+    channel: the handoff has no gap and no duplicates.
+    """
+
+    def __init__(
+        self,
+        manager: DiscordAdapterManagerImpl,
+        channels: Set[str],
+        since: Any,
+        until: Optional[datetime],
+        skip_own: bool,
+        page_size: int,
+        max_concurrency: int,
+    ):
+        """Initialize the reader.
+
+        Args:
+            manager: The adapter manager owning the shared session.
+            channels: Channel IDs or names to backfill and follow.
+            since: Datetime, or timedelta before the start of the graph, to backfill from.
+            until: Datetime to backfill up to, or None to backfill up to now and continue live.
+            skip_own: If True, skip messages from the bot itself.
+            page_size: Messages per history request (at most 100).
+            max_concurrency: Maximum number of history requests in flight.
+        """
+        super().__init__(manager, channels, skip_own, skip_history=False)
+        self._since = since
+        self._until = until.replace(tzinfo=until.tzinfo or UTC) if until is not None else None
+        self._page_size = min(page_size, 100)
+        self._max_concurrency = max_concurrency
+        self._backfilling = True
+        self._held: list[DiscordMessage] = []
+        self._last_ids: dict[str, int] = {}
+        self._task: Optional[asyncio.Future] = None
+
+    def start(self, starttime, endtime):
+        """Start following live messages and backfilling history."""
+        if self._until is None:
+            super().start(starttime, endtime)
+        else:
+            self._start_time = datetime.now(UTC)
+            self.push_tick([])
+        self._task = self._session.submit(self._backfill())
+
+    def stop(self):
+        """Cancel the backfill and unregister from the session."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        super().stop()
+
+    def _on_message(self, message: DiscordMessage) -> None:
+        """Session listener: hold live messages back until the backfill is done, then skip duplicates."""
+        if self._backfilling:
+            self._held.append(message)
+            return
+        last_id = self._last_ids.get(message.channel_id)
+        if last_id is not None and message.id and int(message.id) <= last_id:
+            return
+        super()._on_message(message)
+
+    def _since_datetime(self) -> datetime:
+        if isinstance(self._since, timedelta):
+            return self._start_time - self._since
+        return self._since.replace(tzinfo=self._since.tzinfo or UTC)
+
+    def _history_channels(self, client: Any) -> list:
+        channels = [self._session.channels.resolve(client, channel_id) for channel_id in sorted(self._channel_ids)]
+        if self._channel_names:
+            channels.extend(
+                c
+                for c in client.get_all_channels()
+                if c.name.lower() in self._channel_names and str(c.id) not in self._channel_ids and hasattr(c, "history")
+            )
+        return channels
+
+    async def _backfill(self) -> None:
+        try:
+            await self._session.wait_until_ready(self._session.backend.config.timeout)
+            client = self._session.backend._client
+            if client is None:
+                raise RuntimeError("History requires a connected discord.py client")
+            await self._merge(self._history_channels(client))
+        except Exception:
+            log.exception("Discord history backfill failed")
+        self._release()
+
+    async def _merge(self, channels: list) -> None:
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+
+        async def fetch(channel: Any, after: Any) -> list[DiscordMessage]:
+            async with semaphore:
+                return [_message_from_discord(m) async for m in channel.history(limit=self._page_size, after=after, oldest_first=True)]
+
+        pending: dict[int, asyncio.Future] = {}
+        buffers: dict[int, deque] = {}
+        heap: list[tuple[int, int]] = []
+
+        async def refill(i: int) -> None:
+            page = await pending.pop(i)
+            full = len(page) == self._page_size
+            if self._until is not None:
+                page = [m for m in page if m.created_at <= self._until]
+            if not page:
+                return
+            if full and len(page) == self._page_size:
+                # Read ahead: request the next page while this one is merged
+                pending[i] = asyncio.ensure_future(fetch(channels[i], discord.Object(id=int(page[-1].id))))
+            buffers[i] = deque(page)
+            heapq.heappush(heap, (int(page[0].id), i))
+
+        # discord.py turns an ``after`` datetime into the highest snowflake of its millisecond; start below the lowest instead
+        since = discord.Object(id=discord.utils.time_snowflake(self._since_datetime(), high=False) - 1)
+        for i, channel in enumerate(channels):
+            pending[i] = asyncio.ensure_future(fetch(channel, since))
+        try:
+            for i in range(len(channels)):
+                await refill(i)
+            batch: list[DiscordMessage] = []
+            while heap:
+                _, i = heapq.heappop(heap)
+                message = buffers[i].popleft()
+                self._last_ids[message.channel_id] = int(message.id)
+                if self._accept(message):
+                    batch.append(message)
+                if buffers[i]:
+                    heapq.heappush(heap, (int(buffers[i][0].id), i))
+                elif i in pending:
+                    # Push what is ready instead of holding it while the next page loads
+                    if batch:
+                        self.push_tick(batch)
+                        batch = []
+                    await refill(i)
+                if len(batch) >= self._page_size:
+                    self.push_tick(batch)
+                    batch = []
+            if batch:
+                self.push_tick(batch)
+        finally:
+            for future in pending.values():
+                future.cancel()
+
+    def _release(self) -> None:
+        """End the backfill and pass on the live messages held back meanwhile."""
+        self._backfilling = False
+        held, self._held = self._held, []
+        for message in held:
+            self._on_message(message)
+
+
+class _Outbox:
+    """Thread-safe bounded buffer of messages waiting to be sent, in order per channel.
+
+    ``put`` is called on the engine thread and ``take`` on the session loop.
+    Pending messages are kept both in global arrival order (for ``drop_oldest``)
+    and per channel (for the send lanes and ``coalesce``); a channel's oldest
+    pending message is always the head of its lane, so both stay in step.
+    """
+
+    def __init__(self, max_size: int = 0, overflow: str = "block", alive: Optional[Callable[[], bool]] = None):
+        """Initialize the outbox.
+
+        Args:
+            max_size: Maximum number of pending messages, 0 for unbounded.
+            overflow: Policy when full, one of ``OVERFLOW_POLICIES``.
+            alive: With ``"block"``, checked while waiting for room; once it returns False nothing
+                will take messages any more, so ``put`` raises instead of waiting forever.
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}, got {overflow!r}")
+        self._max_size = max_size
+        self._overflow = overflow
+        self._alive = alive
+        self._cond = threading.Condition()
+        self._pending: "OrderedDict[int, tuple[str, DiscordMessage]]" = OrderedDict()
+        self._lanes: dict[str, deque] = {}
+        self._seq = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def put(self, key: str, msg: DiscordMessage) -> bool:
+        """Queue a message for channel ``key``, applying the overflow policy when full.
+
+        Returns:
+            True if a new entry was queued, False if the message was dropped or coalesced.
+
+        Raises:
+            RuntimeError: With ``"block"``, if ``alive`` turns False while waiting for room.
+        """
+        with self._cond:
+            if self._max_size and len(self._pending) >= self._max_size:
+                if self._overflow == "block":
+                    while len(self._pending) >= self._max_size:
+                        if self._alive is not None and not self._alive():
+                            raise RuntimeError("Discord session stopped while publish was waiting for room in its queue")
+                        self._cond.wait(_BLOCK_POLL_INTERVAL)
+                elif self._overflow == "drop_newest":
+                    self.dropped += 1
+                    return False
+                elif self._overflow == "drop_oldest":
+                    _, (oldest_key, _) = self._pending.popitem(last=False)
+                    self._pop_lane(oldest_key)
+                    self.dropped += 1
+                else:
+                    lane = self._lanes.get(key)
+                    if lane:
+                        # Merge into the channel's newest pending message, keeping its place in line
+                        merged = merge_messages([self._pending[lane[-1]][1], msg])
+                        if len(merged) == 1:
+                            self._pending[lane[-1]] = (key, merged[0])
+                            self.coalesced += 1
+                        else:
+                            # Too long to merge, or not a plain message: there is no room for it
+                            self.dropped += 1
+                        return False
+                    # Nothing to coalesce with: admit it, at most one message per channel over the limit
+            self._seq += 1
+            self._pending[self._seq] = (key, msg)
+            self._lanes.setdefault(key, deque()).append(self._seq)
+            return True
+
+    def take(self, key: str) -> Optional[DiscordMessage]:
+        """Remove and return the oldest pending message for channel ``key``, or None."""
+        with self._cond:
+            if key not in self._lanes:
+                return None
+            _, msg = self._pending.pop(self._pop_lane(key))
+            self._cond.notify()
+            return msg
+
+    def take_all(self, key: str) -> list[DiscordMessage]:
+        """Remove and return every pending message for channel ``key``, oldest first."""
+        with self._cond:
+            lane = self._lanes.pop(key, ())
+            msgs = [self._pending.pop(seq)[1] for seq in lane]
+            self._cond.notify_all()
+            return msgs
+
+    def _pop_lane(self, key: str) -> int:
+        lane = self._lanes[key]
+        seq = lane.popleft()
+        if not lane:
+            del self._lanes[key]
+        return seq
+
+
+class DiscordMessageWriterImpl(OutputAdapter):
+    """Output adapter that sends messages over the shared session.
+
+    Messages are sent in order per channel, with one lane per channel running
+    concurrently with the others. discord.py tracks the per-route and global
+    rate-limit buckets from response headers and makes a limited request wait
+    on its own bucket, so a channel that hits its limit only delays its own
+    lane instead of every send behind it.
+
+    Messages waiting to be sent are held in a bounded outbox. When it holds
+    ``max_queue`` messages the ``overflow`` policy applies: ``"block"`` the
+    engine until there is room, ``"drop_oldest"`` or ``"drop_newest"`` message,
+    or ``"coalesce"`` the new message into the channel's newest pending one
+    (see :func:`~csp_adapter_discord.batching.merge_messages`); a message that
+    cannot be merged is dropped. ``"block"`` raises if the session stops while
+    the engine waits.
+
+    With ``coalesce_window`` set, a lane waits that long after taking a message
+    and then merges everything pending for its channel into as few messages as
+    Discord's limits allow (see :func:`~csp_adapter_discord.batching.merge_messages`).
+    """
+
+    def __init__(
+        self,
+        manager: DiscordAdapterManagerImpl,
+        on_sent: Optional[Callable[[Any, Any], None]] = None,
+        max_queue: int = 0,
+        overflow: str = "block",
+        coalesce_window: Optional[timedelta] = None,
+    ):
+        """Initialize the writer.
+
+        Args:
+            manager: The adapter manager owning the shared session.
+            on_sent: Optional callback invoked with ``(message, sent)`` after each send.
+            max_queue: Maximum number of messages waiting to be sent, 0 for unbounded.
+            overflow: Policy when the queue is full, one of ``OVERFLOW_POLICIES``.
+            coalesce_window: If set, merge messages to the same channel published within this window.
+        """
+        self._session = manager.session
+        self._on_sent = on_sent
+        self._outbox = _Outbox(max_queue, overflow, alive=lambda: self._session.running)
+        self._coalesce_window = coalesce_window.total_seconds() if coalesce_window else 0.0
+        self._lanes: dict[str, asyncio.Task] = {}
+        self._sent = 0
+        self._failed = 0
+        self._coalesced = 0
+        self._started = False
+        manager.writers.append(self)
+
+    def start(self):
+        """Start accepting messages, lanes run on the session loop."""
+        self._started = True
+
+    def stop(self):
+        """Flush pending messages and wait for the lanes to finish."""
+        if not self._started:
+            return
+        try:
+            self._session.submit(self._drain()).result(timeout=5.0)
+        except Exception:
+            log.exception("Error stopping Discord message writer")
+        self._started = False
+
+    def on_tick(self, time, value):
+        """Queue a message for sending."""
+        key = self._lane_key(value)
+        if self._outbox.put(key, value):
+            self._session.call_soon(self._wake, key)
+
+    def stats(self) -> dict:
+        """Get this writer's queue counters."""
+        return {
+            "depth": len(self._outbox),
+            "dropped": self._outbox.dropped,
+            "coalesced": self._outbox.coalesced + self._coalesced,
+            "sent": self._sent,
+            "failed": self._failed,
+        }
+
+    def _lane_key(self, msg: DiscordMessage) -> str:
+        """Get the channel a message is posted to, which is also its rate-limit route."""
+        thread_id = self._session.backend._extract_thread_id(msg.thread) if msg.thread is not None else None
+        return thread_id or msg.channel_id
+
+    def _wake(self, key: str):
+        """Start the lane for a channel unless it is already running."""
+        if key not in self._lanes:
+            self._lanes[key] = asyncio.create_task(self._lane(key))
+
+    async def _lane(self, key: str):
+        """Send one channel's messages in order, exiting once it has none pending."""
+        try:
+            while True:
+                msg = self._outbox.take(key)
+                if msg is None:
+                    # No await between here and the del, so a later put wakes a new lane
+                    break
+                if self._coalesce_window:
+                    await asyncio.sleep(self._coalesce_window)
+                    batch = [msg, *self._outbox.take_all(key)]
+                    msgs = merge_messages(batch)
+                    self._coalesced += len(batch) - len(msgs)
+                else:
+                    msgs = (msg,)
+                for msg in msgs:
+                    try:
+                        await self._send(msg)
+                        self._sent += 1
+                    except Exception:
+                        self._failed += 1
+                        log.exception("Failed sending message")
+        finally:
+            del self._lanes[key]
+
+    async def _drain(self):
+        """Wait until every lane has sent its pending messages."""
+        while self._lanes:
+            await asyncio.gather(*self._lanes.values(), return_exceptions=True)
+
+    async def _send(self, msg: DiscordMessage):
+        """Send one message (text, url attachments and embeds, then uploads)."""
+        backend = self._session.backend
+        url_attachments = []
+        upload_attachments = []
+        for att in msg.attachments:
+            if getattr(att, "has_data", False) and att.data is not None:
+                upload_attachments.append(att)
+            else:
+                url_attachments.append(att)
+
+        kwargs = {}
+        if url_attachments:
+            kwargs["attachments"] = url_attachments
+        if msg.embeds:
+            kwargs["embeds"] = msg.embeds
+        if msg.thread is not None:
+            kwargs["thread"] = msg.thread
+        if msg.reply_to is not None:
+            kwargs["reply_to"] = msg.reply_to
+        elif msg.reference is not None and msg.reference.message_id:
+            kwargs["reply_to"] = msg.reference.message_id
+        if getattr(msg.components, "rows", None):
+            from chatom.format import attach_components_for_backend
+
+            kwargs["content"] = msg.content
+            attach_components_for_backend(kwargs, msg.components, backend.get_format())
+            content = str(kwargs.pop("content"))
+        else:
+            content = msg.content
+
+        client = backend._client
+        if client is None:
+            # Backends without a discord.py client (e.g. MockDiscordBackend) send through their own API
+            sent = await backend.send_message(channel=msg.channel_id, content=content, **kwargs)
+        else:
+            sent = await self._send_cached(client, msg.channel_id, content, kwargs)
+        if self._on_sent is not None:
+            self._on_sent(msg, sent)
+
+        for att in upload_attachments:
+            try:
+                if client is None:
+                    await backend.upload_file(
+                        channel=msg.channel_id,
+                        data=att.data,
+                        filename=att.filename or "file",
+                        content_type=getattr(att, "content_type", ""),
+                    )
+                else:
+                    file = discord.File(fp=io.BytesIO(att.data), filename=att.filename or "file")
+                    await self._channel_send(client, msg.channel_id, file=file)
+            except Exception:
+                log.exception(f"Failed uploading {att.filename!r}")
+
+    async def _send_cached(self, client: Any, channel_id: str, content: str, kwargs: dict) -> DiscordMessage:
+        """Send like ``DiscordBackend.send_message`` but through the session's channel cache.
+
+        The backend fetches the channel over REST before every send; the cache
+        resolves it locally so each message is a single HTTP request.
+        """
+        backend = self._session.backend
+        thread_id = backend._extract_thread_id(kwargs.pop("thread", None))
+        target_channel_id = thread_id if thread_id is not None else channel_id
+        reply_to_id = backend._extract_reply_to_id(kwargs.pop("reply_to", None))
+
+        send_kwargs = {"content": content, "tts": kwargs.get("tts", False)}
+        for key in ("embed", "embeds", "file", "files"):
+            if kwargs.get(key):
+                send_kwargs[key] = kwargs[key]
+        if reply_to_id is not None:
+            send_kwargs["reference"] = discord.MessageReference(message_id=int(reply_to_id), channel_id=int(target_channel_id))
+
+        sent = await self._channel_send(client, target_channel_id, **send_kwargs)
+        return DiscordMessage(
+            id=str(sent.id),
+            content=sent.content,
+            created_at=sent.created_at.replace(tzinfo=UTC) if sent.created_at else datetime.now(UTC),
+            author=DiscordUser(id=str(sent.author.id)),
+            channel=DiscordChannel(id=str(sent.channel.id)),
+            guild=Organization(id=str(sent.guild.id)) if sent.guild else None,
+        )
+
+    async def _channel_send(self, client: Any, channel_id: str, **send_kwargs) -> Any:
+        """Send to a cached channel, dropping it from the cache if Discord no longer knows it."""
+        channels = self._session.channels
+        channel = channels.resolve(client, channel_id)
+        try:
+            return await channel.send(**send_kwargs)
+        except (discord.NotFound, discord.Forbidden):
+            channels.invalidate(channel_id)
+            raise
+
+
+class DiscordPresenceWriterImpl(OutputAdapter):
+    """Output adapter that sets the bot's presence over the shared gateway connection.
+
+    Discord rate-limits presence updates on the gateway, so only the latest
+    desired status is kept: ticks that arrive while an update is pending replace
+    it, an update identical to the presence already set is skipped, and updates
+    are sent at most once per ``min_interval``. The latest status is flushed
+    when the engine stops.
+    """
+
+    def __init__(self, manager: DiscordAdapterManagerImpl, timeout: float, min_interval: timedelta = timedelta(0)):
+        """Initialize the presence writer.
+
+        Args:
+            manager: The adapter manager owning the shared session.
+            timeout: Timeout in seconds for each presence update.
+            min_interval: Minimum time between two presence updates.
+        """
+        self._session = manager.session
+        self._timeout = timeout
+        self._min_interval = min_interval.total_seconds()
+        self._desired: Optional[str] = None
+        self._current: Optional[str] = None
+        self._last_update = float("-inf")
+        self._changed: Optional[asyncio.Event] = None
+        self._closing: Optional[asyncio.Event] = None
+        self._close_requested = False
+        self._task: Optional[asyncio.Future] = None
+        self._session.require_gateway()
+
+    def start(self):
+        """Start the presence task on the session loop."""
+        self._task = self._session.submit(self._run())
+
+    def stop(self):
+        """Flush the latest status and stop the presence task."""
+        if self._task is None:
+            return
+        try:
+            self._session.call_soon(self._close)
+            self._task.result(timeout=self._timeout + 1.0)
+        except Exception:
+            log.exception("Error stopping Discord presence writer")
+        self._task = None
+
+    def on_tick(self, time, value):
+        """Record the desired presence status string."""
+        self._session.call_soon(self._set_desired, value)
+
+    def _set_desired(self, status: str):
+        self._desired = status
+        if self._changed is not None:
+            self._changed.set()
+
+    def _close(self):
+        # Recorded first, so a _run that has not started yet exits as soon as it does
+        self._close_requested = True
+        if self._closing is not None:
+            self._closing.set()
+            self._changed.set()
+
+    async def _run(self):
+        """Apply the latest desired status once the gateway is ready, at most once per interval."""
+        loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        self._closing = asyncio.Event()
+        if self._close_requested:
+            self._closing.set()
+        if self._desired is not None or self._close_requested:
+            self._changed.set()
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            if self._desired is not None and self._desired != self._current:
+                wait = self._last_update + self._min_interval - loop.time()
+                if wait > 0 and not self._closing.is_set():
+                    # Ticks during the wait just replace the desired status
+                    try:
+                        await asyncio.wait_for(self._closing.wait(), timeout=wait)
+                    except TimeoutError:
+                        pass
+                await self._apply(self._desired, loop)
+            # A tick during the update has set _changed again, so it is flushed before exiting
+            if self._closing.is_set() and not self._changed.is_set():
+                break
+
+    async def _apply(self, status: str, loop: asyncio.AbstractEventLoop):
+        if status == self._current:
+            return
+        try:
+            if not await self._session.wait_until_ready(timeout=self._timeout):
+                log.error("Timeout waiting for gateway before setting presence")
+                return
+            await asyncio.wait_for(self._session.set_presence(str(status)), timeout=self._timeout)
+            self._current = status
+        except TimeoutError:
+            log.error("Timeout setting presence")
+        except Exception:
+            log.exception("Failed setting presence")
+        finally:
+            self._last_update = loop.time()
+
+
+class DiscordPublishStatsReaderImpl(PushInputAdapter):
+    """Push adapter that ticks the adapter's outbound queue counters.
+
+    The counters are sampled every ``interval`` on the session loop and ticked
+    when they have changed since the last sample.
+    """
+
+    def __init__(self, manager: DiscordAdapterManagerImpl, interval: timedelta):
+        """Initialize the reader.
+
+        Args:
+            manager: The adapter manager owning the message writers.
+            interval: How often to sample the counters.
+        """
+        self._manager = manager
+        self._interval = interval.total_seconds()
+        self._task: Optional[asyncio.Future] = None
+
+    def start(self, starttime, endtime):
+        """Start sampling on the session loop."""
+        self._task = self._manager.session.submit(self._run())
+
+    def stop(self):
+        """Stop sampling."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        last = None
+        while True:
+            await asyncio.sleep(self._interval)
+            stats = self._sample()
+            if stats != last:
+                self.push_tick(stats)
+                last = stats
+
+    def _sample(self) -> PublishStats:
+        return self._manager.publish_stats()
+
+
+class DiscordGatewayStatsReaderImpl(DiscordPublishStatsReaderImpl):
+    """Push adapter that ticks the session's compressed gateway traffic counters."""
+
+    def _sample(self) -> GatewayStats:
+        return self._manager.session.gateway_stats()
+
+
+class DiscordRecorderImpl(PushInputAdapter):
+    """Push adapter that records inbound traffic to disk and ticks the number of records written.
+
+    Session listeners only hand each message or gateway payload to a
+    RecordingWriter, whose own thread serializes and writes them, so recording
+    does not add to the latency of the adapter's other inputs.
+    """
+
+    def __init__(
+        self,
+        manager: DiscordAdapterManagerImpl,
+        path: str,
+        raw: bool,
+        chunk_records: int,
+        flush_interval: timedelta,
+    ):
+        """Initialize the recorder.
+
+        Args:
+            manager: The adapter manager owning the shared session.
+            path: Recording file to append to.
+            raw: If True, also record every raw gateway event.
+            chunk_records: Maximum number of records per chunk.
+            flush_interval: Maximum time a record waits before its chunk is written.
+        """
+        self._session = manager.session
+        self._path = path
+        self._raw = raw
+        self._chunk_records = chunk_records
+        self._flush_interval = flush_interval.total_seconds()
+        self._writer: Optional[RecordingWriter] = None
+        self._session.require_gateway()
+        self._session.require_intents(*MESSAGE_INTENTS)
+        if raw:
+            self._session.require_raw_events()
+
+    def start(self, starttime, endtime):
+        """Open the recording and start listening."""
+        self._writer = RecordingWriter(
+            self._path,
+            chunk_records=self._chunk_records,
+            flush_interval=self._flush_interval,
+            on_flush=self.push_tick,
+        )
+        self._session.add_listener("message", self._writer.append_message)
+        if self._raw:
+            self._session.add_listener("raw", self._writer.append_raw)
+
+    def stop(self):
+        """Stop listening and write out everything still buffered."""
+        if self._writer is None:
+            return
+        self._session.remove_listener("message", self._writer.append_message)
+        self._session.remove_listener("raw", self._writer.append_raw)
+        self._writer.close()
+        self._writer = None
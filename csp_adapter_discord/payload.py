@@ -0,0 +1,313 @@
+"""Messages read straight from the gateway's MESSAGE_CREATE payload.
+
+With ``subscribe(mode="payload")`` the session hands each MESSAGE_CREATE
+payload to subscribers as a :class:`MessagePayload` before discord.py builds
+a ``discord.Message`` from it, and discord.py's parser is skipped entirely
+while no subscriber needs full messages. A MessagePayload is a thin view over
+the decoded JSON dict: reading ``content`` or ``author_id`` is a dict lookup,
+and :meth:`MessagePayload.to_message` converts it to a DiscordMessage on demand.
+
+With ``subscribe(mode="lazy")`` subscribers get a :class:`LazyDiscordMessage`
+instead, which reads like a DiscordMessage but only builds the fields a node
+actually touches.
+
+The JSON itself is decoded by discord.py's gateway, which uses ``orjson``
+when it is installed.
+"""
+
+from datetime import UTC, datetime
+from typing import Any, List, Optional
+
+from chatom.base import Organization
+from chatom.discord import DiscordChannel, DiscordChannelType, DiscordMessage, DiscordUser
+from chatom.discord.backend import _discord_attachments, _discord_channel_from_api, _discord_channel_type_to_base
+
+__all__ = ("LazyDiscordMessage", "MessagePayload", "message_from_payload", "snowflake_time_ms")
+
+# Discord snowflakes count milliseconds from this epoch
+DISCORD_EPOCH_MS = 1420070400000
+
+
+def snowflake_time_ms(snowflake: str) -> int:
+    """Get the creation time encoded in a snowflake ID, in milliseconds since the Unix epoch."""
+    return (int(snowflake) >> 22) + DISCORD_EPOCH_MS
+
+
+class _Fields:
+    """Attribute access over a payload dict, for helpers written against discord.py objects."""
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: dict):
+        self._data = data
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self._data[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+class MessagePayload:
+    """A gateway MESSAGE_CREATE payload with accessors for the commonly used fields.
+
+    Attributes:
+        data: The decoded payload, as sent by Discord.
+        shard_id: The gateway shard that received the message, if the session is sharded.
+        shard_seq: Number of the message among those received on its shard, starting at 1.
+    """
+
+    __slots__ = ("data", "_client", "shard_id", "shard_seq")
+
+    def __init__(self, data: dict, client: Any = None):
+        """Wrap a payload.
+
+        Args:
+            data: The decoded MESSAGE_CREATE payload.
+            client: The discord.py client, used to look up channel details from its cache.
+        """
+        self.data = data
+        self._client = client
+        self.shard_id: Optional[int] = None
+        self.shard_seq: Optional[int] = None
+
+    def __repr__(self) -> str:
+        return f"MessagePayload(id={self.id!r}, channel_id={self.channel_id!r}, author_id={self.author_id!r}, content={self.content!r})"
+
+    @property
+    def id(self) -> str:
+        return self.data["id"]
+
+    @property
+    def content(self) -> str:
+        return self.data.get("content", "")
+
+    @property
+    def channel_id(self) -> str:
+        return self.data["channel_id"]
+
+    @property
+    def guild_id(self) -> Optional[str]:
+        return self.data.get("guild_id")
+
+    @property
+    def author_id(self) -> str:
+        return self.data["author"]["id"]
+
+    @property
+    def author_name(self) -> str:
+        return self.data["author"].get("username", "")
+
+    @property
+    def is_bot(self) -> bool:
+        return self.data["author"].get("bot", False)
+
+    @property
+    def webhook_id(self) -> Optional[str]:
+        return self.data.get("webhook_id")
+
+    @property
+    def mention_ids(self) -> List[str]:
+        return [user["id"] for user in self.data.get("mentions", ())]
+
+    @property
+    def created_at_ms(self) -> int:
+        """Creation time in milliseconds since the Unix epoch, read from the snowflake."""
+        return snowflake_time_ms(self.data["id"])
+
+    @property
+    def created_at(self) -> datetime:
+        return datetime.fromtimestamp(self.created_at_ms / 1000, UTC)
+
+    @property
+    def channel_name(self) -> str:
+        """Name of the channel from the client's cache, or an empty string if it is not cached."""
+        return getattr(self._channel(), "name", None) or ""
+
+    @property
+    def parent_channel_id(self) -> Optional[str]:
+        """ID of the parent channel if the message was sent in a cached thread."""
+        parent_id = getattr(self._channel(), "parent_id", None)
+        return str(parent_id) if parent_id is not None else None
+
+    def _channel(self) -> Any:
+        if self._client is None:
+            return None
+        return self._client.get_channel(int(self.data["channel_id"]))
+
+    def to_message(self) -> DiscordMessage:
+        """Convert to a DiscordMessage, as ``subscribe`` would have produced it."""
+        return LazyDiscordMessage(self).materialize()
+
+
+def message_from_payload(data: dict, channel: Any = None) -> DiscordMessage:
+    """Convert a MESSAGE_CREATE payload into a DiscordMessage.
+
+    Produces the same message as converting the discord.py Message built from
+    the payload, without building it.
+
+    Args:
+        data: The decoded payload.
+        channel: The discord.py channel the message was sent in, if cached.
+    """
+    return LazyDiscordMessage(MessagePayload(data), channel).materialize()
+
+
+def _payload_channel(data: dict, channel: Any) -> DiscordChannel:
+    if channel is not None:
+        return _discord_channel_from_api(channel)
+    guild_id = data.get("guild_id")
+    if guild_id is None:
+        return DiscordChannel(
+            id=data["channel_id"], name="DM", channel_type=_discord_channel_type_to_base(DiscordChannelType.DM), discord_type=DiscordChannelType.DM
+        )
+    return DiscordChannel(id=data["channel_id"], guild=Organization(id=guild_id))
+
+
+def _payload_mentions(data: dict) -> List[DiscordUser]:
+    return [
+        DiscordUser(
+            id=u["id"],
+            name=u.get("username", ""),
+            handle=u.get("username", "") if u.get("discriminator", "0") == "0" else f"{u.get('username', '')}#{u['discriminator']}",
+            is_bot=u.get("bot", False),
+            discriminator=u.get("discriminator", "0"),
+        )
+        for u in data.get("mentions", ())
+    ]
+
+
+_UNSET = object()
+
+
+class LazyDiscordMessage:
+    """A DiscordMessage stand-in that builds its fields from the payload on first access.
+
+    ``id``, ``content``, ``channel_id`` and ``author_id`` read the payload
+    directly. ``author``, ``channel``, ``guild``, ``mentions``, ``attachments``,
+    ``metadata`` and ``created_at`` are built on first access and kept; any other
+    DiscordMessage attribute (e.g. ``formatted_content``) materializes the full
+    message. :meth:`materialize` returns a real DiscordMessage, reusing the fields
+    already built.
+    """
+
+    __slots__ = ("payload", "_discord_channel", "_fields", "_message")
+
+    def __init__(self, payload: MessagePayload, channel: Any = _UNSET):
+        """Wrap a payload.
+
+        Args:
+            payload: The MESSAGE_CREATE payload.
+            channel: The discord.py channel, if already looked up; otherwise it is looked up from the client on demand.
+        """
+        self.payload = payload
+        self._discord_channel = channel
+        self._fields: dict = {}
+        self._message: Optional[DiscordMessage] = None
+
+    def __repr__(self) -> str:
+        return f"LazyDiscordMessage(id={self.id!r}, channel_id={self.channel_id!r}, author_id={self.author_id!r}, content={self.content!r})"
+
+    @property
+    def id(self) -> str:
+        return self.payload.data["id"]
+
+    @property
+    def content(self) -> str:
+        return self.payload.data.get("content", "")
+
+    @property
+    def channel_id(self) -> str:
+        return self.payload.data["channel_id"]
+
+    @property
+    def author_id(self) -> str:
+        return self.payload.data["author"]["id"]
+
+    @property
+    def channel_name(self) -> str:
+        return self.channel.name
+
+    @property
+    def author(self) -> DiscordUser:
+        return self._field("author", lambda: DiscordUser(id=self.author_id))
+
+    @property
+    def channel(self) -> DiscordChannel:
+        return self._field("channel", lambda: _payload_channel(self.payload.data, self._channel()))
+
+    @property
+    def guild(self) -> Optional[Organization]:
+        guild_id = self.payload.data.get("guild_id")
+        return self._field("guild", lambda: Organization(id=guild_id) if guild_id else None)
+
+    @property
+    def created_at(self) -> datetime:
+        return self._field("created_at", lambda: self.payload.created_at)
+
+    @property
+    def mentions(self) -> List[DiscordUser]:
+        return self._field("mentions", lambda: _payload_mentions(self.payload.data))
+
+    @property
+    def attachments(self) -> list:
+        return self._field(
+            "attachments", lambda: _discord_attachments(_Fields({"attachments": [_Fields(a) for a in self.payload.data.get("attachments", ())]}))
+        )
+
+    @property
+    def metadata(self) -> dict:
+        return self._field("metadata", self._metadata)
+
+    def materialize(self) -> DiscordMessage:
+        """Get the full DiscordMessage, building it once."""
+        if self._message is None:
+            data = self.payload.data
+            self._message = DiscordMessage(
+                id=self.id,
+                content=self.content,
+                created_at=self.created_at,
+                author=self.author,
+                channel=self.channel,
+                guild=self.guild,
+                mentions=self.mentions,
+                mention_everyone=data.get("mention_everyone", False),
+                mention_roles=list(data.get("mention_roles", ())),
+                attachments=self.attachments,
+                metadata=self.metadata,
+            )
+        return self._message
+
+    def __getattr__(self, name: str) -> Any:
+        # Only reached for attributes not defined above
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.materialize(), name)
+
+    def _field(self, name: str, build: Any) -> Any:
+        try:
+            return self._fields[name]
+        except KeyError:
+            value = self._fields[name] = build()
+            return value
+
+    def _channel(self) -> Any:
+        if self._discord_channel is _UNSET:
+            self._discord_channel = self.payload._channel()
+        return self._discord_channel
+
+    def _metadata(self) -> dict:
+        channel = self.channel
+        metadata = {
+            "channel_id": channel.id,
+            "channel_type": channel.channel_type.value,
+            "discord_type": channel.discord_type.value,
+            "is_dm": channel.discord_type in (DiscordChannelType.DM, DiscordChannelType.GROUP_DM),
+        }
+        parent_id = getattr(self._channel(), "parent_id", None)
+        if parent_id is not None:
+            metadata["parent_channel_id"] = str(parent_id)
+        if self.payload.shard_id is not None:
+            metadata["shard_id"] = self.payload.shard_id
+            metadata["shard_seq"] = self.payload.shard_seq
+        return metadata
@@ -0,0 +1,321 @@
+"""Compact append-only recording of inbound Discord traffic.
+
+A recording is a binary file of length-prefixed chunks plus an index file
+next to it (``<path>.idx``)::
+
+    file   := b"CSPDREC\\x01" chunk*
+    chunk  := header payload
+    header := "<4sBIIqq"  magic b"CHNK", flags, record count, payload length,
+                          first timestamp (ns), last timestamp (ns)
+    payload:= record*     (zlib-compressed when flags & 1)
+    record := "<qBI"      timestamp (ns since epoch), kind, body length; then body
+
+    index  := b"CSPDIDX\\x01" entry*
+    entry  := "<qqQI"     first timestamp, last timestamp, chunk offset, record count
+
+Record bodies are JSON: a :class:`DiscordMessage` for ``KIND_MESSAGE`` and
+``{"t": event, "d": payload}`` for ``KIND_RAW`` gateway events. An index entry
+is only written once its chunk is complete on disk, so a crash loses at most
+the chunk being written and readers ignore a truncated tail.
+
+RecordingWriter keeps capture off the ingest path: appending a record only
+stores a reference in a deque, and a background thread serializes, compresses
+and writes full chunks.
+"""
+
+import bisect
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Any, Callable, Iterator, List, NamedTuple, Optional
+
+from chatom.discord import DiscordMessage
+
+__all__ = (
+    "KIND_MESSAGE",
+    "KIND_RAW",
+    "IndexEntry",
+    "Record",
+    "RecordingReader",
+    "RecordingWriter",
+    "decode_chunk",
+    "read_index",
+    "read_records",
+)
+
+FILE_MAGIC = b"CSPDREC\x01"
+INDEX_MAGIC = b"CSPDIDX\x01"
+CHUNK_MAGIC = b"CHNK"
+FLAG_ZLIB = 1
+
+KIND_MESSAGE = 0
+KIND_RAW = 1
+
+_CHUNK = struct.Struct("<4sBIIqq")
+_RECORD = struct.Struct("<qBI")
+_INDEX = struct.Struct("<qqQI")
+
+
+class Record(NamedTuple):
+    """One recorded item."""
+
+    timestamp_ns: int
+    kind: int
+    body: bytes
+
+    def decode(self) -> Any:
+        """Decode the body: a DiscordMessage for messages, a ``(event, payload)`` tuple for raw events."""
+        if self.kind == KIND_MESSAGE:
+            return DiscordMessage.model_validate_json(self.body)
+        raw = json.loads(self.body)
+        return raw["t"], raw["d"]
+
+
+class IndexEntry(NamedTuple):
+    """Location and time range of one chunk."""
+
+    first_ns: int
+    last_ns: int
+    offset: int
+    count: int
+
+
+class RecordingWriter:
+    """Append messages and raw gateway events to a recording from any thread.
+
+    Records are buffered and written as one chunk once ``chunk_records`` are
+    pending or ``flush_interval`` seconds have passed, by a background thread.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        chunk_records: int = 1024,
+        flush_interval: float = 1.0,
+        compress: bool = True,
+        on_flush: Optional[Callable[[int], None]] = None,
+    ):
+        """Open (or append to) a recording.
+
+        Args:
+            path: Recording file; the index is written to ``path + ".idx"``.
+            chunk_records: Maximum number of records per chunk.
+            flush_interval: Maximum seconds a record waits before its chunk is written.
+            compress: If True, zlib-compress chunk payloads.
+            on_flush: Optional callback invoked with the total number of records written after each chunk.
+        """
+        self._path = path
+        self._chunk_records = chunk_records
+        self._flush_interval = flush_interval
+        self._compress = compress
+        self._on_flush = on_flush
+        self._pending: deque = deque()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._written = 0
+        self._file = self._open(path, FILE_MAGIC)
+        self._index = self._open(path + ".idx", INDEX_MAGIC)
+        self._thread = threading.Thread(target=self._run, name="discord-recorder", daemon=True)
+        self._thread.start()
+
+    @property
+    def path(self) -> str:
+        """Path of the recording file."""
+        return self._path
+
+    @property
+    def written(self) -> int:
+        """Number of records written to disk."""
+        return self._written
+
+    @staticmethod
+    def _open(path: str, magic: bytes):
+        f = open(path, "ab")
+        if f.tell() == 0:
+            f.write(magic)
+        else:
+            with open(path, "rb") as existing:
+                if existing.read(len(magic)) != magic:
+                    f.close()
+                    raise ValueError(f"{path} is not a Discord recording")
+        return f
+
+    def append_message(self, message: DiscordMessage, timestamp_ns: Optional[int] = None) -> None:
+        """Record a converted message."""
+        self._append(KIND_MESSAGE, message, timestamp_ns)
+
+    def append_raw(self, event: str, payload: Any, timestamp_ns: Optional[int] = None) -> None:
+        """Record a raw gateway event."""
+        # Shallow copy: discord.py's parsers may add keys to the payload after we return
+        self._append(KIND_RAW, (event, dict(payload) if isinstance(payload, dict) else payload), timestamp_ns)
+
+    def _append(self, kind: int, item: Any, timestamp_ns: Optional[int]) -> None:
+        if self._closed:
+            return
+        self._pending.append((timestamp_ns or time.time_ns(), kind, item))
+        if len(self._pending) >= self._chunk_records:
+            self._wakeup.set()
+
+    def close(self) -> None:
+        """Write everything pending and close the files."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+        self._file.close()
+        self._index.close()
+
+    def __enter__(self) -> "RecordingWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self._flush_interval)
+            self._wakeup.clear()
+            closed = self._closed
+            while self._pending:
+                count = min(len(self._pending), self._chunk_records)
+                self._write_chunk([self._pending.popleft() for _ in range(count)])
+            if closed:
+                return
+
+    def _write_chunk(self, items: List[tuple]) -> None:
+        parts = []
+        for timestamp_ns, kind, item in items:
+            if kind == KIND_MESSAGE:
+                body = item.model_dump_json(exclude_defaults=True).encode()
+            else:
+                body = json.dumps({"t": item[0], "d": item[1]}, separators=(",", ":"), default=str).encode()
+            parts.append(_RECORD.pack(timestamp_ns, kind, len(body)))
+            parts.append(body)
+        payload = b"".join(parts)
+        flags = 0
+        if self._compress:
+            payload = zlib.compress(payload, 1)
+            flags |= FLAG_ZLIB
+        first_ns, last_ns = items[0][0], items[-1][0]
+        offset = self._file.tell()
+        self._file.write(_CHUNK.pack(CHUNK_MAGIC, flags, len(items), len(payload), first_ns, last_ns))
+        self._file.write(payload)
+        self._file.flush()
+        self._index.write(_INDEX.pack(first_ns, last_ns, offset, len(items)))
+        self._index.flush()
+        self._written += len(items)
+        if self._on_flush is not None:
+            self._on_flush(self._written)
+
+
+def read_index(path: str) -> List[IndexEntry]:
+    """Read the chunk index of a recording, rebuilding it from the chunks if the index file is missing."""
+    index_path = path + ".idx"
+    if not os.path.exists(index_path):
+        return list(_scan_chunks(path))
+    with open(index_path, "rb") as f:
+        data = f.read()
+    if data[: len(INDEX_MAGIC)] != INDEX_MAGIC:
+        raise ValueError(f"{index_path} is not a Discord recording index")
+    end = len(data) - (len(data) - len(INDEX_MAGIC)) % _INDEX.size
+    return [IndexEntry(*_INDEX.unpack_from(data, pos)) for pos in range(len(INDEX_MAGIC), end, _INDEX.size)]
+
+
+def _scan_chunks(path: str) -> Iterator[IndexEntry]:
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+            raise ValueError(f"{path} is not a Discord recording")
+        offset = len(FILE_MAGIC)
+        while offset + _CHUNK.size <= size:
+            magic, _, count, length, first_ns, last_ns = _CHUNK.unpack(f.read(_CHUNK.size))
+            if magic != CHUNK_MAGIC or offset + _CHUNK.size + length > size:
+                return
+            yield IndexEntry(first_ns, last_ns, offset, count)
+            offset += _CHUNK.size + length
+            f.seek(offset)
+
+
+def decode_chunk(buffer: Any, offset: int) -> Iterator[Record]:
+    """Decode the records of the chunk at ``offset`` in a bytes-like ``buffer``."""
+    magic, flags, count, length, _, _ = _CHUNK.unpack_from(buffer, offset)
+    if magic != CHUNK_MAGIC:
+        raise ValueError(f"No chunk at offset {offset}")
+    start = offset + _CHUNK.size
+    payload = buffer[start : start + length]
+    if flags & FLAG_ZLIB:
+        payload = zlib.decompress(payload)
+    pos = 0
+    for _ in range(count):
+        timestamp_ns, kind, size = _RECORD.unpack_from(payload, pos)
+        pos += _RECORD.size
+        yield Record(timestamp_ns, kind, bytes(payload[pos : pos + size]))
+        pos += size
+
+
+class RecordingReader:
+    """Memory-mapped, lazily decoded view of a recording.
+
+    Chunks are only decompressed when iterated over, and record bodies are
+    only deserialized when :meth:`Record.decode` is called.
+    """
+
+    def __init__(self, path: str):
+        """Open a recording for reading.
+
+        Args:
+            path: Recording file written by :class:`RecordingWriter`.
+        """
+        self._path = path
+        self._index = read_index(path)
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b""
+        # Chunks are written in arrival order, so last timestamps are sorted and bisectable
+        self._last_ns = [entry.last_ns for entry in self._index]
+
+    @property
+    def path(self) -> str:
+        """Path of the recording file."""
+        return self._path
+
+    @property
+    def index(self) -> List[IndexEntry]:
+        """Chunk index of the recording."""
+        return self._index
+
+    def records(self, start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> Iterator[Record]:
+        """Iterate over the records with ``start_ns <= timestamp_ns <= end_ns``, in file order.
+
+        Chunks entirely outside the range are not read.
+        """
+        first = 0 if start_ns is None else bisect.bisect_left(self._last_ns, start_ns)
+        for entry in self._index[first:]:
+            if end_ns is not None and entry.first_ns > end_ns:
+                return
+            for record in decode_chunk(self._map, entry.offset):
+                if (start_ns is None or record.timestamp_ns >= start_ns) and (end_ns is None or record.timestamp_ns <= end_ns):
+                    yield record
+
+    def close(self) -> None:
+        """Release the memory map."""
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> "RecordingReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def read_records(path: str) -> Iterator[Record]:
+    """Iterate over every record of a recording in file order."""
+    with RecordingReader(path) as reader:
+        yield from reader.records()
@@ -0,0 +1,172 @@
+"""Historical replay of recorded Discord traffic.
+
+:func:`replay` reads recordings written by ``DiscordAdapter.record`` and ticks
+the recorded messages in simulation mode at their original receive times, so
+bot logic can be backtested over days of traffic in seconds::
+
+    @csp.graph
+    def backtest():
+        msgs = replay("recordings/")
+        csp.add_graph_output("replies", my_bot(msgs))
+
+    csp.run(backtest, starttime=datetime(2026, 10, 1), endtime=datetime(2026, 10, 8))
+"""
+
+import heapq
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Set
+
+from chatom.discord import DiscordMessage
+from csp import ts
+from csp.impl.pulladapter import PullInputAdapter
+from csp.impl.wiring import py_pull_adapter_def
+
+from .nodes import _split_channels
+from .recording import KIND_MESSAGE, Record, RecordingReader
+
+__all__ = ("DiscordReplayAdapterImpl", "recording_paths", "replay")
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def recording_paths(path: str) -> List[str]:
+    """Expand a recording file or a directory of recordings into a sorted list of files.
+
+    Files in a directory are recordings if they have a ``.idx`` index next to them.
+    """
+    if not os.path.isdir(path):
+        return [path]
+    return sorted(
+        os.path.join(path, name) for name in os.listdir(path) if not name.endswith(".idx") and os.path.exists(os.path.join(path, name + ".idx"))
+    )
+
+
+def _to_ns(dt: datetime) -> Optional[int]:
+    if dt is None or dt in (datetime.min, datetime.max):
+        return None
+    return (dt - _EPOCH) // timedelta(microseconds=1) * 1000
+
+
+def _to_datetime(timestamp_ns: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=timestamp_ns // 1000)
+
+
+class DiscordReplayAdapterImpl(PullInputAdapter):
+    """Pull adapter ticking recorded messages at their recorded times.
+
+    Recordings are memory-mapped and only the chunks overlapping the engine's
+    time range are decompressed. With a channel filter, record bodies are
+    first searched for the JSON-encoded channel IDs and names, and only those
+    that mention one are deserialized and filtered exactly. Messages recorded
+    within the same microsecond tick together, and records from several files
+    are merged in time order.
+    """
+
+    def __init__(self, path: str, channels: Set[str]):
+        """Initialize the replay.
+
+        Args:
+            path: Recording file or directory of recordings.
+            channels: Channel IDs or names to replay, or empty for all.
+        """
+        self._paths = recording_paths(path)
+        self._channel_ids, self._channel_names = _split_channels(channels)
+        # Bodies are compact JSON, so a wanted channel appears in them as one of these strings
+        self._id_tokens = [json.dumps(channel_id).encode() for channel_id in self._channel_ids]
+        self._name_tokens = [json.dumps(name, ensure_ascii=False) for name in self._channel_names]
+        self._readers: List[RecordingReader] = []
+        self._records: Optional[Iterator[Record]] = None
+        self._pending: Optional[Record] = None
+        self._last: Optional[datetime] = None
+        super().__init__()
+
+    def start(self, start_time, end_time):
+        """Open the recordings and position them at ``start_time``."""
+        super().start(start_time, end_time)
+        start_ns, end_ns = _to_ns(start_time), _to_ns(end_time)
+        self._readers = [RecordingReader(path) for path in self._paths]
+        streams = [(r for r in reader.records(start_ns, end_ns) if r.kind == KIND_MESSAGE) for reader in self._readers]
+        self._records = heapq.merge(*streams, key=lambda r: r.timestamp_ns)
+
+    def stop(self):
+        """Close the recordings."""
+        for reader in self._readers:
+            reader.close()
+        self._readers = []
+        self._records = None
+
+    def next(self):
+        """Return the next ``(time, [messages])`` tick, or None at the end of the recordings."""
+        batch: List[DiscordMessage] = []
+        when = None
+        while True:
+            record = self._pending if self._pending is not None else next(self._records, None)
+            self._pending = None
+            if record is None:
+                break
+            record_time = _to_datetime(record.timestamp_ns)
+            if when is not None and record_time != when:
+                self._pending = record
+                break
+            if not self._mentions(record.body):
+                continue
+            message = record.decode()
+            if not self._accept(message):
+                continue
+            when = record_time
+            batch.append(message)
+        if not batch:
+            return None
+        # Ticks must move forward; after a wall clock step back, replay just after the previous tick
+        if self._last is not None and when <= self._last:
+            when = self._last + timedelta(microseconds=1)
+        self._last = when
+        return when, batch
+
+    def _mentions(self, body: bytes) -> bool:
+        """Cheaply rule out bodies that cannot pass the channel filter, without deserializing them."""
+        if not (self._id_tokens or self._name_tokens):
+            return True
+        if any(token in body for token in self._id_tokens):
+            return True
+        if self._name_tokens:
+            text = body.decode("utf-8", "replace").lower()
+            return any(token in text for token in self._name_tokens)
+        return False
+
+    def _accept(self, message: DiscordMessage) -> bool:
+        if not (self._channel_ids or self._channel_names):
+            return True
+        # Thread messages are accepted through their parent channel, as live subscriptions do
+        if message.metadata.get("parent_channel_id") in self._channel_ids:
+            return True
+        channel = message.channel
+        if channel is None:
+            return False
+        return channel.id in self._channel_ids or (channel.name or "").lower() in self._channel_names
+
+
+_DiscordReplay = py_pull_adapter_def(
+    "DiscordReplay",
+    DiscordReplayAdapterImpl,
+    ts[[DiscordMessage]],
+    path=str,
+    channels=set,
+    memoize=False,
+)
+
+
+def replay(path: str, channels: Optional[Set[str]] = None) -> ts[[DiscordMessage]]:
+    """Replay recorded messages in simulation mode at their original receive times.
+
+    Args:
+        path: Recording written by ``DiscordAdapter.record``, or a directory of them.
+        channels: Optional set of channel IDs or names to replay; all channels if omitted.
+            As with ``subscribe``, messages in threads of a channel given by ID are included.
+
+    Returns:
+        Time series of lists of DiscordMessage, as ``DiscordAdapter.subscribe`` produces live.
+    """
+    return _DiscordReplay(path=path, channels=set(channels or ()))
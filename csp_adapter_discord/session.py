@@ -0,0 +1,790 @@
+"""Shared Discord connection used by every CSP input and output of an adapter.
+
+A DiscordSession owns a single background thread running a single asyncio
+event loop, on which the adapter's DiscordBackend is connected exactly once.
+That gives one login, one discord.Client, one gateway connection and one
+HTTP connection pool per adapter, no matter how many subscribe/publish
+calls are wired into the graph.
+
+A sharded session additionally runs one :class:`_Shard` per extra gateway
+shard, each with its own discord.Client on its own thread and event loop, so
+that every shard inflates, decodes and parses its own gateway traffic. Their
+events are handed over to the session loop, so listeners still run on a
+single thread. The shards IDENTIFY in turn, as Discord's
+``session_start_limit.max_concurrency`` allows (see :class:`_IdentifyPacer`).
+With ``shard_mode="process"`` the shards run in worker processes instead, see
+:mod:`csp_adapter_discord.cluster`.
+"""
+
+import asyncio
+import functools
+import itertools
+import logging
+import threading
+import time
+from collections.abc import Callable, Coroutine
+from concurrent.futures import Future
+from datetime import UTC, datetime
+from typing import Any, Optional, Union
+
+import discord
+import yarl
+from chatom.base import Organization
+from chatom.discord import DiscordBackend, DiscordChannelType, DiscordMessage, DiscordUser
+from chatom.discord.backend import _discord_attachments, _discord_channel_from_api, _status_to_discord
+from discord.gateway import DiscordWebSocket
+from discord.http import Route
+
+from . import compression
+from .cache import ChannelCache
+from .cluster import ShardCluster
+from .intents import BASE_INTENTS, apply_intents, intent_names, intents_from_names
+from .payload import MessagePayload
+from .structs import DiscordDeleteEvent, DiscordEditEvent, DiscordReactionEvent, GatewayStats
+
+__all__ = ("SHARD_MODES", "DiscordSession")
+
+#: Where the shards of a sharded session run: threads of this process, or worker processes
+SHARD_MODES = ("thread", "process")
+
+log = logging.getLogger(__name__)
+
+# Seconds Discord requires between two IDENTIFYs with the same rate limit key
+IDENTIFY_INTERVAL = 5.0
+
+# Gateway events dispatched by :meth:`DiscordSession.require_message_events`: the session event
+# they are dispatched as, and how to build its events from the payload and the cached channel
+_MESSAGE_EVENTS: dict[str, tuple[str, Callable[[dict, Any], list]]] = {
+    "MESSAGE_REACTION_ADD": ("reaction", lambda data, channel: [DiscordReactionEvent.from_payload(data, True, channel)]),
+    "MESSAGE_REACTION_REMOVE": ("reaction", lambda data, channel: [DiscordReactionEvent.from_payload(data, False, channel)]),
+    # Updates without an edit timestamp are Discord's own, e.g. link embeds being added
+    "MESSAGE_UPDATE": ("edit", lambda data, channel: [DiscordEditEvent.from_payload(data, channel)] if data.get("edited_timestamp") else []),
+    "MESSAGE_DELETE": ("delete", lambda data, channel: [DiscordDeleteEvent.from_payload(data, channel)]),
+    "MESSAGE_DELETE_BULK": ("delete", DiscordDeleteEvent.from_bulk_payload),
+}
+
+
+def _message_from_discord(msg: Any) -> DiscordMessage:
+    """Convert a discord.py Message into a DiscordMessage.
+
+    Mirrors the conversion done by ``DiscordBackend.stream_messages`` so that
+    messages look the same regardless of which path produced them.
+    """
+    channel = _discord_channel_from_api(msg.channel, msg.guild)
+    is_dm = channel.discord_type in (DiscordChannelType.DM, DiscordChannelType.GROUP_DM)
+    metadata = {
+        "channel_id": channel.id,
+        "channel_type": channel.channel_type.value,
+        "discord_type": channel.discord_type.value,
+        "is_dm": is_dm,
+    }
+    parent_id = getattr(msg.channel, "parent_id", None)
+    if parent_id is not None:
+        # Threads are channels of their own, keep the parent so readers can filter on it
+        metadata["parent_channel_id"] = str(parent_id)
+    return DiscordMessage(
+        id=str(msg.id),
+        content=msg.content,
+        created_at=msg.created_at.replace(tzinfo=UTC) if msg.created_at else datetime.now(UTC),
+        author=DiscordUser(id=str(msg.author.id)),
+        channel=channel,
+        guild=Organization(id=str(msg.guild.id)) if msg.guild else None,
+        mentions=[
+            DiscordUser(
+                id=str(u.id),
+                name=u.name,
+                handle=str(u),
+                is_bot=getattr(u, "bot", False),
+                discriminator=getattr(u, "discriminator", "0"),
+            )
+            for u in msg.mentions
+        ],
+        mention_everyone=msg.mention_everyone,
+        mention_roles=[str(r.id) for r in msg.role_mentions] if msg.role_mentions else [],
+        attachments=_discord_attachments(msg),
+        metadata=metadata,
+    )
+
+
+class DiscordSession:
+    """Connection manager shared by all CSP adapters of a DiscordAdapter.
+
+    The session runs ``backend.connect()`` once on its own event loop thread
+    and, if any input needs it, keeps the gateway connection open. Gateway
+    events are converted once and fanned out to listeners registered with
+    :meth:`add_listener`; outputs run their coroutines on the same loop via
+    :meth:`submit` and :meth:`call_soon`.
+
+    Listener callbacks are invoked on the session's event loop thread.
+
+    If ``config.api_url`` is set, REST requests go to that URL and the gateway
+    URL is discovered from its ``/gateway`` endpoint, e.g. to run against
+    :class:`~csp_adapter_discord.testing.FakeDiscordServer`. discord.py keeps
+    these endpoints process-wide, so they are restored when the session stops.
+
+    With ``shards`` the session opens that many gateway shards. Shard 0 is the
+    backend's own client; the others run on threads of their own (see
+    :class:`_Shard`). Discord routes each guild's events to one shard, so the
+    shards' events are disjoint, and they are merged into the same listeners.
+    Messages are tagged with the shard that received them and a per-shard
+    sequence number. REST calls, history and publishing go through shard 0.
+    With ``shard_mode="process"`` every shard runs in a worker process of its
+    own and the session only dispatches what they hand over (see
+    :class:`~csp_adapter_discord.cluster.ShardCluster`); raw gateway events are
+    then not available.
+
+    Inputs declare the gateway intents they need with :meth:`require_intents`
+    while the graph is built. With ``minimal_intents`` the session identifies
+    with only those of the configured intents. The requirements are cleared
+    when the session stops, so a session reused for another graph derives them
+    from that graph alone.
+
+    Attributes:
+        backend: The DiscordBackend this session connects.
+    """
+
+    def __init__(
+        self,
+        backend: DiscordBackend,
+        channel_cache_size: int = 1024,
+        shards: Union[int, str, None] = None,
+        shard_mode: str = "thread",
+        minimal_intents: bool = False,
+    ):
+        """Initialize the session.
+
+        Args:
+            backend: The DiscordBackend to connect and share.
+            channel_cache_size: Maximum number of channel objects kept for publishing.
+            shards: Number of gateway shards to run, ``"auto"`` for the count Discord
+                recommends, or None for a single connection (which still honours
+                ``config.shard_id`` and ``config.shard_count``).
+            shard_mode: One of ``SHARD_MODES``: run the shards on threads of this process or in worker processes.
+            minimal_intents: If True, connect with only the configured intents the inputs need.
+        """
+        if shards is not None and shards != "auto" and (not isinstance(shards, int) or shards < 1):
+            raise ValueError(f"shards must be a positive int, 'auto' or None, got {shards!r}")
+        if shard_mode not in SHARD_MODES:
+            raise ValueError(f"shard_mode must be one of {SHARD_MODES}, got {shard_mode!r}")
+        if shard_mode == "process" and shards is None:
+            raise ValueError("shard_mode='process' needs shards")
+        self._backend = backend
+        self._shards = shards
+        self._shard_mode = shard_mode
+        self._minimal_intents = minimal_intents
+        self._intents: Optional[discord.Intents] = None
+        self._cluster: Optional[ShardCluster] = None
+        self._gateway_counters = compression.GatewayCounters()
+        self._shard_count: Optional[int] = None
+        self._max_concurrency = 1
+        self._identify_pacer: Optional[_IdentifyPacer] = None
+        self._extra_shards: list[_Shard] = []
+        self._channels = ChannelCache(channel_cache_size)
+        self._listeners: dict[str, list[Callable[..., None]]] = {}
+        self._reset_requirements()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._connected = threading.Event()
+        self._stop_event: Optional[asyncio.Event] = None
+        self._error: Optional[BaseException] = None
+        self._saved_endpoints: Optional[tuple[str, yarl.URL]] = None
+
+    @property
+    def backend(self) -> DiscordBackend:
+        """Get the shared backend."""
+        return self._backend
+
+    @property
+    def channels(self) -> ChannelCache:
+        """Get the channel cache used to publish without fetching the channel first."""
+        return self._channels
+
+    @property
+    def loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        """Get the session event loop, or None if the session is not running."""
+        return self._loop
+
+    @property
+    def running(self) -> bool:
+        """Whether the session thread is running and connected."""
+        return self._loop is not None and self._connected.is_set() and self._error is None
+
+    @property
+    def shard_count(self) -> Optional[int]:
+        """Get the number of shards the session runs, or None if it is not sharded."""
+        return self._shard_count
+
+    @property
+    def minimal_intents(self) -> bool:
+        """Whether the session connects with only the intents its inputs need."""
+        return self._minimal_intents
+
+    @property
+    def intents(self) -> Optional[discord.Intents]:
+        """Get the intents the gateway connection identifies with, or None until it is opened."""
+        return self._intents
+
+    def gateway_stats(self) -> GatewayStats:
+        """Get the compressed gateway traffic counters, summed over the session's shards.
+
+        Shards running in worker processes count in their own process and are not included.
+        """
+        counters = [self._gateway_counters, *(shard.counters for shard in self._extra_shards)]
+        return GatewayStats(
+            compression=compression.GatewayDecompressor.COMPRESSION_TYPE,
+            frames=sum(c.frames for c in counters),
+            bytes_in=sum(c.bytes_in for c in counters),
+            bytes_decompressed=sum(c.bytes_decompressed for c in counters),
+        )
+
+    @property
+    def bot_user_id(self) -> Optional[str]:
+        """Get the bot's own user ID once the client has logged in."""
+        client = self._backend._client
+        if client is not None and client.user is not None:
+            return str(client.user.id)
+        return self._backend.bot_user_id
+
+    def require_gateway(self) -> None:
+        """Request that the gateway connection be opened on start.
+
+        Inputs and presence outputs call this while the graph is built.
+        A session that only publishes never opens the gateway.
+        """
+        self._needs_gateway = True
+
+    def require_intents(self, *names: str) -> None:
+        """Declare gateway intents (names of ``discord.Intents`` flags) an input needs.
+
+        Inputs call this while the graph is built, so the intents are derived
+        only from inputs actually wired into it. ``guilds`` is always needed.
+        """
+        self._required_intents.update(names)
+
+    def require_raw_events(self) -> None:
+        """Request that every gateway event's payload be dispatched as ``"raw"``.
+
+        Listeners of ``"raw"`` receive ``(event_name, payload)`` before discord.py
+        parses the event. The hook is only installed when requested, so sessions
+        without a raw listener pay nothing for it. Since they want every event,
+        the configured intents are then kept as they are.
+        """
+        self._needs_raw_events = True
+        self._needs_gateway = True
+
+    def require_message_payloads(self) -> None:
+        """Request that MESSAGE_CREATE payloads be dispatched as ``"message_payload"``.
+
+        Listeners receive a :class:`~csp_adapter_discord.payload.MessagePayload`
+        before discord.py parses the event. While nothing listens for ``"message"``,
+        discord.py's parser is skipped, so no ``discord.Message`` is built at all.
+        """
+        self._needs_payloads = True
+        self._needs_gateway = True
+
+    def require_message_events(self) -> None:
+        """Request that reactions, edits and deletes be dispatched as ``"reaction"``, ``"edit"`` and ``"delete"``.
+
+        Listeners receive a :class:`~csp_adapter_discord.structs.DiscordReactionEvent`,
+        :class:`~csp_adapter_discord.structs.DiscordEditEvent` or
+        :class:`~csp_adapter_discord.structs.DiscordDeleteEvent` built straight from
+        the gateway payload; discord.py still parses the event afterwards to keep its cache.
+        """
+        self._needs_message_events = True
+        self._needs_gateway = True
+
+    def add_listener(self, event: str, callback: Callable[..., None]) -> None:
+        """Register a callback for a session event (e.g. ``"message"``)."""
+        # Copy on write so dispatch can iterate without a lock
+        self._listeners[event] = [*self._listeners.get(event, ()), callback]
+
+    def remove_listener(self, event: str, callback: Callable[..., None]) -> None:
+        """Unregister a callback previously added with :meth:`add_listener`."""
+        self._listeners[event] = [cb for cb in self._listeners.get(event, ()) if cb != callback]
+
+    def dispatch(self, event: str, *args: Any) -> None:
+        """Deliver an event to every registered listener."""
+        for callback in self._listeners.get(event, ()):
+            try:
+                callback(*args)
+            except Exception:
+                log.exception(f"Error in {event!r} listener")
+
+    def start(self, timeout: Optional[float] = None) -> None:
+        """Start the event loop thread and connect the backend.
+
+        Blocks until the backend has connected so that login errors surface
+        at engine start rather than on the first message.
+
+        Args:
+            timeout: Seconds to wait for the connection, defaults to ``config.timeout``.
+        """
+        if self._thread is not None:
+            return
+        self._error = None
+        self._connected.clear()
+        self._thread = threading.Thread(target=self._run, name="discord-session", daemon=True)
+        self._thread.start()
+        if not self._connected.wait(timeout if timeout is not None else self._backend.config.timeout):
+            log.warning("Timed out waiting for Discord backend to connect")
+        if self._error is not None:
+            error, self._error = self._error, None
+            self._thread.join(timeout=5.0)
+            self._thread = None
+            raise error
+        if self._shard_count is not None and self._needs_gateway:
+            try:
+                if self._shard_mode == "process":
+                    if self._needs_raw_events or self._needs_message_events:
+                        log.warning("Raw gateway events, reactions, edits and deletes are not available with shard_mode='process'")
+                    self._cluster = ShardCluster(self, self._shard_count)
+                    self._cluster.start(timeout if timeout is not None else self._backend.config.timeout)
+                else:
+                    for shard_id in range(1, self._shard_count):
+                        shard = _Shard(self, shard_id, self._shard_count)
+                        self._extra_shards.append(shard)
+                        shard.start(timeout)
+            except Exception:
+                self.stop()
+                raise
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Disconnect the backend and stop the event loop thread."""
+        if self._cluster is not None:
+            self._cluster.stop(timeout)
+            self._cluster = None
+        for shard in self._extra_shards:
+            shard.stop(timeout)
+        self._extra_shards = []
+        loop, stop_event = self._loop, self._stop_event
+        if loop is not None and stop_event is not None:
+            loop.call_soon_threadsafe(stop_event.set)
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        self._reset_requirements()
+
+    def submit(self, coro: Coroutine) -> Future:
+        """Schedule a coroutine on the session loop from any thread."""
+        if self._loop is None:
+            coro.close()
+            raise RuntimeError("Discord session is not running")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def call_soon(self, callback: Callable[..., Any], *args: Any) -> None:
+        """Schedule a plain callback on the session loop from any thread."""
+        if self._loop is None:
+            raise RuntimeError("Discord session is not running")
+        self._loop.call_soon_threadsafe(callback, *args)
+
+    async def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the gateway connection is ready.
+
+        Returns:
+            True if ready (or there is no gateway to wait for), False on timeout.
+        """
+        client = self._backend._client
+        if client is None or not self._needs_gateway:
+            return True
+        if self._shard_mode == "process":
+            waits = [self._cluster.wait_until_ready()] if self._cluster is not None else []
+        else:
+            waits = [client.wait_until_ready()]
+        waits.extend(asyncio.wrap_future(shard.submit(shard.client.wait_until_ready())) for shard in self._extra_shards)
+        try:
+            await asyncio.wait_for(asyncio.gather(*waits), timeout=timeout)
+        except TimeoutError:
+            return False
+        return True
+
+    async def set_presence(self, status: str) -> None:
+        """Set the bot's presence status on every shard."""
+        if self._cluster is not None:
+            await self._cluster.set_presence(status)
+            return
+        await self._backend.set_presence(status)
+        for shard in self._extra_shards:
+            await asyncio.wrap_future(shard.submit(shard.client.change_presence(status=_status_to_discord(status))))
+
+    def _run(self) -> None:
+        """Thread target: run the session loop until stopped."""
+        try:
+            asyncio.run(self._main())
+        except Exception as e:
+            log.exception("Error in Discord session")
+            self._error = e
+        finally:
+            self._loop = None
+            self._connected.set()
+
+    async def _main(self) -> None:
+        """Connect, open the gateway if needed and wait for shutdown."""
+        self._stop_event = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        gateway_task: Optional[asyncio.Task] = None
+        if self._needs_gateway:
+            compression.install()
+            compression.track(self._loop, self._gateway_counters)
+        api_url = self._backend.config.api_url
+        if api_url:
+            self._saved_endpoints = (Route.BASE, DiscordWebSocket.DEFAULT_GATEWAY)
+            Route.BASE = api_url.rstrip("/")
+        try:
+            await self._backend.connect()
+            client = self._backend._client
+            if client is not None and self._needs_gateway:
+                self._intents = self._resolve_intents()
+                apply_intents(client, self._intents)
+            if client is not None and api_url and self._needs_gateway:
+                gateway = await client.http.request(Route("GET", "/gateway"))
+                DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(gateway["url"])
+            if client is not None and self._needs_gateway:
+                await self._configure_shards(client)
+        except Exception as e:
+            self._error = e
+            self._connected.set()
+            self._restore_endpoints()
+            return
+        try:
+            if client is not None:
+                self._install_handlers(client)
+                if self._needs_gateway and self._shard_mode != "process":
+                    if self._identify_pacer is not None:
+                        self._identify_pacer.install(client)
+                    gateway_task = asyncio.create_task(client.connect())
+            self._connected.set()
+            await self._stop_event.wait()
+        finally:
+            self._loop = None
+            if gateway_task is not None:
+                gateway_task.cancel()
+                try:
+                    await gateway_task
+                except (asyncio.CancelledError, Exception):  # noqa: BLE001
+                    pass
+            try:
+                await self._backend.disconnect()
+            except Exception:  # noqa: BLE001
+                log.debug("Error disconnecting Discord backend", exc_info=True)
+            self._restore_endpoints()
+
+    def _reset_requirements(self) -> None:
+        """Forget what the inputs of the graph asked for, as before any graph was built."""
+        self._required_intents: set[str] = set(BASE_INTENTS)
+        self._needs_gateway = False
+        self._needs_raw_events = False
+        self._needs_payloads = False
+        self._needs_message_events = False
+
+    def _resolve_intents(self) -> discord.Intents:
+        """Work out the intents to identify with, warning about unused ones and logging missing ones."""
+        configured = self._backend._get_intents()
+        if self._needs_raw_events:
+            return configured
+        required = intents_from_names(self._required_intents)
+        # Only warn about intents the user listed; Intents.default() turns on many more
+        unused = intent_names(intents_from_names(self._backend.config.intents)) - intent_names(required)
+        if unused:
+            log.warning(
+                f"Configured intents {sorted(unused)} are not needed by any input of the graph"
+                + ("; connecting without them" if self._minimal_intents else "; pass minimal_intents=True to connect without them")
+            )
+        missing = intent_names(required) - intent_names(configured)
+        if missing:
+            log.info(f"Inputs of the graph need intents {sorted(missing)} that are not in config.intents")
+        if not self._minimal_intents:
+            return configured
+        return configured & required
+
+    async def _configure_shards(self, client: Any) -> None:
+        """Make the backend's client shard 0 of a sharded session, or the configured shard."""
+        if self._shards is None:
+            shard_id, shard_count = self._backend.config.shard_id, self._backend.config.shard_count
+            if shard_count is None:
+                return
+        else:
+            shard_id, shard_count = 0, self._shards
+            gateway = await client.http.request(Route("GET", "/gateway/bot"))
+            if shard_count == "auto":
+                shard_count = gateway["shards"]
+            self._shard_count = shard_count
+            self._max_concurrency = gateway.get("session_start_limit", {}).get("max_concurrency", 1)
+            if self._shard_mode == "thread":
+                self._identify_pacer = _IdentifyPacer(self._max_concurrency)
+        client.shard_id = shard_id or 0
+        client.shard_count = shard_count
+        client._connection.shard_count = shard_count
+
+    def _restore_endpoints(self) -> None:
+        """Put back the discord.py endpoints replaced for ``config.api_url``."""
+        if self._saved_endpoints is not None:
+            Route.BASE, DiscordWebSocket.DEFAULT_GATEWAY = self._saved_endpoints
+            self._saved_endpoints = None
+
+    def _raw_event(self, dispatch: Callable[..., None], event: str, parser: Callable[[Any], None], data: Any) -> None:
+        """Dispatch a gateway payload to ``"raw"`` listeners, then hand it to discord.py's parser."""
+        dispatch("raw", event, data)
+        parser(data)
+
+    def _message_create(self, client: Any, shard: "_ShardTag", parser: Callable[[Any], None], data: Any) -> None:
+        """Dispatch a MESSAGE_CREATE payload, building discord.py's Message only if someone needs it."""
+        if self._listeners.get("message_payload"):
+            payload = MessagePayload(data, client)
+            if shard.shard_id is not None:
+                payload.shard_id, payload.shard_seq = shard.shard_id, next(shard.payload_seq)
+            shard.dispatch("message_payload", payload)
+        if self._listeners.get("message"):
+            parser(data)
+
+    def _message_event(
+        self, client: Any, dispatch: Callable[..., None], kind: str, build: Callable[[dict, Any], list], parser: Callable[[Any], None], data: Any
+    ) -> None:
+        """Dispatch the events of a reaction, edit or delete payload, then hand it to discord.py's parser."""
+        if self._listeners.get(kind):
+            try:
+                events = build(data, client.get_channel(int(data["channel_id"])))
+            except Exception:
+                log.exception(f"Failed converting Discord {kind} event")
+                events = ()
+            for event in events:
+                dispatch(kind, event)
+        parser(data)
+
+    def _install_handlers(self, client: Any, shard: Optional["_Shard"] = None) -> None:
+        """Route discord.py client events into the session's listeners.
+
+        Args:
+            client: The client whose events to route.
+            shard: The extra shard running ``client``, or None for the backend's client.
+        """
+        tag = _ShardTag(client.shard_id if self._shard_count is not None else None, self.dispatch if shard is None else shard.dispatch)
+        if self._needs_payloads:
+            parsers = client._connection.parsers
+            parsers["MESSAGE_CREATE"] = functools.partial(self._message_create, client, tag, parsers["MESSAGE_CREATE"])
+        if self._needs_message_events:
+            parsers = client._connection.parsers
+            for event, (kind, build) in _MESSAGE_EVENTS.items():
+                parsers[event] = functools.partial(self._message_event, client, tag.dispatch, kind, build, parsers[event])
+        if self._needs_raw_events:
+            # The gateway looks parsers up in this dict on every event, so wrapping in place taps all of them
+            parsers = client._connection.parsers
+            for event, parser in list(parsers.items()):
+                parsers[event] = functools.partial(self._raw_event, tag.dispatch, event, parser)
+
+        async def on_message(msg: Any) -> None:
+            if not self._listeners.get("message"):
+                return
+            try:
+                message = _message_from_discord(msg)
+            except Exception:
+                log.exception("Failed converting Discord message")
+                return
+            if tag.shard_id is not None:
+                message.metadata["shard_id"] = tag.shard_id
+                message.metadata["shard_seq"] = next(tag.message_seq)
+            tag.dispatch("message", message)
+
+        # Keep the channel cache in step with the gateway (GUILD_CREATE, CHANNEL_UPDATE/DELETE, ...)
+        async def on_guild_available(guild: Any) -> None:
+            self._channels.warm(guild)
+
+        async def on_guild_join(guild: Any) -> None:
+            self._channels.warm(guild)
+
+        async def on_guild_remove(guild: Any) -> None:
+            self._channels.remove_guild(guild.id)
+
+        async def on_guild_channel_update(before: Any, after: Any) -> None:
+            self._channels.invalidate(after.id)
+
+        async def on_guild_channel_delete(channel: Any) -> None:
+            self._channels.invalidate(channel.id)
+
+        async def on_thread_update(before: Any, after: Any) -> None:
+            self._channels.invalidate(after.id)
+
+        async def on_thread_delete(thread: Any) -> None:
+            self._channels.invalidate(thread.id)
+
+        client.event(on_message)
+        if shard is not None:
+            # Only the backend's client feeds the channel cache; an extra shard's channels are bound to its own loop
+            return
+        for handler in (
+            on_guild_available,
+            on_guild_join,
+            on_guild_remove,
+            on_guild_channel_update,
+            on_guild_channel_delete,
+            on_thread_update,
+            on_thread_delete,
+        ):
+            client.event(handler)
+
+
+class _IdentifyPacer:
+    """Spaces the IDENTIFYs of a session's shards as Discord requires.
+
+    Shards share the rate limit key ``shard_id % max_concurrency``, and each key
+    allows one IDENTIFY every :data:`IDENTIFY_INTERVAL` seconds, as in
+    discord.py's ``AutoShardedClient``. Each IDENTIFY reserves the next free slot
+    of its key under the lock. Shard threads share a ``threading.Lock`` and a
+    list; shard worker processes share a multiprocessing lock and array, which
+    is why the slots are kept in ``time.monotonic()`` seconds, the same clock in
+    every process.
+    """
+
+    def __init__(self, max_concurrency: int, lock: Any = None, next_at: Any = None):
+        """Initialize the pacer.
+
+        Args:
+            max_concurrency: ``session_start_limit.max_concurrency`` from ``/gateway/bot``.
+            lock: Lock guarding ``next_at``, a ``threading.Lock`` by default.
+            next_at: Sequence of ``max_concurrency`` floats, when each key may next IDENTIFY.
+        """
+        self._max_concurrency = max(1, max_concurrency)
+        self._lock = lock if lock is not None else threading.Lock()
+        self._next_at = next_at if next_at is not None else [0.0] * self._max_concurrency
+
+    def reserve(self, shard_id: int) -> float:
+        """Reserve the next IDENTIFY slot of a shard's key, returning the seconds until it."""
+        key = shard_id % self._max_concurrency
+        with self._lock:
+            now = time.monotonic()
+            at = max(now, self._next_at[key])
+            self._next_at[key] = at + IDENTIFY_INTERVAL
+        return at - now
+
+    async def before_identify(self, shard_id: Optional[int], *, initial: bool = False) -> None:
+        """``before_identify_hook`` of the shards' clients, replacing discord.py's fixed 5s wait on reconnects."""
+        delay = self.reserve(shard_id or 0)
+        if delay > 0:
+            log.debug(f"Discord shard {shard_id} waits {delay:.1f}s to IDENTIFY")
+            await asyncio.sleep(delay)
+
+    def install(self, client: discord.Client) -> None:
+        """Make a client wait for its slot before every IDENTIFY."""
+        client.before_identify_hook = self.before_identify
+
+
+class _ShardTag:
+    """What a client's handlers stamp on the messages of one shard, and how they dispatch them.
+
+    The counters are only advanced on the thread running that shard's client.
+    """
+
+    __slots__ = ("shard_id", "dispatch", "message_seq", "payload_seq")
+
+    def __init__(self, shard_id: Optional[int], dispatch: Callable[..., None]):
+        self.shard_id = shard_id
+        self.dispatch = dispatch
+        self.message_seq = itertools.count(1)
+        self.payload_seq = itertools.count(1)
+
+
+class _Shard:
+    """An extra gateway shard of a sharded DiscordSession.
+
+    Runs its own discord.Client, logged in with the backend's token, on its own
+    thread and event loop, so that the shard's gateway frames are inflated,
+    decoded and parsed off the session loop. Events are dispatched on the
+    session loop. Channel objects from this client are not put in the session's
+    channel cache, since they are bound to this shard's loop.
+    """
+
+    def __init__(self, session: DiscordSession, shard_id: int, shard_count: int):
+        """Initialize the shard.
+
+        Args:
+            session: The session the shard belongs to.
+            shard_id: ID of this shard, from 1 to ``shard_count - 1``.
+            shard_count: Total number of shards.
+        """
+        self.session = session
+        self.shard_id = shard_id
+        self.shard_count = shard_count
+        self.client: Any = None
+        self.counters = compression.GatewayCounters()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._connected = threading.Event()
+        self._stop_event: Optional[asyncio.Event] = None
+        self._error: Optional[BaseException] = None
+
+    def start(self, timeout: Optional[float] = None) -> None:
+        """Start the shard's thread and block until its client has logged in."""
+        self._thread = threading.Thread(target=self._run, name=f"discord-shard-{self.shard_id}", daemon=True)
+        self._thread.start()
+        if not self._connected.wait(timeout if timeout is not None else self.session.backend.config.timeout):
+            log.warning(f"Timed out waiting for Discord shard {self.shard_id} to connect")
+        if self._error is not None:
+            error, self._error = self._error, None
+            self._thread.join(timeout=5.0)
+            self._thread = None
+            raise error
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Close the shard's client and stop its thread."""
+        loop, stop_event = self._loop, self._stop_event
+        if loop is not None and stop_event is not None:
+            loop.call_soon_threadsafe(stop_event.set)
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def submit(self, coro: Coroutine) -> Future:
+        """Schedule a coroutine on the shard's loop from any thread."""
+        if self._loop is None:
+            coro.close()
+            raise RuntimeError(f"Discord shard {self.shard_id} is not running")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def dispatch(self, event: str, *args: Any) -> None:
+        """Hand an event over to the session loop, which delivers it to the listeners."""
+        loop = self.session.loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self.session.dispatch, event, *args)
+
+    def _run(self) -> None:
+        """Thread target: run the shard loop until stopped."""
+        try:
+            asyncio.run(self._main())
+        except Exception as e:
+            log.exception(f"Error in Discord shard {self.shard_id}")
+            self._error = e
+        finally:
+            self._loop = None
+            self._connected.set()
+
+    async def _main(self) -> None:
+        """Log in, connect this shard to the gateway and wait for shutdown."""
+        self._stop_event = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        compression.track(self._loop, self.counters)
+        backend = self.session.backend
+        client = discord.Client(intents=self.session.intents or backend._get_intents(), shard_id=self.shard_id, shard_count=self.shard_count)
+        try:
+            await client.login(backend.config.bot_token_str)
+        except Exception as e:
+            self._error = e
+            self._connected.set()
+            await client.close()
+            return
+        self.client = client
+        self.session._install_handlers(client, self)
+        self.session._identify_pacer.install(client)
+        gateway_task = asyncio.create_task(client.connect())
+        self._connected.set()
+        try:
+            await self._stop_event.wait()
+        finally:
+            self._loop = None
+            gateway_task.cancel()
+            try:
+                await gateway_task
+            except (asyncio.CancelledError, Exception):  # noqa: BLE001
+                pass
+            try:
+                await client.close()
+            except Exception:  # noqa: BLE001
+                log.debug(f"Error closing Discord shard {self.shard_id}", exc_info=True)
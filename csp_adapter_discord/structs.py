@@ -0,0 +1,237 @@
+"""CSP structs ticked by the Discord adapter."""
+
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING, Any, List
+
+import csp
+from chatom.base import Organization
+from chatom.discord import DiscordChannel, DiscordMessage, DiscordUser
+
+if TYPE_CHECKING:
+    from .payload import MessagePayload
+
+__all__ = (
+    "DiscordDeleteEvent",
+    "DiscordEditEvent",
+    "DiscordMessageEvent",
+    "DiscordMessageStruct",
+    "DiscordReactionEvent",
+    "GatewayStats",
+    "PublishStats",
+)
+
+
+class PublishStats(csp.Struct):
+    """Counters of the outbound queues behind ``DiscordAdapter.publish``.
+
+    Summed over every ``publish`` call on the adapter. ``depth`` is the number
+    of messages waiting to be sent; the other fields are running totals.
+    """
+
+    depth: int
+    dropped: int
+    coalesced: int
+    sent: int
+    failed: int
+
+
+class GatewayStats(csp.Struct):
+    """Counters of the compressed gateway traffic behind ``DiscordAdapter.subscribe``.
+
+    Running totals over every gateway connection (and shard) of the adapter.
+    ``bytes_in`` counts compressed bytes received and ``bytes_decompressed``
+    the same traffic after inflating it.
+    """
+
+    compression: str
+    frames: int
+    bytes_in: int
+    bytes_decompressed: int
+
+
+class DiscordMessageStruct(csp.Struct):
+    """The hot fields of a Discord message as a csp.Struct.
+
+    Ticked by ``DiscordAdapter.subscribe(mode="struct")``, straight from the
+    gateway payload. Field access and copies are handled by csp in C++, and the
+    struct works with csp's own serialization (``to_dict``, ``to_json``) and
+    struct filtering. ``created_at`` is naive UTC, like csp times.
+    """
+
+    id: str
+    content: str = ""
+    channel_id: str
+    channel_name: str = ""
+    parent_channel_id: str = ""
+    guild_id: str = ""
+    author_id: str
+    author_name: str = ""
+    is_bot: bool = False
+    is_dm: bool = False
+    created_at: datetime
+    mention_ids: List[str] = []
+    mention_everyone: bool = False
+
+    @classmethod
+    def from_message(cls, message: DiscordMessage) -> "DiscordMessageStruct":
+        """Copy the hot fields of a DiscordMessage."""
+        author = message.author
+        created_at = message.created_at
+        return cls(
+            id=message.id,
+            content=message.content or "",
+            channel_id=message.channel_id,
+            channel_name=message.channel_name or "",
+            parent_channel_id=message.metadata.get("parent_channel_id", ""),
+            guild_id=message.guild.id if message.guild else "",
+            author_id=author.id if author else "",
+            author_name=author.name if author else "",
+            is_bot=author.is_bot if author else False,
+            is_dm=bool(message.metadata.get("is_dm", False)),
+            created_at=created_at.astimezone(UTC).replace(tzinfo=None) if created_at else datetime.now(UTC).replace(tzinfo=None),
+            mention_ids=[u.id for u in message.mentions],
+            mention_everyone=message.mention_everyone,
+        )
+
+    @classmethod
+    def from_payload(cls, payload: "MessagePayload") -> "DiscordMessageStruct":
+        """Read the hot fields from a gateway MESSAGE_CREATE payload."""
+        data = payload.data
+        author = data["author"]
+        channel = payload._channel()
+        parent_id = getattr(channel, "parent_id", None)
+        guild_id = data.get("guild_id")
+        return cls(
+            id=data["id"],
+            content=data.get("content", ""),
+            channel_id=data["channel_id"],
+            channel_name=getattr(channel, "name", None) or ("" if guild_id else "DM"),
+            parent_channel_id=str(parent_id) if parent_id is not None else "",
+            guild_id=guild_id or "",
+            author_id=author["id"],
+            author_name=author.get("username", ""),
+            is_bot=author.get("bot", False),
+            is_dm=guild_id is None,
+            created_at=payload.created_at.replace(tzinfo=None),
+            mention_ids=[u["id"] for u in data.get("mentions", ())],
+            mention_everyone=data.get("mention_everyone", False),
+        )
+
+    def to_message(self) -> DiscordMessage:
+        """Build a DiscordMessage carrying the struct's fields."""
+        metadata = {"channel_id": self.channel_id, "is_dm": self.is_dm}
+        if self.parent_channel_id:
+            metadata["parent_channel_id"] = self.parent_channel_id
+        return DiscordMessage(
+            id=self.id,
+            content=self.content,
+            created_at=self.created_at.replace(tzinfo=UTC),
+            author=DiscordUser(id=self.author_id, name=self.author_name, is_bot=self.is_bot),
+            channel=DiscordChannel(id=self.channel_id, name=self.channel_name),
+            guild=Organization(id=self.guild_id) if self.guild_id else None,
+            mentions=[DiscordUser(id=user_id) for user_id in self.mention_ids],
+            mention_everyone=self.mention_everyone,
+            metadata=metadata,
+        )
+
+
+class DiscordMessageEvent(csp.Struct):
+    """Fields shared by the events about an existing message.
+
+    ``channel_name`` and ``parent_channel_id`` are read from the client's
+    channel cache and are empty when the channel is not cached (e.g. in DMs).
+    """
+
+    message_id: str
+    channel_id: str
+    channel_name: str = ""
+    parent_channel_id: str = ""
+    guild_id: str = ""
+
+    @staticmethod
+    def _channel_fields(data: dict, channel: Any) -> dict:
+        parent_id = getattr(channel, "parent_id", None)
+        return dict(
+            channel_id=data["channel_id"],
+            channel_name=getattr(channel, "name", None) or "",
+            parent_channel_id=str(parent_id) if parent_id is not None else "",
+            guild_id=data.get("guild_id") or "",
+        )
+
+
+class DiscordReactionEvent(DiscordMessageEvent):
+    """A reaction added to or removed from a message.
+
+    Ticked by ``DiscordAdapter.subscribe_reactions``, straight from the gateway's
+    MESSAGE_REACTION_ADD and MESSAGE_REACTION_REMOVE payloads. ``emoji`` is the
+    unicode emoji, or the name of a custom emoji whose ID is in ``emoji_id``.
+    ``message_author_id`` is only sent by Discord for added reactions.
+    """
+
+    added: bool
+    user_id: str
+    emoji: str = ""
+    emoji_id: str = ""
+    message_author_id: str = ""
+
+    @classmethod
+    def from_payload(cls, data: dict, added: bool, channel: Any = None) -> "DiscordReactionEvent":
+        """Read a MESSAGE_REACTION_ADD or MESSAGE_REACTION_REMOVE payload."""
+        emoji = data.get("emoji") or {}
+        return cls(
+            message_id=data["message_id"],
+            added=added,
+            user_id=data["user_id"],
+            emoji=emoji.get("name") or "",
+            emoji_id=emoji.get("id") or "",
+            message_author_id=data.get("message_author_id") or "",
+            **cls._channel_fields(data, channel),
+        )
+
+
+class DiscordEditEvent(DiscordMessageEvent):
+    """A message edited by its author.
+
+    Ticked by ``DiscordAdapter.subscribe_edits`` from MESSAGE_UPDATE payloads
+    that carry an edit timestamp; updates Discord makes itself, such as adding
+    link embeds, are not edits. ``content`` is the new content and
+    ``edited_at`` is naive UTC, like csp times.
+    """
+
+    author_id: str = ""
+    content: str = ""
+    edited_at: datetime
+
+    @classmethod
+    def from_payload(cls, data: dict, channel: Any = None) -> "DiscordEditEvent":
+        """Read a MESSAGE_UPDATE payload that has an ``edited_timestamp``."""
+        author = data.get("author") or {}
+        return cls(
+            message_id=data["id"],
+            author_id=author.get("id", ""),
+            content=data.get("content", ""),
+            edited_at=datetime.fromisoformat(data["edited_timestamp"]).astimezone(UTC).replace(tzinfo=None),
+            **cls._channel_fields(data, channel),
+        )
+
+
+class DiscordDeleteEvent(DiscordMessageEvent):
+    """A deleted message.
+
+    Ticked by ``DiscordAdapter.subscribe_deletes`` from MESSAGE_DELETE payloads,
+    and once per message of a MESSAGE_DELETE_BULK with ``bulk`` set. Discord
+    does not say who deleted the message or who wrote it.
+    """
+
+    bulk: bool = False
+
+    @classmethod
+    def from_payload(cls, data: dict, channel: Any = None) -> "DiscordDeleteEvent":
+        """Read a MESSAGE_DELETE payload."""
+        return cls(message_id=data["id"], **cls._channel_fields(data, channel))
+
+    @classmethod
+    def from_bulk_payload(cls, data: dict, channel: Any = None) -> List["DiscordDeleteEvent"]:
+        """Read a MESSAGE_DELETE_BULK payload, one event per deleted message."""
+        fields = cls._channel_fields(data, channel)
+        return [cls(message_id=message_id, bulk=True, **fields) for message_id in data["ids"]]
@@ -0,0 +1,671 @@
+"""Local stand-in for Discord's REST API and gateway.
+
+FakeDiscordServer runs an aiohttp server on a background thread that speaks
+enough of the Discord protocol for the real adapter code path, discord.py
+included, to log in, connect to the gateway and send messages:
+
+- REST: ``/users/@me``, ``/oauth2/applications/@me``, ``/gateway``,
+  ``/gateway/bot``, ``GET /channels/{id}`` and ``GET``/``POST /channels/{id}/messages``,
+  with per-channel and global rate limits reported through the usual
+  ``X-RateLimit-*`` headers and enforced with 429 responses.
+- Gateway: HELLO, heartbeat ACKs, IDENTIFY, READY, GUILD_CREATE, presence
+  updates, and MESSAGE_CREATE for messages injected with :meth:`FakeDiscordServer.inject_message`
+  (and, by default, for messages posted over REST, as Discord echoes them), as well as
+  reactions, edits and deletes injected with ``inject_reaction``, ``inject_edit`` and ``inject_delete``.
+  Connections that identify as a shard only receive the events of the guild
+  when it belongs to that shard, and DM events only on shard 0, as on Discord.
+  IDENTIFYs sharing a rate limit key (``shard_id % max_concurrency``) less than
+  ``identify_interval`` apart are counted in ``identify_rate_violations``.
+  Connections asking for ``compress=zlib-stream`` get zlib-compressed binary
+  frames, each ending with a sync flush, as Discord sends them.
+
+Point an adapter at it with ``DiscordConfig(token=..., api_url=server.api_url)``,
+and use :func:`run_with_server` to run a graph and inject events once the
+adapter has connected.
+
+Example:
+    >>> with FakeDiscordServer(channels={"1001": "general"}) as server:
+    ...     adapter = DiscordAdapter(DiscordConfig(token="fake", api_url=server.api_url))
+    ...     server.inject_message("1001", "hello")
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import socket
+import threading
+import time
+import zlib
+from datetime import UTC, datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import csp
+from aiohttp import WSMsgType, web
+
+__all__ = ("FakeDiscordServer", "run_with_server")
+
+log = logging.getLogger(__name__)
+
+_API_PREFIX = "/api/v10"
+# Discord snowflakes count milliseconds from this epoch
+_DISCORD_EPOCH_MS = 1420070400000
+
+
+def _json_response(data: Any, status: int = 200, headers: Optional[Dict[str, str]] = None) -> web.Response:
+    """JSON response with a bare ``application/json`` content type, which is what discord.py checks for."""
+    return web.Response(body=json.dumps(data).encode(), status=status, headers={**(headers or {}), "Content-Type": "application/json"})
+
+
+class _Bucket:
+    """Fixed-window rate limit bucket."""
+
+    def __init__(self, name: str, limit: int, window: float):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.remaining = limit
+        self.reset_at = 0.0
+
+    def acquire(self, now: float) -> bool:
+        if now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = now + self.window
+        if self.remaining <= 0:
+            return False
+        self.remaining -= 1
+        return True
+
+    def headers(self, now: float) -> Dict[str, str]:
+        reset_after = max(0.0, self.reset_at - now)
+        return {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": f"{time.time() + reset_after:.3f}",
+            "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+            "X-RateLimit-Bucket": self.name,
+        }
+
+
+class FakeDiscordServer:
+    """In-process fake of Discord's REST API and gateway for offline tests and benchmarks.
+
+    Attributes:
+        posted: Message payloads received over REST, keyed by channel ID.
+        posted_ns: ``time.perf_counter_ns()`` at which each entry of ``posted`` arrived.
+        history: Every message of each channel, oldest first, as served by ``GET /channels/{id}/messages``.
+        presence_updates: Presence payloads received over the gateway (op 3).
+        identified_intents: Intents value sent in each IDENTIFY (op 2).
+        identify_rate_violations: Number of IDENTIFYs that came sooner after the previous one
+            of the same rate limit key than Discord allows.
+        request_count: Number of REST requests served, including 429s.
+        rate_limited_count: Number of 429 responses returned.
+    """
+
+    def __init__(
+        self,
+        channels: Optional[Dict[str, str]] = None,
+        guild_id: str = "1000",
+        bot_user_id: str = "4242",
+        host: str = "127.0.0.1",
+        port: int = 0,
+        rate_limit: int = 5,
+        rate_limit_window: float = 1.0,
+        global_rate_limit: int = 50,
+        heartbeat_interval: float = 41.25,
+        echo: bool = True,
+        recommended_shards: int = 1,
+        max_concurrency: int = 1,
+        identify_interval: float = 5.0,
+    ):
+        """Initialize the server.
+
+        Args:
+            channels: Text channels of the fake guild, channel ID to name. Defaults to ``{"1001": "general"}``.
+            guild_id: ID of the fake guild.
+            bot_user_id: User ID of the bot that logs in.
+            host: Interface to listen on.
+            port: Port to listen on, 0 to pick a free one.
+            rate_limit: Requests allowed per channel per ``rate_limit_window`` when posting messages.
+            rate_limit_window: Rate limit window in seconds.
+            global_rate_limit: Requests allowed per second across all routes.
+            heartbeat_interval: Gateway heartbeat interval in seconds sent in HELLO.
+            echo: If True, messages posted over REST are also dispatched as MESSAGE_CREATE.
+            recommended_shards: Shard count returned by ``/gateway/bot``.
+            max_concurrency: ``session_start_limit.max_concurrency`` returned by ``/gateway/bot``.
+            identify_interval: Seconds Discord requires between IDENTIFYs of the same rate limit key.
+        """
+        self.channels = dict(channels or {"1001": "general"})
+        self.guild_id = guild_id
+        self.bot_user_id = bot_user_id
+        self.host = host
+        self._port = port
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.global_rate_limit = global_rate_limit
+        self.heartbeat_interval = heartbeat_interval
+        self.echo = echo
+        self.recommended_shards = recommended_shards
+        self.max_concurrency = max_concurrency
+        self.identify_interval = identify_interval
+
+        self.posted: Dict[str, List[dict]] = {}
+        self.posted_ns: Dict[str, List[int]] = {}
+        self.history: Dict[str, List[dict]] = {}
+        self.presence_updates: List[dict] = []
+        self.identified_intents: List[int] = []
+        self.identify_rate_violations = 0
+        self.request_count = 0
+        self.rate_limited_count = 0
+
+        self._ids = itertools.count(1)
+        self._buckets: Dict[str, _Bucket] = {}
+        self._global = _Bucket("global", global_rate_limit, 1.0)
+        self._sockets: List[web.WebSocketResponse] = []
+        # (shard_id, shard_count) each connection identified with
+        self._shards: Dict[web.WebSocketResponse, tuple] = {}
+        # zlib-stream compressor of each connection that asked for one
+        self._compressors: Dict[web.WebSocketResponse, Any] = {}
+        # Monotonic time of the last IDENTIFY of each rate limit key
+        self._identified_at: Dict[int, float] = {}
+        self._sequence = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._started = threading.Event()
+        self._stop_event: Optional[asyncio.Event] = None
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    @property
+    def port(self) -> int:
+        """Port the server listens on (known once started)."""
+        return self._port
+
+    @property
+    def api_url(self) -> str:
+        """Base URL of the REST API, for ``DiscordConfig.api_url``."""
+        return f"http://{self.host}:{self._port}{_API_PREFIX}"
+
+    @property
+    def gateway_url(self) -> str:
+        """URL of the gateway WebSocket."""
+        return f"ws://{self.host}:{self._port}/gateway"
+
+    @property
+    def connection_count(self) -> int:
+        """Number of identified gateway connections."""
+        return len(self._sockets)
+
+    def wait_for_connections(self, count: int, timeout: float = 5.0) -> bool:
+        """Wait until exactly ``count`` gateway connections are identified.
+
+        Connections close asynchronously, so after an adapter stops use
+        ``wait_for_connections(0)`` rather than reading :attr:`connection_count`.
+
+        Returns:
+            True if the count was reached, False on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        while self.connection_count != count:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def inject_when_connected(self, inject: Callable[[], None], connections: int = 1, timeout: float = 5.0, settle: float = 0.2) -> threading.Thread:
+        """Call ``inject`` on a background thread once ``connections`` gateway connections are up.
+
+        Args:
+            inject: Callback injecting events, e.g. with :meth:`inject_message`.
+            connections: Number of connections to wait for, one per shard.
+            timeout: Seconds to wait for the connections before injecting anyway.
+            settle: Seconds to wait after connecting, for the adapter to finish handling READY.
+        """
+
+        def run():
+            self.wait_for_connections(connections, timeout)
+            time.sleep(settle)
+            inject()
+
+        thread = threading.Thread(target=run, name="fake-discord-inject", daemon=True)
+        thread.start()
+        return thread
+
+    def start(self, timeout: float = 5.0) -> "FakeDiscordServer":
+        """Start serving on a background thread, returning once the port is bound."""
+        if self._thread is not None:
+            return self
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self._port))
+        self._port = sock.getsockname()[1]
+        self._thread = threading.Thread(target=asyncio.run, args=(self._serve(sock),), name="fake-discord", daemon=True)
+        self._thread.start()
+        if not self._started.wait(timeout):
+            raise RuntimeError("Fake Discord server did not start")
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Close every connection and stop the server."""
+        if self._loop is not None and self._stop_event is not None:
+            self._loop.call_soon_threadsafe(self._stop_event.set)
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def __enter__(self) -> "FakeDiscordServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    async def _serve(self, sock: socket.socket) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        app = web.Application()
+        app.router.add_get(f"{_API_PREFIX}/users/@me", self._get_me)
+        app.router.add_get(f"{_API_PREFIX}/oauth2/applications/@me", self._get_application)
+        app.router.add_get(f"{_API_PREFIX}/gateway", self._get_gateway)
+        app.router.add_get(f"{_API_PREFIX}/gateway/bot", self._get_gateway)
+        app.router.add_get(f"{_API_PREFIX}/channels/{{channel_id}}", self._get_channel)
+        app.router.add_get(f"{_API_PREFIX}/channels/{{channel_id}}/messages", self._get_messages)
+        app.router.add_post(f"{_API_PREFIX}/channels/{{channel_id}}/messages", self._post_message)
+        app.router.add_get("/gateway", self._gateway)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.SockSite(self._runner, sock).start()
+        self._started.set()
+        try:
+            await self._stop_event.wait()
+        finally:
+            for ws in list(self._sockets):
+                await ws.close()
+            await self._runner.cleanup()
+            self._loop = None
+
+    # ------------------------------------------------------------------
+    # Driving the server
+    # ------------------------------------------------------------------
+
+    def inject_message(self, channel_id: str, content: str, author_id: str = "5555", author_name: str = "someone") -> str:
+        """Dispatch a MESSAGE_CREATE to every gateway connection, as if a user posted it.
+
+        Can be called from any thread.
+
+        Returns:
+            The ID of the injected message.
+        """
+        payload = self._message_payload(channel_id, content, {"id": author_id, "username": author_name})
+        self._call_soon(self._store_and_dispatch, channel_id, payload)
+        return payload["id"]
+
+    def add_history(
+        self,
+        channel_id: str,
+        content: str,
+        created_at: Optional[datetime] = None,
+        author_id: str = "5555",
+        author_name: str = "someone",
+    ) -> str:
+        """Add a message to a channel's history without dispatching it, as if it was posted earlier.
+
+        Call before starting the server, or from its loop, and in ``created_at`` order.
+
+        Returns:
+            The ID of the message.
+        """
+        created_at = created_at or datetime.now(UTC)
+        payload = self._message_payload(channel_id, content, {"id": author_id, "username": author_name}, created_at=created_at)
+        self.history.setdefault(channel_id, []).append(payload)
+        return payload["id"]
+
+    def inject_reaction(self, channel_id: str, message_id: str, emoji: str = "\N{THUMBS UP SIGN}", user_id: str = "5555", added: bool = True) -> None:
+        """Dispatch a MESSAGE_REACTION_ADD (or _REMOVE) of a unicode emoji, from any thread."""
+        payload = {
+            "message_id": message_id,
+            "channel_id": channel_id,
+            "user_id": user_id,
+            "emoji": {"id": None, "name": emoji},
+            "type": 0,
+            "burst": False,
+        }
+        if channel_id in self.channels:
+            payload["guild_id"] = self.guild_id
+        self._call_soon(self._dispatch, "MESSAGE_REACTION_ADD" if added else "MESSAGE_REACTION_REMOVE", payload)
+
+    def inject_edit(self, channel_id: str, message_id: str, content: str, author_id: str = "5555", author_name: str = "someone") -> None:
+        """Dispatch a MESSAGE_UPDATE editing a message's content, from any thread."""
+        payload = self._message_payload(
+            channel_id, content, {"id": author_id, "username": author_name}, id=message_id, edited_timestamp=datetime.now(UTC).isoformat()
+        )
+        self._call_soon(self._dispatch, "MESSAGE_UPDATE", payload)
+
+    def inject_delete(self, channel_id: str, *message_ids: str) -> None:
+        """Dispatch a MESSAGE_DELETE, or a MESSAGE_DELETE_BULK for several messages, from any thread."""
+        payload: Dict[str, Any] = {"id": message_ids[0]} if len(message_ids) == 1 else {"ids": list(message_ids)}
+        payload["channel_id"] = channel_id
+        if channel_id in self.channels:
+            payload["guild_id"] = self.guild_id
+        self._call_soon(self._dispatch, "MESSAGE_DELETE" if len(message_ids) == 1 else "MESSAGE_DELETE_BULK", payload)
+
+    def inject_event(self, event: str, data: dict) -> None:
+        """Dispatch an arbitrary gateway event to every gateway connection, from any thread."""
+        self._call_soon(self._dispatch, event, data)
+
+    def _call_soon(self, callback, *args) -> None:
+        if self._loop is None:
+            raise RuntimeError("Fake Discord server is not running")
+        self._loop.call_soon_threadsafe(callback, *args)
+
+    def _store_and_dispatch(self, channel_id: str, payload: dict) -> None:
+        self.history.setdefault(channel_id, []).append(payload)
+        self._dispatch("MESSAGE_CREATE", payload)
+
+    def _dispatch(self, event: str, data: dict) -> None:
+        self._sequence += 1
+        frame = json.dumps({"op": 0, "t": event, "s": self._sequence, "d": data})
+        guild_id = data.get("guild_id")
+        for ws in list(self._sockets):
+            if not ws.closed and self._shard_owns(ws, guild_id):
+                asyncio.ensure_future(self._send(ws, frame))
+
+    def _send(self, ws: web.WebSocketResponse, frame: str) -> Awaitable[None]:
+        """Send a gateway frame, compressing it now so that frames enter the zlib stream in order."""
+        compressor = self._compressors.get(ws)
+        if compressor is None:
+            return ws.send_str(frame)
+        return ws.send_bytes(compressor.compress(frame.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH))
+
+    def _shard_owns(self, ws: web.WebSocketResponse, guild_id: Optional[str]) -> bool:
+        """Whether a connection receives the events of a guild (None for DMs), per Discord's sharding formula."""
+        shard_id, shard_count = self._shards.get(ws, (0, 1))
+        if guild_id is None:
+            return shard_id == 0
+        return (int(guild_id) >> 22) % shard_count == shard_id
+
+    # ------------------------------------------------------------------
+    # Payloads
+    # ------------------------------------------------------------------
+
+    def _snowflake(self, created_at: Optional[datetime] = None) -> str:
+        ms = int((created_at.timestamp() if created_at else time.time()) * 1000)
+        return str(((ms - _DISCORD_EPOCH_MS) << 22) | (next(self._ids) & 0x3FFFFF))
+
+    def _bot_user(self) -> dict:
+        return {"id": self.bot_user_id, "username": "fake-bot", "discriminator": "0", "global_name": None, "avatar": None, "bot": True}
+
+    def _channel_payload(self, channel_id: str) -> dict:
+        return {
+            "id": channel_id,
+            "type": 0,
+            "name": self.channels[channel_id],
+            "guild_id": self.guild_id,
+            "position": list(self.channels).index(channel_id),
+            "permission_overwrites": [],
+            "nsfw": False,
+            "parent_id": None,
+            "topic": None,
+            "last_message_id": None,
+            "rate_limit_per_user": 0,
+        }
+
+    def _guild_payload(self) -> dict:
+        return {
+            "id": self.guild_id,
+            "name": "fake-guild",
+            "unavailable": False,
+            "owner_id": self.bot_user_id,
+            "member_count": 1,
+            "large": False,
+            "features": [],
+            "emojis": [],
+            "stickers": [],
+            "roles": [
+                {
+                    "id": self.guild_id,
+                    "name": "@everyone",
+                    "permissions": "2048",
+                    "position": 0,
+                    "color": 0,
+                    "hoist": False,
+                    "managed": False,
+                    "mentionable": False,
+                }
+            ],
+            "channels": [self._channel_payload(channel_id) for channel_id in self.channels],
+            "threads": [],
+            "members": [],
+            "presences": [],
+            "voice_states": [],
+            "joined_at": datetime.now(UTC).isoformat(),
+        }
+
+    def _message_payload(self, channel_id: str, content: str, author: dict, created_at: Optional[datetime] = None, **extra: Any) -> dict:
+        created_at = created_at or datetime.now(UTC)
+        # DMs have no guild_id key at all, discord.py relies on that
+        guild = {"guild_id": self.guild_id} if channel_id in self.channels else {}
+        return {
+            "id": self._snowflake(created_at),
+            "channel_id": channel_id,
+            **guild,
+            "author": {"discriminator": "0", "global_name": None, "avatar": None, **author},
+            "content": content,
+            "timestamp": created_at.isoformat(),
+            "edited_timestamp": None,
+            "tts": False,
+            "mention_everyone": False,
+            "mentions": [],
+            "mention_roles": [],
+            "attachments": [],
+            "embeds": [],
+            "pinned": False,
+            "type": 0,
+            **extra,
+        }
+
+    # ------------------------------------------------------------------
+    # REST
+    # ------------------------------------------------------------------
+
+    def _limit(self, bucket: Optional[_Bucket]) -> Optional[web.Response]:
+        """Count a request against the global and route buckets, returning a 429 if either is exhausted."""
+        self.request_count += 1
+        now = time.monotonic()
+        if not self._global.acquire(now):
+            self.rate_limited_count += 1
+            retry_after = max(0.0, self._global.reset_at - now)
+            return _json_response(
+                {"message": "You are being rate limited.", "retry_after": retry_after, "global": True},
+                status=429,
+                headers={"Retry-After": f"{retry_after:.3f}", "X-RateLimit-Global": "true", "X-RateLimit-Scope": "global"},
+            )
+        if bucket is not None and not bucket.acquire(now):
+            self.rate_limited_count += 1
+            headers = bucket.headers(now)
+            retry_after = float(headers["X-RateLimit-Reset-After"])
+            return _json_response(
+                {"message": "You are being rate limited.", "retry_after": retry_after, "global": False},
+                status=429,
+                headers={**headers, "Retry-After": f"{retry_after:.3f}", "X-RateLimit-Scope": "user"},
+            )
+        return None
+
+    async def _get_me(self, request: web.Request) -> web.Response:
+        return self._limit(None) or _json_response(self._bot_user())
+
+    async def _get_application(self, request: web.Request) -> web.Response:
+        return self._limit(None) or _json_response(
+            {
+                "id": self.bot_user_id,
+                "name": "fake-bot",
+                "description": "",
+                "icon": None,
+                "bot_public": False,
+                "bot_require_code_grant": False,
+                "owner": self._bot_user(),
+                "verify_key": "",
+                "flags": 0,
+            }
+        )
+
+    async def _get_gateway(self, request: web.Request) -> web.Response:
+        return self._limit(None) or _json_response(
+            {
+                "url": self.gateway_url,
+                "shards": self.recommended_shards,
+                "session_start_limit": {"total": 1000, "remaining": 1000, "reset_after": 0, "max_concurrency": self.max_concurrency},
+            }
+        )
+
+    async def _get_channel(self, request: web.Request) -> web.Response:
+        limited = self._limit(None)
+        if limited is not None:
+            return limited
+        channel_id = request.match_info["channel_id"]
+        if channel_id not in self.channels:
+            return _json_response({"message": "Unknown Channel", "code": 10003}, status=404)
+        return _json_response(self._channel_payload(channel_id))
+
+    def _bucket(self, name: str) -> _Bucket:
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            bucket = self._buckets[name] = _Bucket(name, self.rate_limit, self.rate_limit_window)
+        return bucket
+
+    async def _get_messages(self, request: web.Request) -> web.Response:
+        channel_id = request.match_info["channel_id"]
+        bucket = self._bucket(f"history-{channel_id}")
+        limited = self._limit(bucket)
+        if limited is not None:
+            return limited
+        if channel_id not in self.channels:
+            return _json_response({"message": "Unknown Channel", "code": 10003}, status=404)
+        limit = min(int(request.query.get("limit", 50)), 100)
+        messages = self.history.get(channel_id, [])
+        if "before" in request.query:
+            messages = [m for m in messages if int(m["id"]) < int(request.query["before"])][-limit:]
+        elif "after" in request.query:
+            # Like Discord: the messages right after the bound, still returned newest first
+            messages = [m for m in messages if int(m["id"]) > int(request.query["after"])][:limit]
+        else:
+            messages = messages[-limit:]
+        return _json_response(messages[::-1], headers=bucket.headers(time.monotonic()))
+
+    async def _post_message(self, request: web.Request) -> web.Response:
+        received_ns = time.perf_counter_ns()
+        channel_id = request.match_info["channel_id"]
+        bucket = self._bucket(f"messages-{channel_id}")
+        limited = self._limit(bucket)
+        if limited is not None:
+            return limited
+        if channel_id not in self.channels:
+            return _json_response({"message": "Unknown Channel", "code": 10003}, status=404)
+        if request.content_type == "multipart/form-data":
+            body = {}
+            async for part in await request.multipart():
+                if part.name == "payload_json":
+                    body = json.loads(await part.text())
+        else:
+            body = await request.json()
+        self.posted.setdefault(channel_id, []).append(body)
+        self.posted_ns.setdefault(channel_id, []).append(received_ns)
+        extra = {}
+        if body.get("message_reference"):
+            extra["message_reference"] = body["message_reference"]
+        payload = self._message_payload(channel_id, body.get("content") or "", self._bot_user(), embeds=body.get("embeds") or [], **extra)
+        self.history.setdefault(channel_id, []).append(payload)
+        if self.echo:
+            self._dispatch("MESSAGE_CREATE", payload)
+        return _json_response(payload, headers=bucket.headers(time.monotonic()))
+
+    # ------------------------------------------------------------------
+    # Gateway
+    # ------------------------------------------------------------------
+
+    async def _gateway(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        if request.query.get("compress") == "zlib-stream":
+            self._compressors[ws] = zlib.compressobj()
+        await self._send(ws, json.dumps({"op": 10, "d": {"heartbeat_interval": int(self.heartbeat_interval * 1000)}, "s": None, "t": None}))
+        try:
+            async for frame in ws:
+                if frame.type != WSMsgType.TEXT:
+                    continue
+                msg = json.loads(frame.data)
+                op = msg.get("op")
+                if op == 1:
+                    await self._send(ws, json.dumps({"op": 11, "d": None, "s": None, "t": None}))
+                elif op == 2:
+                    self.identified_intents.append(msg["d"].get("intents"))
+                    shard = msg["d"].get("shard") or (0, 1)
+                    self._check_identify_rate(shard[0])
+                    await self._identify(ws, shard)
+                elif op == 3:
+                    self.presence_updates.append(msg["d"])
+                elif op == 6:
+                    # Sessions cannot be resumed, make the client identify again
+                    await self._send(ws, json.dumps({"op": 9, "d": False, "s": None, "t": None}))
+        finally:
+            if ws in self._sockets:
+                self._sockets.remove(ws)
+            self._shards.pop(ws, None)
+            self._compressors.pop(ws, None)
+        return ws
+
+    def _check_identify_rate(self, shard_id: int) -> None:
+        key = shard_id % self.max_concurrency
+        now = time.monotonic()
+        last = self._identified_at.get(key)
+        # A little slack for the frames' trip through the event loops
+        if last is not None and now - last < self.identify_interval - 0.1:
+            self.identify_rate_violations += 1
+            log.warning(f"Shard {shard_id} identified {now - last:.2f}s after the previous IDENTIFY of rate limit key {key}")
+        self._identified_at[key] = now
+
+    async def _identify(self, ws: web.WebSocketResponse, shard: tuple) -> None:
+        self._sockets.append(ws)
+        self._shards[ws] = tuple(shard)
+        owns_guild = self._shard_owns(ws, self.guild_id)
+        self._sequence += 1
+        ready = {
+            "v": 10,
+            "user": self._bot_user(),
+            "guilds": [{"id": self.guild_id, "unavailable": True}] if owns_guild else [],
+            "session_id": "fake-session",
+            "resume_gateway_url": self.gateway_url,
+            "application": {"id": self.bot_user_id, "flags": 0},
+            "private_channels": [],
+            "shard": list(shard),
+        }
+        await self._send(ws, json.dumps({"op": 0, "t": "READY", "s": self._sequence, "d": ready}))
+        if owns_guild:
+            self._sequence += 1
+            await self._send(ws, json.dumps({"op": 0, "t": "GUILD_CREATE", "s": self._sequence, "d": self._guild_payload()}))
+
+
+def run_with_server(
+    server: FakeDiscordServer,
+    graph: Callable,
+    inject: Optional[Callable[[], None]] = None,
+    connections: int = 1,
+    seconds: float = 1.5,
+) -> dict:
+    """Run a graph in realtime against a FakeDiscordServer.
+
+    Args:
+        server: The running server the graph's adapter points at.
+        graph: The graph to run.
+        inject: Optional callback injecting events once the adapter has connected.
+        connections: Number of gateway connections to wait for before injecting, one per shard.
+        seconds: How long to run the graph for.
+
+    Returns:
+        The graph outputs, as from ``csp.run``.
+    """
+    if inject is not None:
+        server.inject_when_connected(inject, connections)
+    return csp.run(graph, realtime=True, endtime=timedelta(seconds=seconds))
@@ -0,0 +1,67 @@
+"""Stand-ins shared by the tests of the session and the publish path."""
+
+from datetime import datetime
+from types import SimpleNamespace
+
+from csp_adapter_discord import DiscordConfig, MockDiscordBackend
+from csp_adapter_discord.nodes import DiscordMessageWriterImpl
+from csp_adapter_discord.session import DiscordSession
+
+__all__ = ("FakeChannel", "FakeClient", "FakeMessagingClient", "make_writer")
+
+
+class FakeClient:
+    """Minimal discord.Client stand-in supporting event registration."""
+
+    user = None
+
+    def event(self, coro):
+        setattr(self, coro.__name__, coro)
+        return coro
+
+
+class FakeChannel:
+    """Messageable stand-in recording what was sent."""
+
+    def __init__(self, id, guild_id=1, fail=None):
+        self.id = id
+        self.guild = SimpleNamespace(id=guild_id)
+        self.sent = []
+        self.fail = fail
+
+    async def send(self, **kwargs):
+        if self.fail is not None:
+            raise self.fail
+        self.sent.append(kwargs)
+        return SimpleNamespace(
+            id=len(self.sent),
+            content=kwargs.get("content"),
+            created_at=datetime(2025, 1, 1),
+            author=SimpleNamespace(id=99),
+            channel=SimpleNamespace(id=self.id),
+            guild=self.guild,
+        )
+
+
+class FakeMessagingClient(FakeClient):
+    """Client stand-in with gateway state lookups and a REST fetch that must not be used."""
+
+    def __init__(self, *channels):
+        self.state = {c.id: c for c in channels}
+        self.partials = {}
+
+    def get_channel(self, channel_id):
+        return self.state.get(channel_id)
+
+    def get_partial_messageable(self, channel_id):
+        return self.partials.setdefault(channel_id, FakeChannel(channel_id))
+
+    async def fetch_channel(self, channel_id):
+        raise AssertionError("publish should not fetch the channel over REST")
+
+
+def make_writer(client, cache_size=1024, **kwargs):
+    backend = MockDiscordBackend(config=DiscordConfig(bot_token="fake_token_for_testing"))
+    object.__setattr__(backend, "_client", client)
+    session = DiscordSession(backend, channel_cache_size=cache_size)
+    return DiscordMessageWriterImpl(SimpleNamespace(session=session, writers=[]), **kwargs), session
@@ -2,7 +2,9 @@
 
 import asyncio
 import tempfile
-from datetime import datetime, timedelta
+import threading
+import time
+from datetime import UTC, datetime, timedelta
 from unittest.mock import MagicMock, patch
 
 import csp
@@ -23,6 +25,7 @@ from csp_adapter_discord import (
     DiscordMessageFlags,
     DiscordMessageType,
     DiscordPresence,
+    DiscordSession,
     DiscordUser,
     MockDiscordBackend,
     mention_channel,
@@ -31,6 +34,39 @@ from csp_adapter_discord import (
     mention_role,
     mention_user,
 )
+from csp_adapter_discord.nodes import DiscordAdapterManagerImpl, DiscordChannelReaderImpl, DiscordMessageReaderImpl, _split_channels
+
+
+class CountingMockBackend(MockDiscordBackend):
+    """MockDiscordBackend that counts logins."""
+
+    connect_calls: int = 0
+
+    async def connect(self) -> None:
+        self.connect_calls += 1
+        await super().connect()
+
+
+def _message(id, content="", channel_id="456", channel_name="general", author_id="123", created_at=None):
+    return DiscordMessage(
+        id=id,
+        content=content,
+        channel=DiscordChannel(id=channel_id, name=channel_name),
+        author=DiscordUser(id=author_id),
+        created_at=created_at,
+    )
+
+
+def _dispatch_later(adapter, *messages, delay=0.1):
+    """Deliver messages through the adapter's session as if they came off the gateway."""
+
+    def run():
+        time.sleep(delay)
+        for message in messages:
+            adapter.session.call_soon(adapter.session.dispatch, "message", message)
+
+    threading.Thread(target=run, daemon=True).start()
+
 
 # ---------------------------------------------------------------------------
 # Imports
@@ -42,6 +78,7 @@ class TestImports:
         """All __all__ exports are importable and non-None."""
         assert DiscordAdapter is not None
         assert DiscordAdapterManager is DiscordAdapter
+        assert DiscordSession is not None
         assert DiscordBackend is not None
         assert DiscordConfig is not None
         assert DiscordMessage is not None
@@ -429,6 +466,16 @@ class TestMockBackend:
 # ---------------------------------------------------------------------------
 
 
+class TestSplitChannels:
+    def test_ids_and_names(self):
+        ids, names = _split_channels({"123", "#General", " random ", ""})
+        assert ids == {"123"}
+        assert names == {"general", "random"}
+
+    def test_empty(self):
+        assert _split_channels(set()) == (frozenset(), frozenset())
+
+
 class TestDiscordAdapter:
     def test_init(self):
         """DiscordAdapter.__init__ creates a DiscordBackend and passes it to super."""
@@ -443,38 +490,249 @@ class TestDiscordAdapter:
     def test_legacy_alias(self):
         assert DiscordAdapterManager is DiscordAdapter
 
-    def test_subscribe_calls_super(self):
-        """subscribe delegates to BackendAdapter.subscribe with correct args."""
+    def test_session_wraps_backend(self):
+        """DiscordAdapter owns one DiscordSession around its backend."""
         config = DiscordConfig(bot_token="fake_token_for_testing")
-        with patch("csp_adapter_discord.adapter.DiscordBackend"):
+        with patch("csp_adapter_discord.adapter.DiscordBackend", MockDiscordBackend):
             adapter = DiscordAdapter(config=config)
-            with patch.object(type(adapter).__bases__[0], "subscribe", return_value="mock_ts") as mock_sub:
-                result = adapter.subscribe(channels={"general"}, skip_own=False, skip_history=False)
-                mock_sub.assert_called_once_with(channels={"general"}, skip_own=False, skip_history=False)
-                assert result == "mock_ts"
+        assert isinstance(adapter.session, DiscordSession)
+        assert adapter.session.backend is adapter.backend
 
-    def test_publish_calls_super(self):
-        """publish delegates to BackendAdapter.publish."""
+    def test_subscribe_publish_presence_share_session(self):
+        """subscribe, publish and publish_presence all run over one connection."""
         config = DiscordConfig(bot_token="fake_token_for_testing")
-        with patch("csp_adapter_discord.adapter.DiscordBackend"):
+        with patch("csp_adapter_discord.adapter.DiscordBackend", CountingMockBackend):
             adapter = DiscordAdapter(config=config)
-            mock_msg = MagicMock()
-            with patch.object(type(adapter).__bases__[0], "publish") as mock_pub:
-                adapter.publish(mock_msg)
-                mock_pub.assert_called_once_with(msg=mock_msg)
+        adapter.backend.add_mock_channel(id="456", name="general")
+
+        @csp.node
+        def echo(msgs: csp.ts[[DiscordMessage]]) -> csp.ts[DiscordMessage]:
+            if msgs:
+                return DiscordMessage(channel=msgs[0].channel, content="echo " + msgs[0].content)
 
-    def test_publish_presence_calls_super(self):
-        """publish_presence extracts status string and delegates."""
+        @csp.graph
+        def g():
+            msgs = adapter.subscribe()
+            csp.add_graph_output("msgs", msgs)
+            adapter.publish(echo(msgs))
+            adapter.publish_presence(csp.const(DiscordPresence(status="dnd")))
+
+        _dispatch_later(adapter, _message("1", "hi"))
+        out = csp.run(g, realtime=True, endtime=timedelta(seconds=0.5))
+
+        assert adapter.backend.connect_calls == 1
+        received = [m for _, batch in out["msgs"] for m in batch]
+        assert [m.content for m in received] == ["hi"]
+        assert [m.content for m in adapter.backend.sent_messages] == ["echo hi"]
+        assert adapter.backend.get_presence_updates()[0]["status"] == "dnd"
+
+    def test_subscribe_filters(self):
+        """subscribe applies channel, own-message and history filters."""
         config = DiscordConfig(bot_token="fake_token_for_testing")
-        with patch("csp_adapter_discord.adapter.DiscordBackend"):
+        with patch("csp_adapter_discord.adapter.DiscordBackend", MockDiscordBackend):
+            adapter = DiscordAdapter(config=config)
+        adapter.backend._bot_user_id = "999"
+
+        @csp.graph
+        def g():
+            csp.add_graph_output("general", adapter.subscribe(channels={"general"}))
+            csp.add_graph_output("all", adapter.subscribe(skip_own=False, skip_history=False))
+
+        old = datetime.now(UTC) - timedelta(days=1)
+        _dispatch_later(
+            adapter,
+            _message("1", "a", channel_id="456", channel_name="general"),
+            _message("2", "b", channel_id="789", channel_name="random"),
+            _message("3", "c", channel_id="456", channel_name="general", author_id="999"),
+            _message("4", "d", channel_id="456", channel_name="general", created_at=old),
+        )
+        out = csp.run(g, realtime=True, endtime=timedelta(seconds=0.5))
+        assert [m.id for _, batch in out["general"] for m in batch] == ["1"]
+        assert [m.id for _, batch in out["all"] for m in batch] == ["1", "2", "3", "4"]
+
+    def test_subscribe_reads_every_channel(self):
+        """All subscribed channels are read, not just the first one."""
+        config = DiscordConfig(bot_token="fake_token_for_testing")
+        with patch("csp_adapter_discord.adapter.DiscordBackend", MockDiscordBackend):
+            adapter = DiscordAdapter(config=config)
+
+        @csp.graph
+        def g():
+            csp.add_graph_output("msgs", adapter.subscribe(channels={"111", "222", "333"}))
+
+        _dispatch_later(
+            adapter,
+            _message("1", channel_id="333", channel_name="c"),
+            _message("2", channel_id="444", channel_name="d"),
+            _message("3", channel_id="222", channel_name="b"),
+            _message("4", channel_id="111", channel_name="a"),
+        )
+        out = csp.run(g, realtime=True, endtime=timedelta(seconds=0.4))
+        assert [m.id for _, batch in out["msgs"] for m in batch] == ["1", "3", "4"]
+
+    def test_subscribe_channel_names_and_threads(self):
+        """Names match case-insensitively with or without '#', threads match their parent."""
+        config = DiscordConfig(bot_token="fake_token_for_testing")
+        with patch("csp_adapter_discord.adapter.DiscordBackend", MockDiscordBackend):
+            adapter = DiscordAdapter(config=config)
+        thread_message = _message("3", channel_id="900", channel_name="a-thread")
+        thread_message.metadata["parent_channel_id"] = "456"
+
+        @csp.graph
+        def g():
+            csp.add_graph_output("by_name", adapter.subscribe(channels={"#General"}))
+            csp.add_graph_output("by_id", adapter.subscribe(channels={"456"}))
+
+        _dispatch_later(
+            adapter,
+            _message("1", channel_id="456", channel_name="general"),
+            _message("2", channel_id="789", channel_name="random"),
+            thread_message,
+        )
+        out = csp.run(g, realtime=True, endtime=timedelta(seconds=0.4))
+        assert [m.id for _, batch in out["by_name"] for m in batch] == ["1"]
+        assert [m.id for _, batch in out["by_id"] for m in batch] == ["1", "3"]
+
+    def test_channel_filter_scales(self):
+        """A reader over thousands of channels filters with set lookups."""
+        config = DiscordConfig(bot_token="fake_token_for_testing")
+        with patch("csp_adapter_discord.adapter.DiscordBackend", MockDiscordBackend):
             adapter = DiscordAdapter(config=config)
-            mock_presence = MagicMock()
-            # _extract_presence_status is a csp.node; we mock it
-            with patch.object(adapter, "_extract_presence_status", return_value="status_ts") as mock_extract:
-                with patch.object(type(adapter).__bases__[0], "publish_presence") as mock_pub_pres:
-                    adapter.publish_presence(mock_presence, timeout=10.0)
-                    mock_extract.assert_called_once_with(mock_presence)
-                    mock_pub_pres.assert_called_once_with(presence="status_ts", timeout=10.0)
+        manager = DiscordAdapterManagerImpl.__new__(DiscordAdapterManagerImpl)
+        manager._session = adapter.session
+        channels = {str(1000 + i) for i in range(5000)} | {f"name-{i}" for i in range(5000)}
+        reader = DiscordMessageReaderImpl(manager, channels, skip_own=False, skip_history=False)
+        assert len(reader._channel_ids) == 5000
+        assert len(reader._channel_names) == 5000
+        assert reader._accept(_message("1", channel_id="5999", channel_name="x"))
+        assert reader._accept(_message("2", channel_id="1", channel_name="NAME-4999"))
+        assert not reader._accept(_message("3", channel_id="6000", channel_name="name-5000"))
+
+    def test_subscribe_by_channel(self):
+        """subscribe_by_channel returns a dict basket with one series per channel."""
+        config = DiscordConfig(bot_token="fake_token_for_testing")
+        with patch("csp_adapter_discord.adapter.DiscordBackend", MockDiscordBackend):
+            adapter = DiscordAdapter(config=config)
+        thread_message = _message("5", channel_id="900", channel_name="a-thread")
+        thread_message.metadata["parent_channel_id"] = "111"
+
+        @csp.graph
+        def g():
+            baskets = adapter.subscribe_by_channel(["111", "#random", "333"])
+            assert sorted(baskets) == ["#random", "111", "333"]
+            for key, series in baskets.items():
+                csp.add_graph_output(key, series)
+
+        _dispatch_later(
+            adapter,
+            _message("1", channel_id="111", channel_name="general"),
+            _message("2", channel_id="222", channel_name="random"),
+            _message("3", channel_id="444", channel_name="other"),
+            _message("4", channel_id="111", channel_name="general"),
+            thread_message,
+        )
+        out = csp.run(g, realtime=True, endtime=timedelta(seconds=0.4))
+        assert [m.id for _, batch in out["111"] for m in batch] == ["1", "4", "5"]
+        assert [m.id for _, batch in out["#random"] for m in batch] == ["2"]
+        assert [m.id for _, batch in out["333"] for m in batch] == []
+        # Only the initial liveness tick, no wakeups for other channels' traffic
+        assert len(out["333"]) == 1
+
+    def test_channel_demux_listener_lifecycle(self):
+        """The demux holds one session listener while it has readers."""
+        config = DiscordConfig(bot_token="fake_token_for_testing")
+        with patch("csp_adapter_discord.adapter.DiscordBackend", MockDiscordBackend):
+            adapter = DiscordAdapter(config=config)
+        manager = DiscordAdapterManagerImpl.__new__(DiscordAdapterManagerImpl)
+        manager._session = adapter.session
+        manager._channel_demux = None
+        first = DiscordChannelReaderImpl(manager, "111", skip_own=False, skip_history=False)
+        second = DiscordChannelReaderImpl(manager, "general", skip_own=False, skip_history=False)
+        assert first._demux is second._demux
+        first._listen()
+        second._listen()
+        assert len(adapter.session._listeners["message"]) == 1
+        first._unlisten()
+        assert len(adapter.session._listeners["message"]) == 1
+        second._unlisten()
+        assert adapter.session._listeners["message"] == []
+
+    def test_subscribe_pushes_each_message(self):
+        """Without a batching window every message ticks on its own."""
+        config = DiscordConfig(bot_token="fake_token_for_testing")
+        with patch("csp_adapter_discord.adapter.DiscordBackend", MockDiscordBackend):
+            adapter = DiscordAdapter(config=config)
+
+        @csp.graph
+        def g():
+            csp.add_graph_output("msgs", adapter.subscribe())
+
+        _dispatch_later(adapter, _message("1"), _message("2"), _message("3"))
+        out = csp.run(g, realtime=True, endtime=timedelta(seconds=0.4))
+        assert [[m.id for m in batch] for _, batch in out["msgs"] if batch] == [["1"], ["2"], ["3"]]
+
+    def test_subscribe_micro_batches(self):
+        """max_latency/max_batch group messages into bounded batches."""
+        config = DiscordConfig(bot_token="fake_token_for_testing")
+        with patch("csp_adapter_discord.adapter.DiscordBackend", MockDiscordBackend):
+            adapter = DiscordAdapter(config=config)
+
+        @csp.graph
+        def g():
+            csp.add_graph_output("window", adapter.subscribe(max_latency=timedelta(milliseconds=50)))
+            csp.add_graph_output("capped", adapter.subscribe(max_latency=timedelta(milliseconds=50), max_batch=2))
+
+        _dispatch_later(adapter, _message("1"), _message("2"), _message("3"))
+        out = csp.run(g, realtime=True, endtime=timedelta(seconds=0.4))
+        assert [[m.id for m in batch] for _, batch in out["window"] if batch] == [["1", "2", "3"]]
+        assert [[m.id for m in batch] for _, batch in out["capped"] if batch] == [["1", "2"], ["3"]]
+
+    def test_subscribe_flushes_pending_batch_on_stop(self):
+        """Messages still waiting in a micro-batch when the engine stops are pushed, not dropped."""
+        config = DiscordConfig(bot_token="fake_token_for_testing")
+        with patch("csp_adapter_discord.adapter.DiscordBackend", MockDiscordBackend):
+            adapter = DiscordAdapter(config=config)
+        pushed = []
+
+        @csp.node
+        def collect(msgs: csp.ts[[DiscordMessage]]):
+            pushed.extend(m.id for m in msgs)
+
+        @csp.graph
+        def g():
+            collect(adapter.subscribe(max_latency=timedelta(seconds=30)))
+
+        _dispatch_later(adapter, _message("1"), _message("2"))
+        csp.run(g, realtime=True, endtime=timedelta(seconds=0.4))
+        assert pushed == ["1", "2"]
+
+    def test_publish_uses_message_callback(self):
+        """publish reports sent messages to the callback from set_message_callback."""
+        config = DiscordConfig(bot_token="fake_token_for_testing")
+        with patch("csp_adapter_discord.adapter.DiscordBackend", MockDiscordBackend):
+            adapter = DiscordAdapter(config=config)
+        sent = []
+        adapter.set_message_callback(lambda msg, result: sent.append((msg.content, result.content)))
+
+        @csp.graph
+        def g():
+            adapter.publish(csp.const(DiscordMessage(channel=DiscordChannel(id="456"), content="hello")))
+
+        csp.run(g, realtime=True, endtime=timedelta(seconds=0.2))
+        assert sent == [("hello", "hello")]
+
+    def test_publish_presence_extracts_status(self):
+        """publish_presence extracts the status string before sending it."""
+        config = DiscordConfig(bot_token="fake_token_for_testing")
+        with patch("csp_adapter_discord.adapter.DiscordBackend", MockDiscordBackend):
+            adapter = DiscordAdapter(config=config)
+
+        @csp.graph
+        def g():
+            adapter.publish_presence(csp.const(DiscordPresence(status="idle")), timeout=1.0)
+
+        csp.run(g, realtime=True, endtime=timedelta(seconds=0.2))
+        assert [u["status"] for u in adapter.backend.get_presence_updates()] == ["idle"]
 
     def test_extract_presence_status_with_enum(self):
         """_extract_presence_status extracts status.value from DiscordPresence."""
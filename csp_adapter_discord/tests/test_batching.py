@@ -0,0 +1,56 @@
+"""Tests for merging messages published to one channel."""
+
+from chatom.base import Embed, EmbedField
+
+from csp_adapter_discord import DiscordChannel, DiscordMessage
+from csp_adapter_discord.batching import MAX_EMBEDS, embed_length, merge_messages, split_content
+
+
+def _msg(content="", **kwargs):
+    return DiscordMessage(channel=DiscordChannel(id="1"), content=content, **kwargs)
+
+
+class TestSplitContent:
+    def test_short_content_is_one_chunk(self):
+        assert split_content("a\nb") == ["a\nb"]
+        assert split_content("") == [""]
+
+    def test_splits_at_line_boundaries(self):
+        lines = [f"line {i:03d}" for i in range(300)]
+        chunks = split_content("\n".join(lines), limit=100)
+        assert all(len(c) <= 100 for c in chunks)
+        assert "\n".join(chunks).split("\n") == lines
+
+    def test_long_line_is_hard_split(self):
+        assert split_content("ab\n" + "x" * 25, limit=10) == ["ab", "x" * 10, "x" * 10, "x" * 5]
+
+
+class TestMergeMessages:
+    def test_merges_one_line_messages(self):
+        merged = merge_messages([_msg(f"alert {i}") for i in range(20)])
+        assert len(merged) == 1
+        assert merged[0].content == "\n".join(f"alert {i}" for i in range(20))
+        assert merged[0].channel_id == "1"
+
+    def test_respects_content_limit(self):
+        msgs = [_msg("x" * 90) for i in range(10)]
+        merged = merge_messages(msgs, limit=200)
+        assert [len(m.content) for m in merged] == [181] * 5
+        assert all(len(m.content) <= 200 for m in merged)
+
+    def test_respects_embed_limits(self):
+        msgs = [_msg(f"m{i}", embeds=[Embed(title="t")]) for i in range(MAX_EMBEDS + 2)]
+        merged = merge_messages(msgs)
+        assert [len(m.embeds) for m in merged] == [MAX_EMBEDS, 2]
+        big = Embed(description="d" * 3500)
+        assert len(merge_messages([_msg("a", embeds=[big]), _msg("b", embeds=[big])])) == 2
+
+    def test_unmergeable_messages_pass_through_in_order(self):
+        reply = _msg("reply", reply_to=DiscordMessage(id="9"))
+        merged = merge_messages([_msg("a"), _msg("b"), reply, _msg("c")])
+        assert [m.content for m in merged] == ["a\nb", "reply", "c"]
+        assert merged[1] is reply
+
+    def test_embed_length(self):
+        embed = Embed(title="ab", description="cde", fields=[EmbedField(name="f", value="gh")])
+        assert embed_length(embed) == 8
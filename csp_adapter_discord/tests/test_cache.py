@@ -0,0 +1,102 @@
+"""Tests for the publish-path channel cache."""
+
+import asyncio
+from datetime import UTC, datetime
+from types import SimpleNamespace
+
+import discord
+import pytest
+from chatom.base import Thread
+
+from csp_adapter_discord import DiscordChannel, DiscordConfig, DiscordMessage, MockDiscordBackend
+from csp_adapter_discord.cache import ChannelCache
+from csp_adapter_discord.session import DiscordSession
+from csp_adapter_discord.tests.helpers import FakeChannel, FakeClient, FakeMessagingClient, make_writer
+
+
+class TestChannelCache:
+    def test_hits_misses_and_lru_eviction(self):
+        cache = ChannelCache(maxsize=2)
+        cache.put("1", "one")
+        cache.put("2", "two")
+        assert cache.get("1") == "one"
+        cache.put("3", "three")
+        # "2" was least recently used
+        assert "2" not in cache
+        assert cache.get("2") is None
+        assert cache.stats() == {"size": 2, "hits": 1, "misses": 1, "evictions": 1}
+
+    def test_invalid_maxsize(self):
+        with pytest.raises(ValueError):
+            ChannelCache(maxsize=0)
+
+    def test_warm_and_remove_guild(self):
+        cache = ChannelCache()
+        guild = SimpleNamespace(
+            id=7,
+            channels=[FakeChannel(1, guild_id=7), SimpleNamespace(id=2)],  # categories are not messageable
+            threads=[FakeChannel(3, guild_id=7)],
+        )
+        cache.warm(guild)
+        assert "1" in cache and "3" in cache and "2" not in cache
+        cache.put("4", FakeChannel(4, guild_id=8))
+        cache.remove_guild(7)
+        assert len(cache) == 1 and "4" in cache
+
+    def test_resolve_uses_gateway_state_then_partial(self):
+        known = FakeChannel(1)
+        client = FakeMessagingClient(known)
+        cache = ChannelCache()
+        assert cache.resolve(client, "1") is known
+        assert cache.resolve(client, "1") is known
+        partial = cache.resolve(client, "2")
+        assert partial is client.partials[2]
+        assert (cache.hits, cache.misses) == (1, 2)
+
+
+class TestCachedPublish:
+    def test_send_is_one_request_per_message(self):
+        channel = FakeChannel(456)
+        writer, session = make_writer(FakeMessagingClient(channel))
+
+        async def send_all():
+            for i in range(3):
+                await writer._send(DiscordMessage(channel=DiscordChannel(id="456"), content=f"m{i}"))
+
+        asyncio.run(send_all())
+        assert [s["content"] for s in channel.sent] == ["m0", "m1", "m2"]
+        assert (session.channels.hits, session.channels.misses) == (2, 1)
+
+    def test_send_thread_and_reply(self):
+        thread = FakeChannel(900)
+        writer, _ = make_writer(FakeMessagingClient(thread))
+        msg = DiscordMessage(channel=DiscordChannel(id="456"), content="hi", thread=Thread(id="900"), reply_to=DiscordMessage(id="12"))
+        sent = []
+        writer._on_sent = lambda msg, result: sent.append(result)
+        asyncio.run(writer._send(msg))
+        kwargs = thread.sent[0]
+        assert kwargs["reference"].message_id == 12
+        assert kwargs["reference"].channel_id == 900
+        assert sent[0].channel_id == "900"
+        assert sent[0].created_at == datetime(2025, 1, 1, tzinfo=UTC)
+
+    def test_not_found_invalidates(self):
+        response = SimpleNamespace(status=404, reason="Not Found")
+        gone = FakeChannel(456, fail=discord.NotFound(response, "Unknown Channel"))
+        writer, session = make_writer(FakeMessagingClient(gone))
+        with pytest.raises(discord.NotFound):
+            asyncio.run(writer._send(DiscordMessage(channel=DiscordChannel(id="456"), content="x")))
+        assert "456" not in session.channels
+
+    def test_gateway_events_warm_and_invalidate(self):
+        session = DiscordSession(MockDiscordBackend(config=DiscordConfig(bot_token="fake_token_for_testing")))
+        client = FakeClient()
+        session._install_handlers(client)
+        channel = FakeChannel(1, guild_id=7)
+        asyncio.run(client.on_guild_available(SimpleNamespace(id=7, channels=[channel], threads=[])))
+        assert "1" in session.channels
+        asyncio.run(client.on_guild_channel_update(channel, channel))
+        assert "1" not in session.channels
+        asyncio.run(client.on_guild_join(SimpleNamespace(id=7, channels=[channel], threads=[])))
+        asyncio.run(client.on_guild_remove(SimpleNamespace(id=7)))
+        assert len(session.channels) == 0
@@ -0,0 +1,152 @@
+"""Tests for shard worker processes and their shared-memory ring."""
+
+import os
+import threading
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+import csp
+import pytest
+from csp import ts
+
+from csp_adapter_discord import DiscordAdapter, DiscordConfig, DiscordMessageStruct, MessagePayload
+from csp_adapter_discord.cluster import SharedRing, _RingWriter, decode_record, encode_record
+from csp_adapter_discord.testing import FakeDiscordServer
+
+# A guild ID Discord routes to shard 1 of 2
+GUILD_ON_SHARD_1 = str(1 << 22)
+
+
+@csp.node
+def _stop_after(x: ts[list], y: ts[list], count: int):
+    with csp.state():
+        s_seen = 0
+    if csp.ticked(x):
+        s_seen += len(x)
+    if csp.ticked(y):
+        s_seen += len(y)
+        if s_seen >= count:
+            csp.stop_engine()
+
+
+class TestSharedRing:
+    def test_round_trip_and_wrap(self):
+        ring = SharedRing.create(64)
+        reader = SharedRing.attach(ring.name)
+        try:
+            seen = []
+            for i in range(40):
+                record = bytes([i]) * (i % 7)
+                assert ring.write(record)
+                if i % 3 == 2:
+                    seen.extend(reader.read_all())
+            seen.extend(reader.read_all())
+            assert seen == [bytes([i]) * (i % 7) for i in range(40)]
+            assert len(ring) == 0
+        finally:
+            reader.close()
+            ring.close()
+
+    def test_full_ring_waits_for_reader(self):
+        ring = SharedRing.create(32)
+        try:
+            assert ring.write(b"x" * 12)
+            assert ring.write(b"y" * 12)
+            assert not ring.write(b"z" * 4, timeout=0.01)
+            threading.Timer(0.05, ring.read_all).start()
+            assert ring.write(b"z" * 4, timeout=2.0)
+            with pytest.raises(ValueError):
+                ring.write(b"w" * 64)
+        finally:
+            ring.close()
+
+
+class TestRecords:
+    def test_round_trip_matches_struct(self):
+        data = {
+            "id": "1561268427161600008",
+            "channel_id": "1001",
+            "guild_id": "1000",
+            "content": "héllo <@77>",
+            "author": {"id": "5", "username": "bob", "bot": True},
+            "mentions": [{"id": "77", "username": "alice"}],
+            "mention_everyone": True,
+        }
+        channel = SimpleNamespace(id=1001, name="general", type=SimpleNamespace(value=11), guild=SimpleNamespace(id=1000), parent_id=900, position=3)
+        payload = MessagePayload(data, SimpleNamespace(get_channel=lambda channel_id: channel))
+        decoded = decode_record(encode_record(payload, shard_id=1, shard_seq=7))
+        assert (decoded.shard_id, decoded.shard_seq) == (1, 7)
+        assert (decoded.channel_name, decoded.parent_channel_id) == ("general", "900")
+        assert DiscordMessageStruct.from_payload(decoded) == DiscordMessageStruct.from_payload(payload)
+        message = decoded.to_message()
+        assert message.channel.name == "general"
+        assert message.metadata["parent_channel_id"] == "900"
+        assert message.metadata["shard_id"] == 1
+
+    def test_dm_without_cached_channel(self):
+        payload = MessagePayload({"id": "1561268427161600008", "channel_id": "9", "content": "psst", "author": {"id": "5"}})
+        decoded = decode_record(encode_record(payload, shard_id=0, shard_seq=1))
+        assert "guild_id" not in decoded.data
+        assert decoded.to_message().metadata["is_dm"] is True
+
+    def test_shard_seq_beyond_32_bits(self):
+        payload = MessagePayload({"id": "1561268427161600008", "channel_id": "9", "content": "psst", "author": {"id": "5"}})
+        assert decode_record(encode_record(payload, shard_id=3, shard_seq=2**32)).shard_seq == 2**32
+
+    def test_writer_drops_when_ring_is_full(self):
+        ring = SharedRing.create(256)
+        wake_read, wake_write = os.pipe()
+        try:
+            writer = _RingWriter(ring, shard_id=1, wake_fd=wake_write)
+            payload = MessagePayload({"id": "1561268427161600008", "channel_id": "9", "content": "x" * 40, "author": {"id": "5"}})
+            start = time.monotonic()
+            for _ in range(10):
+                writer(payload)
+            # Nothing is reading, yet the writer never waits for room
+            assert time.monotonic() - start < 0.5
+            assert writer.dropped > 0
+            seqs = [decode_record(record).shard_seq for record in ring.read_all()]
+            assert seqs == list(range(1, 11 - writer.dropped))
+            writer(payload)
+            assert decode_record(ring.read_all()[0]).shard_seq == 11
+        finally:
+            os.close(wake_read)
+            os.close(wake_write)
+            ring.close()
+
+
+class TestShardProcesses:
+    def test_workers_feed_one_stream(self):
+        with FakeDiscordServer(channels={"1001": "general"}, guild_id=GUILD_ON_SHARD_1) as server:
+            adapter = DiscordAdapter(DiscordConfig(token="fake", api_url=server.api_url), shards=2, shard_mode="process")
+
+            def inject():
+                server.inject_message("1001", "guild")
+                server.inject_message("2002", "dm")
+
+            server.inject_when_connected(inject, connections=2, timeout=20.0)
+
+            @csp.graph
+            def g():
+                msgs = adapter.subscribe(channels={"general", "2002"})
+                structs = adapter.subscribe(mode="struct")
+                csp.add_graph_output("msgs", msgs)
+                csp.add_graph_output("structs", structs)
+                _stop_after(msgs, structs, 4)
+
+            # Spawning the workers takes a while, the graph stops once everything has arrived
+            out = csp.run(g, realtime=True, endtime=timedelta(seconds=60))
+            assert server.wait_for_connections(0)
+        # The workers IDENTIFY one at a time, 5 seconds apart, with the default max_concurrency of 1
+        assert len(server.identified_intents) == 2
+        assert server.identify_rate_violations == 0
+        messages = sorted((m for _, msgs in out["msgs"] for m in msgs), key=lambda m: m.content)
+        assert [(m.content, m.metadata["shard_id"], m.metadata["shard_seq"]) for m in messages] == [("dm", 0, 1), ("guild", 1, 1)]
+        assert messages[1].channel.name == "general"
+        structs = sorted((s for _, ss in out["structs"] for s in ss), key=lambda s: s.content)
+        assert [(s.content, s.channel_name, s.is_dm) for s in structs] == [("dm", "DM", True), ("guild", "general", False)]
+
+    def test_process_mode_needs_shards(self):
+        with pytest.raises(ValueError):
+            DiscordAdapter(DiscordConfig(token="fake"), shard_mode="process")
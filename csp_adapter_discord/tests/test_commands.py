@@ -0,0 +1,97 @@
+"""Tests for the command router."""
+
+from datetime import datetime, timedelta
+
+import csp
+import pytest
+
+from csp_adapter_discord import CommandRouter, DiscordChannel, DiscordMessage, DiscordMessageStruct, route_commands
+
+
+class TestCommandRouter:
+    def test_longest_prefix_at_word_boundary(self):
+        router = CommandRouter(["!p", "!ping", "!pingall"])
+        assert router.match("!ping") == "!ping"
+        assert router.match("!ping 3") == "!ping"
+        assert router.match("!pingall now") == "!pingall"
+        assert router.match("!p x") == "!p"
+        assert router.match("!pin") is None
+        assert router.match("ping") is None
+
+    def test_prefixes_before_patterns_leftmost_first(self):
+        router = CommandRouter(["!help"], {"thanks": r"\bthank(s| you)\b", "greeting": r"^(hi|hello)\b", "any": r"."})
+        assert router.keys == ["!help", "thanks", "greeting", "any"]
+        assert router.match("!help thanks") == "!help"
+        assert router.match("thank you, hello") == "thanks"
+        # The earliest match wins, then the pattern given first
+        assert router.match("hello, thank you") == "greeting"
+        assert router.match("ok thanks") == "any"
+        assert router.match("hello there") == "greeting"
+        assert router.match("?") == "any"
+        assert router.match("") is None
+
+    def test_patterns_with_their_own_groups(self):
+        router = CommandRouter(patterns={"roll": r"^!roll (?P<dice>\d+)d(\d+)", "other": r"x"})
+        assert router.match("!roll 2d6") == "roll"
+
+    def test_patterns_compiled_on_their_own(self):
+        # Numbered backreferences and global inline flags only work in their own expression
+        router = CommandRouter(patterns={"first": r"^!first", "double": r"(\w)\1", "shout": r"(?i)^hey"})
+        assert router.match("aab") == "double"
+        assert router.match("ab") is None
+        assert router.match("HEY you") == "shout"
+
+    def test_ignore_case(self):
+        router = CommandRouter(["!Ping"], {"hi": "^hello"}, ignore_case=True)
+        assert router.match("!PING") == "!Ping"
+        assert router.match("HELLO") == "hi"
+        assert CommandRouter(["!Ping"]).match("!ping") is None
+        # "İ".lower() is two characters, which must not shift the check for the end of the prefix
+        router = CommandRouter(["!İ", "!in"], ignore_case=True)
+        assert router.match("!İ") == "!İ"
+        assert router.match("!İ x") == "!İ"
+        assert router.match("!IN x") == "!in"
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            CommandRouter(["!a"], {"!a": "a"})
+        with pytest.raises(ValueError):
+            CommandRouter([""])
+
+
+def _msg(content):
+    return DiscordMessage(channel=DiscordChannel(id="1"), content=content)
+
+
+class TestRouteCommands:
+    def test_routes_batches_in_one_node(self):
+        router = CommandRouter(["!ping", "!help"], {"thanks": "thank"})
+        start = datetime(2026, 10, 1)
+        batches = [
+            (start, [_msg("!ping"), _msg("chatter"), _msg("!help me"), _msg("!ping 2")]),
+            (start + timedelta(seconds=1), [_msg("thanks!")]),
+        ]
+
+        @csp.graph
+        def g():
+            basket = route_commands(csp.curve([DiscordMessage], batches), router, router.keys)
+            for key in router.keys:
+                csp.add_graph_output(key, basket[key])
+
+        out = csp.run(g, starttime=start, endtime=timedelta(seconds=2))
+        assert [[m.content for m in msgs] for _, msgs in out["!ping"]] == [["!ping", "!ping 2"]]
+        assert [[m.content for m in msgs] for _, msgs in out["!help"]] == [["!help me"]]
+        assert [t for t, _ in out["thanks"]] == [start + timedelta(seconds=1)]
+
+    def test_any_message_type(self):
+        router = CommandRouter(["!ping"])
+        start = datetime(2026, 10, 1)
+        struct = DiscordMessageStruct(id="1", content="!ping", channel_id="1", author_id="2", created_at=start)
+
+        @csp.graph
+        def g():
+            basket = route_commands(csp.const([struct]), router, router.keys)
+            csp.add_graph_output("ping", basket["!ping"])
+
+        out = csp.run(g, starttime=start, endtime=timedelta(seconds=1))
+        assert out["ping"][0][1] == [struct]
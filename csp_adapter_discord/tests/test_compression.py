@@ -0,0 +1,67 @@
+"""Tests for gateway decompression and its counters."""
+
+import asyncio
+import json
+import zlib
+from datetime import timedelta
+
+import csp
+
+from csp_adapter_discord import DiscordAdapter, DiscordConfig
+from csp_adapter_discord.compression import GatewayCounters, GatewayDecompressor, track
+from csp_adapter_discord.testing import FakeDiscordServer
+
+
+def _frames(messages):
+    compressor = zlib.compressobj()
+    return [compressor.compress(json.dumps(m).encode()) + compressor.flush(zlib.Z_SYNC_FLUSH) for m in messages]
+
+
+class TestGatewayDecompressor:
+    def test_whole_and_split_messages(self):
+        messages = [{"op": 0, "d": {"content": "x" * (i * 40)}} for i in range(6)]
+        decompressor = GatewayDecompressor(initial_buffer=16)
+        buffer = decompressor._buffer
+        out = []
+        for i, frame in enumerate(_frames(messages)):
+            if i % 2:
+                # Split across WebSocket messages, as Discord may do for large payloads
+                assert decompressor.decompress(frame[:5]) is None
+                out.append(decompressor.decompress(frame[5:]))
+            else:
+                out.append(decompressor.decompress(frame))
+        assert [json.loads(o) for o in out] == messages
+        # The buffer only grew, it was never replaced
+        assert decompressor._buffer is buffer
+        counters = decompressor._counters
+        assert counters.frames == 6
+        assert counters.bytes_in == sum(len(f) for f in _frames(messages))
+        assert counters.bytes_decompressed == sum(len(json.dumps(m)) for m in messages)
+
+    def test_counts_into_tracked_loop(self):
+        counters = GatewayCounters()
+
+        async def run():
+            track(asyncio.get_running_loop(), counters)
+            GatewayDecompressor().decompress(_frames([{"op": 11}])[0])
+
+        asyncio.run(run())
+        assert counters.frames == 1
+
+
+class TestGatewayStats:
+    def test_counts_fake_gateway_traffic(self):
+        with FakeDiscordServer(channels={"1001": "general"}) as server:
+            adapter = DiscordAdapter(DiscordConfig(token="fake", api_url=server.api_url))
+
+            @csp.graph
+            def g():
+                csp.add_graph_output("msgs", adapter.subscribe())
+                csp.add_graph_output("stats", adapter.gateway_stats(interval=timedelta(milliseconds=100)))
+
+            out = csp.run(g, realtime=True, endtime=timedelta(seconds=1))
+        stats = out["stats"][-1][1]
+        assert stats.compression == "zlib-stream"
+        # HELLO, READY and GUILD_CREATE at least
+        assert stats.frames >= 3
+        assert 0 < stats.bytes_in < stats.bytes_decompressed
@@ -0,0 +1,139 @@
+"""Tests for dynamic per-conversation baskets."""
+
+from datetime import datetime, timedelta
+
+import csp
+import pytest
+from chatom.base import Organization
+from csp import ts
+
+from csp_adapter_discord import DiscordChannel, DiscordMessage
+from csp_adapter_discord.dynamic import conversation_key, conversations
+
+
+def _message(id, channel_id="1", guild_id=None):
+    return DiscordMessage(
+        id=id,
+        content=id,
+        channel=DiscordChannel(id=channel_id),
+        guild=Organization(id=guild_id) if guild_id else None,
+    )
+
+
+@csp.node
+def _lifecycle(key: str, msgs: ts[[DiscordMessage]], events: object):
+    """Record creation, messages and teardown of a per-conversation sub-graph."""
+    with csp.start():
+        events.append(("start", key))
+
+    with csp.stop():
+        events.append(("stop", key))
+
+    if csp.ticked(msgs):
+        events.append(("msgs", key, [m.id for m in msgs]))
+
+
+class TestConversationKey:
+    def test_channel(self):
+        assert conversation_key(_message("1", channel_id="5")) == "5"
+
+    def test_guild(self):
+        assert conversation_key(_message("1", channel_id="5", guild_id="9"), "guild") == "9"
+        # DMs have no guild, they are their own conversation
+        assert conversation_key(_message("1", channel_id="5"), "guild") == "5"
+
+    def test_thread(self):
+        assert conversation_key(_message("1", channel_id="5"), "thread") == "5"
+
+    def test_callable(self):
+        assert conversation_key(_message("1"), lambda m: "k" + m.id) == "k1"
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            conversation_key(_message("1"), "nope")
+
+
+class TestConversations:
+    def test_subgraph_lifecycle(self):
+        """Sub-graphs start on first message and stop after the idle timeout."""
+        events = []
+
+        @csp.graph
+        def sub_graph(key: str, msgs: ts[[DiscordMessage]]):
+            _lifecycle(key, msgs, events)
+
+        def g():
+            msgs = csp.curve(
+                [DiscordMessage],
+                [
+                    (timedelta(seconds=0), [_message("a1", "a"), _message("b1", "b"), _message("a2", "a")]),
+                    (timedelta(seconds=5), [_message("a3", "a")]),
+                    (timedelta(seconds=12), [_message("a4", "a")]),
+                    (timedelta(seconds=30), [_message("b2", "b")]),
+                ],
+            )
+            basket = conversations(msgs, idle_timeout=timedelta(seconds=10))
+            csp.dynamic(basket, sub_graph, csp.snapkey(), csp.attach())
+
+        csp.run(g, starttime=datetime(2025, 1, 1), endtime=timedelta(seconds=60))
+        assert events == [
+            ("start", "a"),
+            ("start", "b"),
+            ("msgs", "a", ["a1", "a2"]),
+            ("msgs", "b", ["b1"]),
+            ("msgs", "a", ["a3"]),
+            ("stop", "b"),
+            ("msgs", "a", ["a4"]),
+            ("stop", "a"),
+            ("start", "b"),
+            ("msgs", "b", ["b2"]),
+            # Still-active conversations stop with the engine
+            ("stop", "b"),
+        ]
+
+    def test_message_in_same_cycle_as_idle_alarm_keeps_key(self):
+        events = []
+
+        @csp.graph
+        def sub_graph(key: str, msgs: ts[[DiscordMessage]]):
+            _lifecycle(key, msgs, events)
+
+        def g():
+            msgs = csp.curve(
+                [DiscordMessage],
+                [(timedelta(seconds=0), [_message("a1", "a")]), (timedelta(seconds=10), [_message("a2", "a")])],
+            )
+            csp.dynamic(conversations(msgs, idle_timeout=timedelta(seconds=10)), sub_graph, csp.snapkey(), csp.attach())
+
+        csp.run(g, starttime=datetime(2025, 1, 1), endtime=timedelta(seconds=15))
+        assert events == [("start", "a"), ("msgs", "a", ["a1"]), ("msgs", "a", ["a2"]), ("stop", "a")]
+
+    def test_key_by_guild(self):
+        keys = []
+
+        @csp.graph
+        def sub_graph(key: str, msgs: ts[[DiscordMessage]]):
+            _lifecycle(key, msgs, keys)
+
+        def g():
+            msgs = csp.curve(
+                [DiscordMessage],
+                [(timedelta(seconds=0), [_message("1", "a", guild_id="g"), _message("2", "b", guild_id="g"), _message("3", "dm")])],
+            )
+            csp.dynamic(conversations(msgs, key_by="guild"), sub_graph, csp.snapkey(), csp.attach())
+
+        csp.run(g, starttime=datetime(2025, 1, 1), endtime=timedelta(seconds=1))
+        assert ("msgs", "g", ["1", "2"]) in keys
+        assert ("msgs", "dm", ["3"]) in keys
+
+    def test_invalid_key_by(self):
+        @csp.graph
+        def sub_graph(key: str, msgs: ts[[DiscordMessage]]):
+            _lifecycle(key, msgs, [])
+
+        def g():
+            msgs = csp.curve([DiscordMessage], [(timedelta(seconds=0), [_message("1")])])
+            csp.dynamic(conversations(msgs, key_by="bogus"), sub_graph, csp.snapkey(), csp.attach())
+
+        with pytest.raises(ValueError):
+            csp.run(g, starttime=datetime(2025, 1, 1), endtime=timedelta(seconds=1))
@@ -0,0 +1,71 @@
+"""Tests for the reaction, edit and delete streams."""
+
+from datetime import datetime
+
+import csp
+
+from csp_adapter_discord import DiscordAdapter, DiscordConfig, DiscordDeleteEvent, DiscordEditEvent, DiscordReactionEvent
+from csp_adapter_discord.intents import intent_names
+from csp_adapter_discord.session import _MESSAGE_EVENTS
+from csp_adapter_discord.testing import FakeDiscordServer, run_with_server
+
+
+def _flatten(ticks):
+    return [e for _, events in ticks for e in events]
+
+
+class TestEventStructs:
+    def test_reaction_from_payload(self):
+        event = DiscordReactionEvent.from_payload(
+            {"message_id": "1", "channel_id": "2", "guild_id": "3", "user_id": "4", "emoji": {"id": "5", "name": "party"}},
+            added=False,
+        )
+        assert (event.added, event.emoji, event.emoji_id, event.guild_id, event.channel_name) == (False, "party", "5", "3", "")
+
+    def test_edit_from_payload(self):
+        event = DiscordEditEvent.from_payload(
+            {"id": "1", "channel_id": "2", "author": {"id": "4"}, "content": "fixed", "edited_timestamp": "2024-05-01T12:00:00.5+00:00"}
+        )
+        assert (event.author_id, event.content, event.edited_at) == ("4", "fixed", datetime(2024, 5, 1, 12, 0, 0, 500000))
+
+    def test_update_without_edit_timestamp_is_not_an_edit(self):
+        # Discord sends these when it adds link embeds to a message
+        _, build = _MESSAGE_EVENTS["MESSAGE_UPDATE"]
+        assert build({"id": "1", "channel_id": "2", "content": "see https://example.com", "edited_timestamp": None}, None) == []
+
+    def test_bulk_delete_from_payload(self):
+        events = DiscordDeleteEvent.from_bulk_payload({"ids": ["1", "2"], "channel_id": "3"})
+        assert [(e.message_id, e.bulk, e.guild_id) for e in events] == [("1", True, ""), ("2", True, "")]
+
+
+class TestEventStreams:
+    def test_streams_from_the_gateway(self):
+        with FakeDiscordServer(channels={"1001": "general", "1002": "random"}) as server:
+
+            def events():
+                server.inject_reaction("1001", "10")
+                server.inject_reaction("1002", "11")
+                server.inject_reaction("1001", "10", added=False)
+                server.inject_edit("1001", "10", "v2")
+                server.inject_delete("1001", "10")
+                server.inject_delete("1002", "12", "13")
+
+            adapter = DiscordAdapter(DiscordConfig(token="fake", api_url=server.api_url), minimal_intents=True)
+
+            @csp.graph
+            def g():
+                csp.add_graph_output("reactions", adapter.subscribe_reactions(channels={"general"}))
+                csp.add_graph_output("edits", adapter.subscribe_edits())
+                csp.add_graph_output("deletes", adapter.subscribe_deletes())
+
+            out = run_with_server(server, g, events)
+        reactions = _flatten(out["reactions"])
+        assert [(r.message_id, r.added, r.emoji, r.channel_name) for r in reactions] == [
+            ("10", True, "👍", "general"),
+            ("10", False, "👍", "general"),
+        ]
+        assert [(e.message_id, e.content) for e in _flatten(out["edits"])] == [("10", "v2")]
+        assert [(d.message_id, d.bulk) for d in _flatten(out["deletes"])] == [("10", False), ("12", True), ("13", True)]
+        # Reactions need their own intents, edits and deletes those of messages
+        assert {"guild_reactions", "dm_reactions", "guild_messages", "dm_messages"} <= intent_names(adapter.session.intents)
+        assert "guild_typing" not in intent_names(adapter.session.intents)
@@ -0,0 +1,88 @@
+"""Tests for message filters evaluated on the gateway payload."""
+
+from datetime import timedelta
+
+import csp
+
+from csp_adapter_discord import DiscordAdapter, DiscordConfig, DiscordMessage, MessageFilter
+from csp_adapter_discord.testing import FakeDiscordServer
+
+
+def _payload(content="hi", channel_id="1001", guild_id="1000", author_id="5", bot=False, mentions=(), webhook_id=None):
+    data = {
+        "id": "1",
+        "channel_id": channel_id,
+        "guild_id": guild_id,
+        "content": content,
+        "author": {"id": author_id, "bot": bot},
+        "mentions": [{"id": m} for m in mentions],
+    }
+    if webhook_id:
+        data["webhook_id"] = webhook_id
+    return data
+
+
+class TestMessageFilter:
+    def test_empty_filter_accepts_everything(self):
+        assert MessageFilter().compile()(_payload())
+
+    def test_ids(self):
+        accept = MessageFilter(channel_ids={"1001"}, guild_ids={"1000"}, exclude_authors={"6"}).compile()
+        assert accept(_payload())
+        assert not accept(_payload(channel_id="1002"))
+        assert not accept(_payload(guild_id=None))
+        assert not accept(_payload(author_id="6"))
+        assert MessageFilter(authors={"6"}).compile()(_payload(author_id="6"))
+        assert not MessageFilter(authors={"6"}).compile()(_payload())
+
+    def test_bots_and_webhooks(self):
+        accept = MessageFilter(bots=False).compile()
+        assert accept(_payload())
+        assert not accept(_payload(bot=True))
+        assert not accept(_payload(webhook_id="9"))
+
+    def test_content(self):
+        accept = MessageFilter(prefixes=["!", "?"], pattern=r"^.(ping|pong)\b").compile()
+        assert accept(_payload("!ping"))
+        assert accept(_payload("?pong now"))
+        assert not accept(_payload("!help"))
+        assert not accept(_payload("ping"))
+
+    def test_mentions_me(self):
+        bot_id = []
+        accept = MessageFilter(mentions_me=True).compile(lambda: bot_id[0] if bot_id else None)
+        assert not accept(_payload(mentions=["42"]))
+        bot_id.append("42")
+        assert accept(_payload(mentions=["7", "42"]))
+        assert not accept(_payload(mentions=["7"]))
+
+
+class TestFilteredSubscribe:
+    def test_filters_before_conversion(self):
+        with FakeDiscordServer() as server:
+            adapter = DiscordAdapter(DiscordConfig(token="fake", api_url=server.api_url))
+            cached = []
+
+            def inject():
+                server.inject_message("1001", "just chatting")
+                server.inject_message("1001", "!ping")
+                server.inject_event("MESSAGE_CREATE", server._message_payload("1001", "!ping", {"id": "6", "username": "other-bot", "bot": True}))
+
+            @csp.node
+            def check(msgs: csp.ts[[DiscordMessage]]):
+                if csp.ticked(msgs) and msgs:
+                    cached.append(len(adapter.session.backend._client.cached_messages))
+
+            @csp.graph
+            def g():
+                msgs = adapter.subscribe(message_filter=MessageFilter(prefixes=["!"], bots=False))
+                check(msgs)
+                csp.add_graph_output("msgs", msgs)
+
+            server.inject_when_connected(inject)
+            out = csp.run(g, realtime=True, endtime=timedelta(seconds=1.5))
+
+        received = [m for _, msgs in out["msgs"] for m in msgs]
+        assert [(m.content, m.author_id, m.channel_name) for m in received] == [("!ping", "5555", "general")]
+        # Only the accepted payload was converted; discord.py never built a Message
+        assert cached == [0]
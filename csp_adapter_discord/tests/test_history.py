@@ -0,0 +1,58 @@
+"""Tests for the history backfill input and its handoff to live messages."""
+
+from datetime import UTC, datetime, timedelta
+
+import csp
+
+from csp_adapter_discord import DiscordAdapter, DiscordConfig
+from csp_adapter_discord.testing import FakeDiscordServer
+
+NOW = datetime.now(UTC).replace(microsecond=0)
+
+
+def _seed(server):
+    server.add_history("1001", "too old", created_at=NOW - timedelta(hours=2))
+    for minute in range(10):
+        server.add_history("1001" if minute % 3 else "1002", f"past {minute}", created_at=NOW - timedelta(minutes=30 - minute))
+
+
+def _contents(out):
+    return [m.content for _, msgs in out["msgs"] for m in msgs]
+
+
+class TestHistory:
+    def test_backfill_in_time_order_then_live(self):
+        # Two requests per 0.3s per channel and two messages per page: the backfill outlasts the live injection
+        with FakeDiscordServer(channels={"1001": "general", "1002": "alerts"}, rate_limit=2, rate_limit_window=0.3) as server:
+            _seed(server)
+            adapter = DiscordAdapter(DiscordConfig(token="fake", api_url=server.api_url))
+
+            def inject():
+                server.inject_message("1002", "live 1")
+                server.inject_message("1001", "live 2")
+
+            server.inject_when_connected(inject)
+
+            @csp.graph
+            def g():
+                csp.add_graph_output("msgs", adapter.history({"1001", "alerts"}, since=timedelta(hours=1), page_size=2))
+
+            out = csp.run(g, realtime=True, endtime=timedelta(seconds=3))
+
+        # The live messages are also in the channels' history, and are ticked exactly once
+        assert _contents(out) == [f"past {minute}" for minute in range(10)] + ["live 1", "live 2"]
+        assert server.rate_limited_count == 0
+
+    def test_until_bounds_the_backfill(self):
+        with FakeDiscordServer(channels={"1001": "general", "1002": "alerts"}) as server:
+            _seed(server)
+            adapter = DiscordAdapter(DiscordConfig(token="fake", api_url=server.api_url))
+
+            @csp.graph
+            def g():
+                msgs = adapter.history({"1001", "1002"}, since=NOW - timedelta(minutes=25), until=NOW - timedelta(minutes=23), page_size=2)
+                csp.add_graph_output("msgs", msgs)
+
+            out = csp.run(g, realtime=True, endtime=timedelta(seconds=3))
+
+        assert _contents(out) == ["past 5", "past 6", "past 7"]
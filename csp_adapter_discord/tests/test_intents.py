@@ -0,0 +1,125 @@
+"""Tests for deriving the gateway intents from the graph's inputs."""
+
+import logging
+import tempfile
+from pathlib import Path
+
+import csp
+import discord
+
+from csp_adapter_discord import DiscordAdapter, DiscordConfig, DiscordPresence
+from csp_adapter_discord.intents import apply_intents, intent_names, intents_from_names
+from csp_adapter_discord.testing import FakeDiscordServer, run_with_server
+
+
+def _run_adapter(server, graph, **kwargs):
+    """Run ``graph(adapter)`` with a new adapter on ``server`` and return the adapter."""
+    adapter = DiscordAdapter(DiscordConfig(token="fake", api_url=server.api_url, **kwargs.pop("config", {})), **kwargs)
+    run_with_server(server, graph(adapter), seconds=0.5)
+    return adapter
+
+
+class TestIntentHelpers:
+    def test_names_resolve_aliases(self):
+        intents = intents_from_names(["guilds", "messages", "not_an_intent"])
+        assert intent_names(intents) == {"guilds", "guild_messages", "dm_messages"}
+
+    def test_apply_intents_updates_member_state(self):
+        client = discord.Client(intents=intents_from_names(["guilds", "members", "presences"]))
+        assert client._connection._chunk_guilds
+        apply_intents(client, intents_from_names(["guilds", "presences"]))
+        state = client._connection
+        assert state.intents == intents_from_names(["guilds", "presences"])
+        assert not state._chunk_guilds
+        assert state.raw_presence_flag
+        assert state.store_user == state.store_user_no_intents
+
+
+class TestMinimalIntents:
+    def test_subscribe_drops_unused_intents(self, caplog):
+        def graph(adapter):
+            def g():
+                csp.add_graph_output("msgs", adapter.subscribe())
+
+            return g
+
+        with FakeDiscordServer() as server, caplog.at_level(logging.WARNING, logger="csp_adapter_discord"):
+            config = {"intents": ["guilds", "messages", "message_content", "members", "presences"]}
+            adapter = _run_adapter(server, graph, config=config, minimal_intents=True)
+        expected = {"guilds", "guild_messages", "dm_messages", "message_content"}
+        assert intent_names(adapter.session.intents) == expected
+        assert server.identified_intents == [adapter.session.intents.value]
+        assert "['members', 'presences'] are not needed by any input of the graph; connecting without them" in caplog.text
+
+    def test_presence_only_needs_guilds(self):
+        def graph(adapter):
+            def g():
+                adapter.publish_presence(csp.const(DiscordPresence(status="idle")))
+
+            return g
+
+        with FakeDiscordServer() as server:
+            adapter = _run_adapter(server, graph, minimal_intents=True)
+        assert intent_names(adapter.session.intents) == {"guilds"}
+
+    def test_missing_intents_are_info(self, caplog):
+        def graph(adapter):
+            def g():
+                csp.add_graph_output("msgs", adapter.subscribe())
+
+            return g
+
+        with FakeDiscordServer() as server, caplog.at_level(logging.INFO, logger="csp_adapter_discord"):
+            adapter = _run_adapter(server, graph, minimal_intents=True)
+        # message_content is privileged and not configured by default, so it is not turned on
+        assert "message_content" not in intent_names(adapter.session.intents)
+        missing = [r for r in caplog.records if "need intents ['message_content']" in r.getMessage()]
+        assert [r.levelno for r in missing] == [logging.INFO]
+
+    def test_configured_intents_by_default(self, caplog):
+        def graph(adapter):
+            def g():
+                csp.add_graph_output("msgs", adapter.subscribe())
+
+            return g
+
+        with FakeDiscordServer() as server, caplog.at_level(logging.WARNING, logger="csp_adapter_discord"):
+            adapter = _run_adapter(server, graph, config={"intents": ["guilds", "messages", "members"]})
+        assert not adapter.session.minimal_intents
+        assert "members" in intent_names(adapter.session.intents)
+        assert "guild_typing" in intent_names(adapter.session.intents)
+        # Without narrowing, the warning is what tells users about intents they do not need
+        unused = [r for r in caplog.records if "['members'] are not needed" in r.getMessage()]
+        assert [r.levelno for r in unused] == [logging.WARNING]
+        assert "pass minimal_intents=True to connect without them" in unused[0].getMessage()
+
+    def test_requirements_reset_between_runs(self):
+        def reactions(adapter):
+            def g():
+                csp.add_graph_output("reactions", adapter.subscribe_reactions())
+
+            return g
+
+        def presence(adapter):
+            def g():
+                adapter.publish_presence(csp.const(DiscordPresence(status="idle")))
+
+            return g
+
+        with FakeDiscordServer() as server:
+            adapter = _run_adapter(server, reactions, minimal_intents=True)
+            assert "guild_reactions" in intent_names(adapter.session.intents)
+            run_with_server(server, presence(adapter), seconds=0.5)
+        assert intent_names(adapter.session.intents) == {"guilds"}
+
+    def test_raw_recording_keeps_configured(self):
+        def graph(adapter):
+            def g():
+                csp.add_graph_output("n", adapter.record(str(path), raw=True))
+
+            return g
+
+        with tempfile.TemporaryDirectory() as tmp, FakeDiscordServer() as server:
+            path = Path(tmp) / "rec.cspd"
+            adapter = _run_adapter(server, graph, config={"intents": ["guilds", "messages", "members"]}, minimal_intents=True)
+        assert intent_names(adapter.session.intents) == intent_names(adapter.backend._get_intents())
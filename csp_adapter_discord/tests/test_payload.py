@@ -0,0 +1,146 @@
+"""Tests for raw MESSAGE_CREATE payload subscriptions."""
+
+from datetime import UTC, datetime
+
+import csp
+import pytest
+
+from csp_adapter_discord import DiscordAdapter, DiscordConfig, DiscordMessage, DiscordMessageStruct, LazyDiscordMessage, MessagePayload
+from csp_adapter_discord.payload import message_from_payload, snowflake_time_ms
+from csp_adapter_discord.testing import FakeDiscordServer, run_with_server
+
+MENTION = {"id": "77", "username": "alice", "discriminator": "0", "global_name": None, "avatar": None, "bot": True}
+ATTACHMENT = {"id": "88", "filename": "chart.png", "url": "https://cdn/chart.png", "proxy_url": "", "size": 10, "content_type": "image/png"}
+
+
+def _plain_and_extras(server):
+    def inject():
+        server.inject_message("1001", "plain")
+        payload = server._message_payload("1001", "with extras", {"id": "5555", "username": "someone"}, mentions=[MENTION], attachments=[ATTACHMENT])
+        server.inject_event("MESSAGE_CREATE", payload)
+
+    return inject
+
+
+class TestMessagePayload:
+    def test_accessors(self):
+        payload = MessagePayload(
+            {
+                "id": "1561268427161600008",
+                "channel_id": "1001",
+                "content": "hi",
+                "author": {"id": "5", "username": "bob", "bot": True},
+                "mentions": [MENTION],
+            }
+        )
+        assert (payload.content, payload.channel_id, payload.author_id, payload.author_name, payload.is_bot) == ("hi", "1001", "5", "bob", True)
+        assert payload.mention_ids == ["77"]
+        assert payload.created_at == datetime.fromtimestamp(snowflake_time_ms(payload.id) / 1000, UTC)
+        assert payload.channel_name == "" and payload.parent_channel_id is None
+
+    def test_dm_without_cached_channel(self):
+        message = message_from_payload({"id": "1561268427161600008", "channel_id": "9", "content": "psst", "author": {"id": "5"}})
+        assert message.metadata["is_dm"] is True
+        assert message.guild is None
+
+    def test_unknown_mode(self):
+        adapter = DiscordAdapter(DiscordConfig(token="fake"))
+        with pytest.raises(ValueError):
+            adapter.subscribe(mode="fast")
+
+
+class TestLazyDiscordMessage:
+    def test_builds_only_accessed_fields(self):
+        data = {
+            "id": "1561268427161600008",
+            "channel_id": "1001",
+            "guild_id": "1000",
+            "content": "hi <@77>",
+            "author": {"id": "5", "username": "bob"},
+            "mentions": [MENTION],
+            "attachments": [ATTACHMENT],
+        }
+        lazy = LazyDiscordMessage(MessagePayload(data))
+        assert (lazy.content, lazy.channel_id, lazy.author_id) == ("hi <@77>", "1001", "5")
+        assert lazy.author.id == "5"
+        assert set(lazy._fields) == {"author"}
+        assert [u.name for u in lazy.mentions] == ["alice"]
+        assert set(lazy._fields) == {"author", "mentions"}
+        assert lazy._message is None
+        message = lazy.materialize()
+        assert isinstance(message, DiscordMessage)
+        assert message == message_from_payload(data)
+        # Fields already built are reused rather than rebuilt
+        assert message.mentions[0] is lazy.mentions[0]
+        # Anything else reads from the materialized message
+        assert lazy.is_dm is False
+
+
+class TestDiscordMessageStruct:
+    def test_round_trip(self):
+        struct = DiscordMessageStruct(
+            id="1",
+            content="hi",
+            channel_id="1001",
+            channel_name="general",
+            guild_id="1000",
+            author_id="5",
+            author_name="bob",
+            created_at=datetime(2026, 10, 1, 12),
+            mention_ids=["77"],
+        )
+        message = struct.to_message()
+        assert message.created_at == datetime(2026, 10, 1, 12, tzinfo=UTC)
+        assert (message.channel_name, message.author.name, message.mentions[0].id) == ("general", "bob", "77")
+        assert DiscordMessageStruct.from_message(message) == struct
+        assert DiscordMessageStruct.from_dict(struct.to_dict()) == struct
+
+
+class TestPayloadSubscribe:
+    def test_payload_converts_to_the_same_message(self):
+        with FakeDiscordServer() as server:
+            adapter = DiscordAdapter(DiscordConfig(token="fake", api_url=server.api_url))
+
+            @csp.graph
+            def g():
+                csp.add_graph_output("messages", adapter.subscribe())
+                csp.add_graph_output("payloads", adapter.subscribe(channels={"general"}, mode="payload"))
+                csp.add_graph_output("lazy", adapter.subscribe(channels={"1001"}, mode="lazy"))
+                csp.add_graph_output("structs", adapter.subscribe(mode="struct"))
+
+            out = run_with_server(server, g, _plain_and_extras(server))
+
+        messages = [m for _, msgs in out["messages"] for m in msgs]
+        payloads = [p for _, ps in out["payloads"] for p in ps]
+        lazy = [m for _, ms in out["lazy"] for m in ms]
+        assert [p.content for p in payloads] == ["plain", "with extras"]
+        assert [p.to_message() for p in payloads] == messages
+        assert [m.materialize() for m in lazy] == messages
+        structs = [s for _, ss in out["structs"] for s in ss]
+        # The payload also carries the author's name, which subscribe's DiscordMessage leaves out
+        assert [s.author_name for s in structs] == ["someone", "someone"]
+        expected = [DiscordMessageStruct.from_message(m) for m in messages]
+        for struct in expected:
+            struct.author_name = "someone"
+        assert structs == expected
+        assert structs[1].mention_ids == ["77"] and structs[1].channel_name == "general"
+        assert messages[1].mentions[0].id == "77" and messages[1].attachments[0].filename == "chart.png"
+
+    def test_payload_only_skips_discord_models(self):
+        with FakeDiscordServer() as server:
+            adapter = DiscordAdapter(DiscordConfig(token="fake", api_url=server.api_url))
+            cached = []
+
+            @csp.node
+            def check(payloads: csp.ts[[MessagePayload]]):
+                if csp.ticked(payloads) and payloads:
+                    cached.append(len(adapter.session.backend._client.cached_messages))
+
+            @csp.graph
+            def g():
+                check(adapter.subscribe(mode="payload"))
+
+            run_with_server(server, g, _plain_and_extras(server))
+
+        # discord.py's parser never ran, so it has not built or cached any Message
+        assert cached and set(cached) == {0}
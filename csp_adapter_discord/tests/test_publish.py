@@ -0,0 +1,303 @@
+"""Tests for the publish lanes and bounded outbox."""
+
+import asyncio
+import threading
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import csp
+import discord
+import pytest
+from chatom.base import Thread
+
+from csp_adapter_discord import DiscordAdapter, DiscordChannel, DiscordConfig, DiscordMessage, MockDiscordBackend, PublishStats
+from csp_adapter_discord.nodes import DiscordAdapterManagerImpl, DiscordPresenceWriterImpl, _Outbox
+from csp_adapter_discord.session import DiscordSession
+from csp_adapter_discord.tests.helpers import FakeChannel, FakeMessagingClient, make_writer
+
+
+class RateLimitedChannel(FakeChannel):
+    """Channel whose sends wait until released, like a route with an exhausted bucket."""
+
+    def __init__(self, id):
+        super().__init__(id)
+        self.released = threading.Event()
+
+    async def send(self, **kwargs):
+        while not self.released.is_set():
+            await asyncio.sleep(0.005)
+        return await super().send(**kwargs)
+
+
+def _msg(channel_id, content, thread=None):
+    return DiscordMessage(channel=DiscordChannel(id=channel_id), content=content, thread=thread)
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def running_writer():
+    """Build a writer on a started session around a fake client, stopping it afterwards."""
+    started = []
+
+    def build(*channels, **kwargs):
+        client = FakeMessagingClient(*channels)
+        writer, session = make_writer(client, **kwargs)
+        session.start()
+        # The mock backend's connect resets the client
+        object.__setattr__(session.backend, "_client", client)
+        writer.start()
+        started.append((writer, session))
+        return writer
+
+    yield build
+    for writer, session in started:
+        writer.stop()
+        session.stop()
+
+
+class TestOutbox:
+    def test_fifo_per_channel(self):
+        outbox = _Outbox()
+        for i in range(3):
+            assert outbox.put("a", i)
+            assert outbox.put("b", 10 + i)
+        assert [outbox.take("a") for _ in range(4)] == [0, 1, 2, None]
+        assert len(outbox) == 3
+
+    def test_drop_newest(self):
+        outbox = _Outbox(2, "drop_newest")
+        assert outbox.put("a", 1) and outbox.put("b", 2)
+        assert not outbox.put("a", 3)
+        assert (len(outbox), outbox.dropped) == (2, 1)
+        assert [outbox.take("a"), outbox.take("a")] == [1, None]
+
+    def test_drop_oldest(self):
+        outbox = _Outbox(2, "drop_oldest")
+        outbox.put("a", 1)
+        outbox.put("b", 2)
+        outbox.put("b", 3)
+        assert outbox.dropped == 1
+        assert outbox.take("a") is None
+        assert [outbox.take("b"), outbox.take("b")] == [2, 3]
+
+    def test_coalesce(self):
+        outbox = _Outbox(2, "coalesce")
+        outbox.put("a", _msg("a", "1"))
+        outbox.put("a", _msg("a", "2"))
+        assert not outbox.put("a", _msg("a", "3"))
+        # A channel with nothing pending is still admitted
+        assert outbox.put("b", _msg("b", "4"))
+        assert outbox.coalesced == 1
+        assert [outbox.take("a").content, outbox.take("a").content, outbox.take("b").content] == ["1", "2\n3", "4"]
+
+    def test_coalesce_drops_what_cannot_be_merged(self):
+        outbox = _Outbox(1, "coalesce")
+        outbox.put("a", _msg("a", "x" * 1500))
+        assert not outbox.put("a", _msg("a", "y" * 1500))
+        assert (outbox.coalesced, outbox.dropped) == (0, 1)
+        assert outbox.take("a").content == "x" * 1500
+
+    def test_block_waits_for_room(self):
+        outbox = _Outbox(1, "block")
+        outbox.put("a", 1)
+        done = threading.Event()
+
+        def put():
+            outbox.put("a", 2)
+            done.set()
+
+        threading.Thread(target=put, daemon=True).start()
+        assert not done.wait(0.05)
+        assert outbox.take("a") == 1
+        assert done.wait(1.0)
+        assert outbox.take("a") == 2
+
+    def test_block_raises_once_nothing_takes(self):
+        alive = threading.Event()
+        alive.set()
+        outbox = _Outbox(1, "block", alive=alive.is_set)
+        outbox.put("a", 1)
+        threading.Timer(0.05, alive.clear).start()
+        with pytest.raises(RuntimeError):
+            outbox.put("a", 2)
+
+    def test_invalid_policy(self):
+        with pytest.raises(ValueError):
+            _Outbox(1, "explode")
+
+
+class TestPublishLanes:
+    def test_limited_channel_does_not_block_others(self, running_writer):
+        limited = RateLimitedChannel(1)
+        free = FakeChannel(2)
+        writer = running_writer(limited, free)
+        for i in range(3):
+            writer.on_tick(None, _msg("1", f"a{i}"))
+            writer.on_tick(None, _msg("2", f"b{i}"))
+        # Channel 2 drains while channel 1 is still waiting on its bucket
+        _wait_for(lambda: len(free.sent) == 3)
+        assert [s["content"] for s in free.sent] == ["b0", "b1", "b2"]
+        assert limited.sent == []
+        limited.released.set()
+        writer.stop()
+        assert [s["content"] for s in limited.sent] == ["a0", "a1", "a2"]
+        assert writer._lanes == {}
+        assert writer.stats() == {"depth": 0, "dropped": 0, "coalesced": 0, "sent": 6, "failed": 0}
+
+    def test_lane_reopens_after_draining(self, running_writer):
+        channel = FakeChannel(1)
+        writer = running_writer(channel)
+        writer.on_tick(None, _msg("1", "first"))
+        _wait_for(lambda: len(channel.sent) == 1 and not writer._lanes)
+        writer.on_tick(None, _msg("1", "second"))
+        writer.stop()
+        assert [s["content"] for s in channel.sent] == ["first", "second"]
+
+    def test_bounded_queue_drops_while_limited(self, running_writer):
+        limited = RateLimitedChannel(1)
+        writer = running_writer(limited, max_queue=2, overflow="drop_oldest")
+        writer.on_tick(None, _msg("1", "in-flight"))
+        _wait_for(lambda: writer.stats()["depth"] == 0)
+        for i in range(5):
+            writer.on_tick(None, _msg("1", f"m{i}"))
+        assert writer.stats()["depth"] == 2
+        assert writer.stats()["dropped"] == 3
+        limited.released.set()
+        writer.stop()
+        assert [s["content"] for s in limited.sent] == ["in-flight", "m3", "m4"]
+
+    def test_failed_sends_are_counted(self, running_writer):
+        response = SimpleNamespace(status=403, reason="Forbidden")
+        writer = running_writer(FakeChannel(1, fail=discord.Forbidden(response, "Missing Access")))
+        writer.on_tick(None, _msg("1", "x"))
+        writer.stop()
+        assert writer.stats()["failed"] == 1
+
+    def test_coalesce_window_merges_per_channel(self, running_writer):
+        first, second = FakeChannel(1), FakeChannel(2)
+        writer = running_writer(first, second, coalesce_window=timedelta(milliseconds=50))
+        for i in range(20):
+            writer.on_tick(None, _msg("1", f"alert {i}"))
+        writer.on_tick(None, _msg("2", "other"))
+        writer.stop()
+        assert [s["content"] for s in first.sent] == ["\n".join(f"alert {i}" for i in range(20))]
+        assert [s["content"] for s in second.sent] == ["other"]
+        assert writer.stats()["coalesced"] == 19
+        assert writer.stats()["sent"] == 2
+
+    def test_threads_get_their_own_lane(self):
+        writer, _ = make_writer(FakeMessagingClient())
+        assert writer._lane_key(_msg("1", "x")) == "1"
+        assert writer._lane_key(_msg("1", "x", thread=Thread(id="900"))) == "900"
+
+
+class TestPublishStats:
+    def test_manager_sums_writers(self):
+        manager = DiscordAdapterManagerImpl.__new__(DiscordAdapterManagerImpl)
+        manager._writers = []
+        for sent in (1, 2):
+            writer, _ = make_writer(FakeMessagingClient())
+            writer._sent = sent
+            manager._writers.append(writer)
+        assert manager.publish_stats() == PublishStats(depth=0, dropped=0, coalesced=0, sent=3, failed=0)
+
+    def test_publish_stats_time_series(self):
+        config = DiscordConfig(bot_token="fake_token_for_testing")
+        with patch("csp_adapter_discord.adapter.DiscordBackend", MockDiscordBackend):
+            adapter = DiscordAdapter(config=config)
+
+        @csp.graph
+        def g():
+            msgs = csp.unroll(csp.const([_msg("1", f"m{i}") for i in range(3)]))
+            adapter.publish(msgs, max_queue=10, overflow="drop_newest")
+            csp.add_graph_output("stats", adapter.publish_stats(interval=timedelta(milliseconds=20)))
+
+        out = csp.run(g, realtime=True, endtime=timedelta(seconds=0.3))
+        assert out["stats"][-1][1].sent == 3
+
+    def test_publish_rejects_unknown_policy(self):
+        config = DiscordConfig(bot_token="fake_token_for_testing")
+        with patch("csp_adapter_discord.adapter.DiscordBackend", MockDiscordBackend):
+            adapter = DiscordAdapter(config=config)
+
+        @csp.graph
+        def g():
+            adapter.publish(csp.const(_msg("1", "x")), overflow="explode")
+
+        with pytest.raises(ValueError):
+            csp.run(g, realtime=True, endtime=timedelta(seconds=0.1))
+
+
+@pytest.fixture
+def presence_writer():
+    """Build a presence writer on a started session around a mock backend."""
+    started = []
+
+    def build(min_interval):
+        session = DiscordSession(MockDiscordBackend(config=DiscordConfig(bot_token="fake_token_for_testing")))
+        writer = DiscordPresenceWriterImpl(SimpleNamespace(session=session), timeout=1.0, min_interval=min_interval)
+        session.start()
+        writer.start()
+        started.append((writer, session))
+        return writer, session.backend
+
+    yield build
+    for writer, session in started:
+        writer.stop()
+        session.stop()
+
+
+def _statuses(backend):
+    return [u["status"] for u in backend.get_presence_updates()]
+
+
+class TestPresenceWriter:
+    def test_keeps_latest_within_interval(self, presence_writer):
+        writer, backend = presence_writer(timedelta(milliseconds=200))
+        writer.on_tick(None, "online")
+        _wait_for(lambda: _statuses(backend) == ["online"])
+        for status in ("idle", "dnd", "idle", "dnd"):
+            writer.on_tick(None, status)
+        time.sleep(0.05)
+        assert _statuses(backend) == ["online"]
+        _wait_for(lambda: _statuses(backend) == ["online", "dnd"])
+
+    def test_skips_no_op_updates(self, presence_writer):
+        writer, backend = presence_writer(timedelta(0))
+        writer.on_tick(None, "idle")
+        _wait_for(lambda: _statuses(backend) == ["idle"])
+        writer.on_tick(None, "idle")
+        writer.on_tick(None, "idle")
+        writer.stop()
+        assert _statuses(backend) == ["idle"]
+
+    def test_stop_flushes_latest(self, presence_writer):
+        writer, backend = presence_writer(timedelta(seconds=30))
+        writer.on_tick(None, "online")
+        _wait_for(lambda: _statuses(backend) == ["online"])
+        writer.on_tick(None, "dnd")
+        writer.stop()
+        assert _statuses(backend) == ["online", "dnd"]
+
+    def test_stop_before_task_runs(self):
+        session = DiscordSession(MockDiscordBackend(config=DiscordConfig(bot_token="fake_token_for_testing")))
+        writer = DiscordPresenceWriterImpl(SimpleNamespace(session=session), timeout=5.0)
+        session.start()
+        try:
+            # The close lands on the loop before the presence task has started
+            session.call_soon(writer._close)
+            session.submit(asyncio.sleep(0)).result(timeout=1.0)
+            writer.start()
+            started = time.monotonic()
+            writer.stop()
+            assert time.monotonic() - started < 1.0
+        finally:
+            session.stop()
@@ -0,0 +1,147 @@
+"""Tests for the on-disk recording of inbound traffic."""
+
+import os
+import time
+from datetime import UTC, datetime, timedelta
+
+import csp
+
+from csp_adapter_discord import DiscordAdapter, DiscordChannel, DiscordConfig, DiscordMessage, replay
+from csp_adapter_discord.recording import KIND_MESSAGE, KIND_RAW, Record, RecordingWriter, read_index, read_records
+from csp_adapter_discord.testing import FakeDiscordServer
+
+
+def _msg(i):
+    return DiscordMessage(id=str(i), channel=DiscordChannel(id="1001"), content=f"m{i}")
+
+
+class TestRecordingWriter:
+    def test_round_trip_in_chunks(self, tmp_path):
+        path = str(tmp_path / "discord.rec")
+        with RecordingWriter(path, chunk_records=4) as writer:
+            for i in range(10):
+                writer.append_message(_msg(i), timestamp_ns=1000 + i)
+            writer.append_raw("TYPING_START", {"channel_id": "1001"}, timestamp_ns=2000)
+        assert writer.written == 11
+        index = read_index(path)
+        assert [(e.first_ns, e.last_ns, e.count) for e in index] == [(1000, 1003, 4), (1004, 1007, 4), (1008, 2000, 3)]
+        records = list(read_records(path))
+        assert [r.kind for r in records] == [KIND_MESSAGE] * 10 + [KIND_RAW]
+        assert [r.decode().content for r in records[:10]] == [f"m{i}" for i in range(10)]
+        assert records[-1].decode() == ("TYPING_START", {"channel_id": "1001"})
+
+    def test_flushes_on_interval(self, tmp_path):
+        flushed = []
+        writer = RecordingWriter(str(tmp_path / "discord.rec"), flush_interval=0.02, on_flush=flushed.append)
+        writer.append_message(_msg(1))
+        deadline = time.monotonic() + 2.0
+        while not flushed and time.monotonic() < deadline:
+            time.sleep(0.005)
+        assert flushed == [1]
+        writer.close()
+
+    def test_appends_and_ignores_truncated_tail(self, tmp_path):
+        path = str(tmp_path / "discord.rec")
+        for start in (0, 3):
+            with RecordingWriter(path) as writer:
+                for i in range(start, start + 3):
+                    writer.append_message(_msg(i))
+        assert [r.decode().id for r in read_records(path)] == [str(i) for i in range(6)]
+        # Without the index the chunks are scanned, and a partly written chunk is skipped
+        os.remove(path + ".idx")
+        with open(path, "ab") as f:
+            f.write(b"CHNK\x01partial")
+        assert len(read_index(path)) == 2
+        assert len(list(read_records(path))) == 6
+
+
+class TestRecord:
+    def test_records_messages_and_gateway_events(self, tmp_path):
+        path = str(tmp_path / "discord.rec")
+        with FakeDiscordServer(channels={"1001": "general"}) as server:
+            adapter = DiscordAdapter(DiscordConfig(token="fake", api_url=server.api_url))
+
+            server.inject_when_connected(lambda: server.inject_message("1001", "hello"))
+
+            @csp.graph
+            def g():
+                csp.add_graph_output("written", adapter.record(path, flush_interval=timedelta(milliseconds=50)))
+
+            out = csp.run(g, realtime=True, endtime=timedelta(seconds=1.0))
+
+        records = [r.decode() for r in read_records(path)]
+        messages = [r for r in records if isinstance(r, DiscordMessage)]
+        events = [r[0] for r in records if isinstance(r, tuple)]
+        assert [(m.content, m.channel_id) for m in messages] == [("hello", "1001")]
+        assert {"READY", "GUILD_CREATE", "MESSAGE_CREATE"} <= set(events)
+        assert out["written"][-1][1] <= len(records)
+
+
+def _write(path, start_ns, channel_ids, step_ns=1_000_000_000):
+    with RecordingWriter(path, chunk_records=2) as writer:
+        for i, channel_id in enumerate(channel_ids):
+            writer.append_raw("MESSAGE_CREATE", {"channel_id": channel_id}, timestamp_ns=start_ns + i * step_ns)
+            msg = DiscordMessage(id=f"{start_ns}-{i}", channel=DiscordChannel(id=channel_id), content=f"{channel_id}:{i}")
+            writer.append_message(msg, timestamp_ns=start_ns + i * step_ns)
+
+
+START = datetime(2026, 10, 1)
+START_NS = int(START.replace(tzinfo=UTC).timestamp()) * 1_000_000_000
+
+
+class TestReplay:
+    def test_replays_at_recorded_times(self, tmp_path):
+        path = str(tmp_path / "discord.rec")
+        _write(path, START_NS, ["1001", "1002", "1001"])
+
+        @csp.graph
+        def g():
+            csp.add_graph_output("msgs", replay(path))
+
+        out = csp.run(g, starttime=START, endtime=timedelta(minutes=1))
+        assert [(t, [m.content for m in msgs]) for t, msgs in out["msgs"]] == [
+            (START, ["1001:0"]),
+            (START + timedelta(seconds=1), ["1002:1"]),
+            (START + timedelta(seconds=2), ["1001:2"]),
+        ]
+
+    def test_merges_directory_and_filters(self, tmp_path):
+        _write(str(tmp_path / "a.rec"), START_NS, ["1001", "1002"] * 3, step_ns=2_000_000_000)
+        _write(str(tmp_path / "b.rec"), START_NS + 1_000_000_000, ["1001"] * 3, step_ns=2_000_000_000)
+        with RecordingWriter(str(tmp_path / "c.rec")) as writer:
+            # A message in a thread of channel 1001 is replayed with its parent channel
+            thread_msg = DiscordMessage(id="thread", channel=DiscordChannel(id="3003"), content="in thread", metadata={"parent_channel_id": "1001"})
+            writer.append_message(thread_msg, timestamp_ns=START_NS + 2_500_000_000)
+
+        @csp.graph
+        def g():
+            csp.add_graph_output("msgs", replay(str(tmp_path), channels={"1001"}))
+
+        # Starting mid-recording skips the earlier records
+        out = csp.run(g, starttime=START + timedelta(seconds=1), endtime=timedelta(seconds=4))
+        assert [(t - START, [m.id for m in msgs]) for t, msgs in out["msgs"]] == [
+            (timedelta(seconds=1), [f"{START_NS + 1_000_000_000}-0"]),
+            (timedelta(seconds=2, milliseconds=500), ["thread"]),
+            (timedelta(seconds=3), [f"{START_NS + 1_000_000_000}-1"]),
+            (timedelta(seconds=4), [f"{START_NS}-2"]),
+            (timedelta(seconds=5), [f"{START_NS + 1_000_000_000}-2"]),
+        ]
+
+    def test_filters_before_decoding(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "discord.rec")
+        with RecordingWriter(path) as writer:
+            for i, (channel_id, name) in enumerate([("1001", "Alerts"), ("1002", "random"), ("1003", "general"), ("1002", "random")]):
+                msg = DiscordMessage(id=str(i), channel=DiscordChannel(id=channel_id, name=name), content=f"m{i}")
+                writer.append_message(msg, timestamp_ns=START_NS + i * 1_000_000_000)
+        decoded = []
+        decode = Record.decode
+        monkeypatch.setattr(Record, "decode", lambda record: decoded.append(record.timestamp_ns) or decode(record))
+
+        @csp.graph
+        def g():
+            csp.add_graph_output("msgs", replay(path, channels={"#alerts", "1003"}))
+
+        out = csp.run(g, starttime=START, endtime=timedelta(minutes=1))
+        assert [m.id for _, msgs in out["msgs"] for m in msgs] == ["0", "2"]
+        # The records of channel 1002 were never deserialized
+        assert len(decoded) == 2
@@ -0,0 +1,135 @@
+"""Tests for the shared DiscordSession."""
+
+import asyncio
+from datetime import UTC, datetime
+from types import SimpleNamespace
+
+import pytest
+
+from csp_adapter_discord import DiscordConfig, DiscordMessage, MockDiscordBackend
+from csp_adapter_discord.session import DiscordSession, _message_from_discord
+from csp_adapter_discord.tests.helpers import FakeClient
+
+
+def _backend():
+    return MockDiscordBackend(config=DiscordConfig(bot_token="fake_token_for_testing"))
+
+
+def _discord_py_message(id=1, content="hello", channel_id=456, guild_id=42):
+    """A stand-in for a discord.py Message with just the attributes we read."""
+    guild = SimpleNamespace(id=guild_id)
+    return SimpleNamespace(
+        id=id,
+        content=content,
+        created_at=datetime(2025, 1, 1, tzinfo=UTC),
+        author=SimpleNamespace(id=123),
+        channel=SimpleNamespace(id=channel_id, name="general", type=SimpleNamespace(value=0), guild=guild),
+        guild=guild,
+        mentions=[SimpleNamespace(id=7, name="someone", bot=False, discriminator="0")],
+        mention_everyone=False,
+        role_mentions=[],
+        attachments=[],
+    )
+
+
+class TestDiscordSession:
+    def test_start_stop_connects_once(self):
+        session = DiscordSession(_backend())
+        session.start()
+        try:
+            assert session.running
+            assert session.backend.connected
+            # Starting again is a no-op
+            session.start()
+        finally:
+            session.stop()
+        assert not session.running
+        assert not session.backend.connected
+
+    def test_start_raises_connect_error(self):
+        backend = _backend()
+
+        async def fail():
+            raise RuntimeError("bad token")
+
+        object.__setattr__(backend, "connect", fail)
+        session = DiscordSession(backend)
+        with pytest.raises(RuntimeError, match="bad token"):
+            session.start()
+        assert not session.running
+
+    def test_submit_and_call_soon(self):
+        session = DiscordSession(_backend())
+        session.start()
+        try:
+
+            async def add(a, b):
+                await asyncio.sleep(0)
+                return a + b
+
+            assert session.submit(add(1, 2)).result(timeout=1.0) == 3
+            seen = []
+            session.call_soon(seen.append, "x")
+            session.submit(asyncio.sleep(0)).result(timeout=1.0)
+            assert seen == ["x"]
+        finally:
+            session.stop()
+
+    def test_submit_when_not_running(self):
+        session = DiscordSession(_backend())
+        with pytest.raises(RuntimeError):
+            session.submit(asyncio.sleep(0))
+        with pytest.raises(RuntimeError):
+            session.call_soon(print)
+
+    def test_dispatch_fans_out_and_isolates_errors(self):
+        session = DiscordSession(_backend())
+        seen = []
+
+        def bad(msg):
+            raise ValueError("boom")
+
+        session.add_listener("message", bad)
+        session.add_listener("message", seen.append)
+        session.dispatch("message", "m1")
+        session.remove_listener("message", bad)
+        session.dispatch("message", "m2")
+        session.dispatch("other", "ignored")
+        assert seen == ["m1", "m2"]
+
+    def test_install_handlers_converts_once(self):
+        session = DiscordSession(_backend())
+        client = FakeClient()
+        session._install_handlers(client)
+        first, second = [], []
+        session.add_listener("message", first.append)
+        session.add_listener("message", second.append)
+        asyncio.run(client.on_message(_discord_py_message()))
+        assert len(first) == 1
+        assert first[0] is second[0]
+        message = first[0]
+        assert isinstance(message, DiscordMessage)
+        assert message.id == "1"
+        assert message.channel_id == "456"
+        assert message.channel_name == "general"
+        assert message.author_id == "123"
+        assert message.guild.id == "42"
+        assert [u.id for u in message.mentions] == ["7"]
+        assert message.metadata["is_dm"] is False
+
+
+class TestMessageConversion:
+    def test_message_from_discord(self):
+        message = _message_from_discord(_discord_py_message(id=5, content="hey"))
+        assert message.id == "5"
+        assert message.content == "hey"
+        assert message.created_at == datetime(2025, 1, 1, tzinfo=UTC)
+        assert "parent_channel_id" not in message.metadata
+
+    def test_thread_parent_recorded(self):
+        raw = _discord_py_message(channel_id=900)
+        raw.channel.parent_id = 456
+        raw.channel.type = SimpleNamespace(value=11)
+        message = _message_from_discord(raw)
+        assert message.channel_id == "900"
+        assert message.metadata["parent_channel_id"] == "456"
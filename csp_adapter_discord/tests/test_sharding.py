@@ -0,0 +1,94 @@
+"""Tests for sharded gateway sessions."""
+
+import time
+from datetime import timedelta
+
+import csp
+import pytest
+
+from csp_adapter_discord import DiscordAdapter, DiscordConfig, DiscordPresence, DiscordSession, MockDiscordBackend
+from csp_adapter_discord.testing import FakeDiscordServer, run_with_server
+
+# A guild ID Discord routes to shard 1 of 2: (guild_id >> 22) % 2 == 1
+GUILD_ON_SHARD_1 = str(1 << 22)
+
+
+def _guild_and_dm(server):
+    def inject():
+        server.inject_message("1001", "guild")
+        # Not a guild channel, so a DM, which Discord sends to shard 0
+        server.inject_message("2002", "dm")
+
+    return inject
+
+
+class TestSharding:
+    def test_invalid_shards(self):
+        with pytest.raises(ValueError):
+            DiscordSession(MockDiscordBackend(config=DiscordConfig(bot_token="fake")), shards=0)
+
+    def test_shards_merge_into_one_stream(self):
+        # Both shards may IDENTIFY at once, which keeps the test short
+        with FakeDiscordServer(channels={"1001": "general"}, guild_id=GUILD_ON_SHARD_1, max_concurrency=2) as server:
+            adapter = DiscordAdapter(DiscordConfig(token="fake", api_url=server.api_url), shards=2)
+
+            @csp.graph
+            def g():
+                csp.add_graph_output("msgs", adapter.subscribe())
+                adapter.publish_presence(csp.const(DiscordPresence(status="dnd")))
+
+            out = run_with_server(server, g, _guild_and_dm(server), connections=2, seconds=2)
+            assert server.wait_for_connections(0)
+            # Presence is per connection, so it is set on every shard
+            assert [u["status"] for u in server.presence_updates] == ["dnd", "dnd"]
+        messages = sorted((m for _, msgs in out["msgs"] for m in msgs), key=lambda m: m.content)
+        assert [(m.content, m.metadata["shard_id"], m.metadata["shard_seq"]) for m in messages] == [("dm", 0, 1), ("guild", 1, 1)]
+        assert messages[1].channel_name == "general"
+        assert adapter.session.shard_count == 2
+        assert server.identify_rate_violations == 0
+
+    def test_identifies_paced_by_max_concurrency(self):
+        with FakeDiscordServer(channels={"1001": "general"}, guild_id=GUILD_ON_SHARD_1, max_concurrency=1) as server:
+            adapter = DiscordAdapter(DiscordConfig(token="fake", api_url=server.api_url), shards=2)
+
+            @csp.graph
+            def g():
+                csp.add_graph_output("msgs", adapter.subscribe())
+
+            start = time.monotonic()
+            server.inject_when_connected(_guild_and_dm(server), connections=2, timeout=10.0)
+            out = csp.run(g, realtime=True, endtime=timedelta(seconds=7))
+        # With one IDENTIFY per 5 seconds, the second shard connects 5 seconds after the first
+        assert server.identify_rate_violations == 0
+        assert len(server.identified_intents) == 2
+        assert time.monotonic() - start >= 5.0
+        assert sorted(m.content for _, msgs in out["msgs"] for m in msgs) == ["dm", "guild"]
+
+    def test_auto_shard_count_with_payloads(self):
+        with FakeDiscordServer(channels={"1001": "general"}, guild_id=GUILD_ON_SHARD_1, recommended_shards=2, max_concurrency=2) as server:
+            adapter = DiscordAdapter(DiscordConfig(token="fake", api_url=server.api_url), shards="auto")
+
+            @csp.graph
+            def g():
+                csp.add_graph_output("payloads", adapter.subscribe(mode="payload"))
+                csp.add_graph_output("lazy", adapter.subscribe(mode="lazy"))
+
+            out = run_with_server(server, g, _guild_and_dm(server), connections=2, seconds=2)
+        payloads = sorted((p for _, ps in out["payloads"] for p in ps), key=lambda p: p.content)
+        assert [(p.content, p.shard_id, p.shard_seq) for p in payloads] == [("dm", 0, 1), ("guild", 1, 1)]
+        lazy = sorted((m for _, ms in out["lazy"] for m in ms), key=lambda m: m.content)
+        assert [m.materialize().metadata["shard_id"] for m in lazy] == [0, 1]
+
+    def test_unsharded_by_default(self):
+        with FakeDiscordServer(channels={"1001": "general"}, guild_id=GUILD_ON_SHARD_1) as server:
+            adapter = DiscordAdapter(DiscordConfig(token="fake", api_url=server.api_url))
+
+            @csp.graph
+            def g():
+                csp.add_graph_output("msgs", adapter.subscribe())
+
+            out = run_with_server(server, g, _guild_and_dm(server), seconds=2)
+        messages = sorted((m for _, msgs in out["msgs"] for m in msgs), key=lambda m: m.content)
+        assert [m.content for m in messages] == ["dm", "guild"]
+        assert "shard_id" not in messages[0].metadata
+        assert adapter.session.shard_count is None
@@ -0,0 +1,85 @@
+"""Tests for the local fake Discord server, driven through the real discord.py code path."""
+
+import json
+import urllib.error
+import urllib.request
+from datetime import timedelta
+
+import csp
+import pytest
+from discord.gateway import DiscordWebSocket
+from discord.http import Route
+
+from csp_adapter_discord import DiscordAdapter, DiscordChannel, DiscordConfig, DiscordMessage
+from csp_adapter_discord.testing import FakeDiscordServer
+
+
+@pytest.fixture
+def server():
+    with FakeDiscordServer(channels={"1001": "general", "1002": "alerts"}, rate_limit=2, rate_limit_window=0.3) as server:
+        yield server
+
+
+def _post(server, channel_id, content):
+    request = urllib.request.Request(
+        f"{server.api_url}/channels/{channel_id}/messages",
+        data=json.dumps({"content": content}).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, dict(response.headers), json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), json.loads(e.read())
+
+
+class TestFakeDiscordServer:
+    def test_rate_limit_headers_and_429(self, server):
+        status, headers, body = _post(server, "1001", "one")
+        assert status == 200
+        assert body["content"] == "one"
+        assert headers["X-RateLimit-Limit"] == "2"
+        assert headers["X-RateLimit-Remaining"] == "1"
+        assert _post(server, "1001", "two")[0] == 200
+        status, headers, body = _post(server, "1001", "three")
+        assert status == 429
+        assert body["global"] is False
+        assert 0 < float(headers["Retry-After"]) <= 0.3
+        # Other channels have their own bucket
+        assert _post(server, "1002", "other")[0] == 200
+        assert server.rate_limited_count == 1
+        assert [m["content"] for m in server.posted["1001"]] == ["one", "two"]
+
+    def test_identify_rate_check(self):
+        server = FakeDiscordServer(max_concurrency=2)
+        server._check_identify_rate(0)
+        # Shard 1 has its own rate limit key, shard 2 shares shard 0's
+        server._check_identify_rate(1)
+        assert server.identify_rate_violations == 0
+        server._check_identify_rate(2)
+        assert server.identify_rate_violations == 1
+
+    def test_unknown_channel(self, server):
+        assert _post(server, "999", "x")[0] == 404
+
+    def test_adapter_round_trip(self, server):
+        """Subscribe and publish through discord.py against the fake gateway and REST API."""
+        saved = (Route.BASE, DiscordWebSocket.DEFAULT_GATEWAY)
+        adapter = DiscordAdapter(DiscordConfig(token="fake", api_url=server.api_url))
+
+        server.inject_when_connected(lambda: server.inject_message("1001", "hello"))
+
+        @csp.graph
+        def g():
+            csp.add_graph_output("msgs", adapter.subscribe())
+            outgoing = [DiscordMessage(channel=DiscordChannel(id="1001"), content=f"m{i}") for i in range(5)]
+            adapter.publish(csp.unroll(csp.const(outgoing)))
+
+        out = csp.run(g, realtime=True, endtime=timedelta(seconds=1.5))
+        received = [m for _, msgs in out["msgs"] for m in msgs]
+        # The bot's own messages are echoed on the gateway and skipped by subscribe
+        assert [(m.content, m.channel_id, m.channel_name) for m in received] == [("hello", "1001", "general")]
+        # 5 sends against a limit of 2 per 0.3s: discord.py waits on the bucket instead of failing
+        assert [m["content"] for m in server.posted["1001"]] == [f"m{i}" for i in range(5)]
+        assert (Route.BASE, DiscordWebSocket.DEFAULT_GATEWAY) == saved